@@ -26,6 +26,8 @@ pkg_conf_path = os.path.join(pkg_dir, 'instrumental.conf.default')
 # TODO: allow this to be set in the config file
 save_dir = os.path.join(user_data_dir, 'instruments')
 
+DEFAULT_DISCOVERY_CACHE_TTL = 86400.  # seconds
+
 
 def copy_file_text(from_path, to_path):
     """Copies a text file, using platform-specific line endings"""
@@ -82,6 +84,9 @@ def load_config_file():
     if 'data_directory' in prefs:
         prefs['data_directory'] = os.path.normpath(os.path.expanduser(prefs['data_directory']))
 
+    prefs['discovery_cache_ttl'] = float(prefs.get('discovery_cache_ttl',
+                                                   DEFAULT_DISCOVERY_CACHE_TTL))
+
     blacklist = prefs.setdefault('driver_blacklist', [])
     if blacklist:
         prefs['driver_blacklist'] = [entry.strip() for entry in blacklist.split(',')]
@@ -7,24 +7,30 @@ from future.utils import with_metaclass
 
 import os
 import re
+import time
 import abc
 import atexit
 import socket
 import inspect
 import warnings
+import functools
 import contextlib
 import os.path
 import pickle
 from weakref import WeakSet
 from inspect import isfunction
+from fnmatch import fnmatchcase
 from importlib import import_module
 
-from .facet import Facet, ManualFacet, MessageFacet, SCPI_Facet, FacetGroup
+from .facet import Facet, FacetData, ManualFacet, MessageFacet, SCPI_Facet, FacetGroup, get_many
+from .util import scpi_root
+from .visa_pool import visa_resource_pool
+from . import iostats, iotrace
 from ..log import get_logger
 from .. import conf
 from ..util import cached_property
 from ..driver_info import driver_info
-from ..errors import (InstrumentTypeError, InstrumentNotFoundError, ConfigError,
+from ..errors import (Error, InstrumentTypeError, InstrumentNotFoundError, ConfigError,
                       InstrumentExistsError)
 
 log = get_logger(__name__)
@@ -199,7 +205,9 @@ def add_driver_info(classname, classdict):
 
     if 'visa_address' in cls_params:
         visa_info = entry.setdefault('visa_info', {})
-        visa_info['classname'] = classdict.get('_INST_VISA_INFO_')
+        visa_info[classname] = classdict.get('_INST_VISA_INFO_')
+        visa_driver_index.cache_clear()
+        _visa_support_cache.clear()
 
 
 def driver_takes_param(module_name, param_name):
@@ -301,12 +309,10 @@ class Instrument(with_metaclass(InstrumentMeta, object)):
 
         if hasattr(self._module, 'list_instruments'):
             log.info("Filling out paramset using `list_instruments()`")
-            for paramset in self._module.list_instruments():
-                log.debug("Checking against %r", paramset)
-                if self._paramset.matches(paramset):
-                    self._paramset.lazyupdate(paramset)
-                    log.info("Found match; new params: %r", self._paramset)
-                    break
+            paramset = find_module_paramset(self._module, self._paramset.matches)
+            if paramset is not None:
+                self._paramset.lazyupdate(paramset)
+                log.info("Found match; new params: %r", self._paramset)
         else:
             log.info("Driver module missing `list_instruments()`, not filling out paramset")
 
@@ -452,6 +458,85 @@ class Instrument(with_metaclass(InstrumentMeta, object)):
         facet_instance = facet.instance(self)
         facet_instance.observe(callback)
 
+    def invalidate(self, *names):
+        """Discard the cached values of facets, so they're read from the instrument next time
+
+        Invalidates the facets with the given names, or all of the instrument's facets if no names
+        are given. Useful after e.g. a reset, or changing settings from the instrument's front
+        panel.
+        """
+        if names:
+            for name in names:
+                getattr(self.__class__, name).instance(self).invalidate()
+        else:
+            for value in list(self.__dict__.values()):
+                if isinstance(value, FacetData):
+                    value.invalidate()
+
+    def get_many(self, names, use_cache=True):
+        """Get the values of several facets at once
+
+        For message-based facets (e.g. those made by `SCPI_Facet`), the get-messages are joined by
+        ';' and sent as a single query rather than one query per facet.
+
+        Parameters
+        ----------
+        names : sequence of str
+            Names of the facets to get
+        use_cache : bool, optional
+            Whether to use the cached values of cached facets
+
+        Returns
+        -------
+        OrderedDict
+            Map from facet name to value, in the order of `names`
+        """
+        return get_many(self, [getattr(self.__class__, name) for name in names], use_cache)
+
+    def io_stats(self):
+        """Get statistics of this instrument's I/O
+
+        Statistics are only collected while I/O instrumentation is enabled by `iostats.enable()`.
+        To collect statistics within a block of code, use `iostats.capture()` instead.
+
+        Returns
+        -------
+        OrderedDict
+            Maps each ``(kind, command)`` pair to a dict of its `count`, bytes `sent` and
+            `received`, and its `total`, `mean`, `p50`, `p99` and `max` latency in seconds. Kinds
+            include ``'write'`` and ``'query'`` for messages and ``'get'`` and ``'set'`` for facets.
+        """
+        return iostats.global_stats().summary(self)
+
+
+class DeferredQuery(object):
+    """Placeholder for the response to a query made with `VisaMixin.query_async()`
+
+    Its `value` is filled in once the transaction the query was made in has been sent.
+    """
+    __slots__ = ('message', 'done', '_value')
+
+    def __init__(self, message):
+        self.message = message
+        self.done = False
+        self._value = None
+
+    def _set(self, value):
+        self._value = value
+        self.done = True
+
+    @property
+    def value(self):
+        """The response string, available after the query has been sent"""
+        if not self.done:
+            raise Error("Response to '{}' is not available until its transaction "
+                        "ends".format(self.message))
+        return self._value
+
+    def __repr__(self):
+        state = repr(self._value) if self.done else 'pending'
+        return '<DeferredQuery({!r}): {}>'.format(self.message, state)
+
 
 class VisaMixin(Instrument):
     def write(self, message, *args, **kwds):
@@ -464,28 +549,55 @@ class VisaMixin(Instrument):
         """
         full_message = message.format(*args, **kwds)
         if self._in_transaction:
-            if full_message[0] != ':':
-                full_message = ':' + full_message
-            self._message_queue.append(full_message)
+            self._message_queue.append(scpi_root(full_message))
         else:
-            self._rsrc.write(full_message)
+            self._rsrc_write(full_message)
 
     def query(self, message, *args, **kwds):
         """Query the instrument's VISA resource with `message`
 
-        Flushes the message queue if called within a transaction.
+        Within a transaction, the query is appended to any queued messages and sent along with them
+        as a single compound query.
         """
+        full_message = message.format(*args, **kwds)
+        if self._in_transaction and self._message_queue:
+            return self._flush_message_queue(full_message)
+        return self._rsrc_query(full_message)
+
+    def query_async(self, message, *args, **kwds):
+        """Query the instrument without waiting for its response
+
+        Within a transaction, the query is queued like a write, and its response is read when the
+        queued messages are sent, either by a call to `query()` or at the end of the transaction.
+        Queries sent together are answered by a single read. Outside of a transaction, the query is
+        made immediately.
+
+        The response to each deferred query is assumed to be a single field, i.e. to contain no
+        ';'. Only the last query sent in a compound message may have a multi-field response.
+
+        Returns
+        -------
+        DeferredQuery
+            Placeholder whose `value` is the response string, once it has been read
+        """
+        full_message = message.format(*args, **kwds)
+        deferred = DeferredQuery(full_message)
         if self._in_transaction:
-            self._flush_message_queue()  # TODO: combine query with this message?
-        return self._rsrc.query(message.format(*args, **kwds))
+            self._message_queue.append(scpi_root(full_message))
+            self._deferred_queries.append(deferred)
+        else:
+            deferred._set(self._rsrc_query(full_message))
+        return deferred
 
     @contextlib.contextmanager
     def transaction(self):
         """Transaction context manager to auto-chain VISA messages
 
         Queues individual messages written with the `write()` method and sends them all at once,
-        joined by ';'. Messages are actually sent (1) when a call to `query()` is made and (2)
-        upon the end of transaction.
+        joined by ';'. Messages are actually sent (1) along with the next call to `query()` and (2)
+        upon the end of transaction. Queries made with `query_async()` are queued too, and their
+        responses are all read at once when the queue is sent. If an exception is raised within
+        the block, messages still queued are discarded.
 
         This is especially useful when using higher-level functions that call `write()`, as it lets
         you combine multiple logical operations into a single message (if only using writes), which
@@ -500,28 +612,75 @@ class VisaMixin(Instrument):
             >>> with myinst.transaction():
             ...     myinst.write('A')
             ...     myinst.write('B')
-            ...     myinst.query('C?')  # Query forces flush. Writes "A;B" and queries "C?"
+            ...     myinst.query('C?')  # Query forces flush. Queries ":A;:B;:C?"
             ...     myinst.write('D')
-            ...     myinst.write('E')  # End of transaction block, writes "D;E"
+            ...     d = myinst.query_async('D?')
+            ...     myinst.write('E')  # End of transaction block, queries ":D;:D?;:E"
+            >>> d.value  # Filled in from the response to ":D;:D?;:E"
         """
         self._start_transaction()
-        yield
+        try:
+            yield
+        except BaseException:
+            self._message_queue = self._deferred_queries = None
+            raise
         self._end_transaction()
 
     def _start_transaction(self):
         self._message_queue = []
+        self._deferred_queries = []
 
     def _end_transaction(self):
         self._flush_message_queue()
         self._message_queue = None  # signals end of transaction
+        self._deferred_queries = None
+
+    def _flush_message_queue(self, query=None):
+        """Send all queued messages at once
 
-    def _flush_message_queue(self):
-        """Write all queued messages at once"""
+        If any of the queued messages are deferred queries, or a `query` message is given, the
+        messages are sent as a single query and the response is split on ';' to fill in each query's
+        response. The response to `query` (the rest of the response string) is returned.
+        """
         if not self._in_transaction:
-            return
-        message = ';'.join(self._message_queue)
+            return None
+        messages, deferred = self._message_queue, self._deferred_queries
+        self._message_queue, self._deferred_queries = [], []
+        if query is not None:
+            messages.append(scpi_root(query))
+        if not messages:
+            return None
+
+        message = ';'.join(messages)
+        if query is None and not deferred:
+            self._rsrc_write(message)
+            return None
+
+        # Any fields after the first n belong to the last query, whose response may contain ';'
+        n_fields = len(deferred) + (query is not None)
+        fields = self._rsrc_query(message).split(';', n_fields - 1)
+        if len(fields) != n_fields:
+            raise Error("Expected {} fields in response to '{}', got {}".format(
+                n_fields, message, len(fields)))
+        for d, field in zip(deferred, fields):
+            d._set(field)
+        return fields[-1] if query is not None else None
+
+    def _rsrc_write(self, message):
+        if not iostats.active:
+            return self._rsrc.write(message)
+        t_start = time.perf_counter()
         self._rsrc.write(message)
-        self._message_queue = []
+        iostats.record(self, 'write', iostats.scpi_command(message), t_start, len(message))
+
+    def _rsrc_query(self, message):
+        if not iostats.active:
+            return self._rsrc.query(message)
+        t_start = time.perf_counter()
+        response = self._rsrc.query(message)
+        iostats.record(self, 'query', iostats.scpi_command(message), t_start, len(message),
+                       len(response))
+        return response
 
     @property
     def _in_transaction(self):
@@ -539,10 +698,9 @@ def open_visa_inst(visa_address, raise_errors=False):
     Logs well-known errors, and also suppress them if raise_errors is False.
     """
     import pyvisa
-    rm = pyvisa.ResourceManager()
     try:
-        log.info("Opening VISA resource '{}'".format(visa_address))
-        visa_inst = rm.open_resource(visa_address, open_timeout=50, timeout=200)
+        visa_inst = visa_resource_pool().acquire(visa_address, open_timeout=50, probe=True,
+                                                 timeout=200)
     except pyvisa.VisaIOError as e:
         # Could not create visa instrument object
         log.info("Skipping this resource due to VisaIOError")
@@ -561,34 +719,44 @@ def open_visa_inst(visa_address, raise_errors=False):
     return visa_inst
 
 
-def gen_visa_instruments():
-    import pyvisa
+def unique_visa_addresses(visa_list):
+    """Filter out VISA addresses that are just extensions of the address before them"""
     prev_addr = 'START'
-    rm = pyvisa.ResourceManager()
-    visa_list = rm.list_resources()
     for addr in visa_list:
         if addr.startswith(prev_addr):
             continue
-
         prev_addr = addr
-        visa_inst = open_visa_inst(addr, raise_errors=False)
-        if visa_inst is None:
-            continue
+        yield addr
 
-        try:
-            driver_module, classname = find_visa_driver_class(visa_inst)
-            cls = getattr(driver_module, classname)
-        except Exception as e:
-            log.info('Exception occurred when getting correct visa driver module:')
-            log.info(str(e))
-            continue
-        else:
-            params = ParamSet(cls, visa_address=addr)
-            yield params
-            try_close_visa_resource(cls, visa_inst)
 
-        finally:
-            visa_inst.close()
+def probe_visa_address(addr):
+    """Open the VISA resource at `addr` and find its driver class.
+
+    Returns a ParamSet for the instrument, or None if no matching driver was found.
+    """
+    visa_inst = open_visa_inst(addr, raise_errors=False)
+    if visa_inst is None:
+        return None
+
+    try:
+        driver_module, classname = find_visa_driver_class(visa_inst)
+        cls = getattr(driver_module, classname)
+    except Exception as e:
+        log.info('Exception occurred when getting correct visa driver module:')
+        log.info(str(e))
+        return None
+    else:
+        try_close_visa_resource(cls, visa_inst)
+        return ParamSet(cls, visa_address=addr)
+    finally:
+        visa_inst.close()
+
+
+def gen_visa_instruments():
+    for addr in unique_visa_addresses(visa_resource_pool().list_resources()):
+        params = probe_visa_address(addr)
+        if params is not None:
+            yield params
 
 
 def try_close_visa_resource(inst_class, resource):
@@ -621,7 +789,24 @@ def list_visa_instruments():
     return list(gen_visa_instruments())
 
 
-def list_instruments(server=None, module=None, blacklist=None):
+def resolve_blacklist(blacklist):
+    """Get the list of blacklisted driver modules, using the config file's by default"""
+    if blacklist is None:
+        return conf.prefs['driver_blacklist']
+    elif isinstance(blacklist, basestring):
+        return [blacklist]
+    return blacklist
+
+
+def should_check_visa(module, blacklist):
+    """Whether listing instruments filtered by `module` needs to check VISA addresses"""
+    if not module:
+        return True
+    return any(module in driver_name and driver_name not in blacklist and 'visa_info' in info_dict
+               for driver_name, info_dict in driver_info.items())
+
+
+def list_instruments(server=None, module=None, blacklist=None, parallel=False, timeout=10.0):
     """Returns a list of info about available instruments.
 
     May take a few seconds because it must poll hardware devices.
@@ -651,30 +836,34 @@ def list_instruments(server=None, module=None, blacklist=None):
         A str to filter what driver modules are checked. A driver module gets checked only if it
         contains the substring ``module`` in its full name. The full name includes both the driver
         group and the module, e.g. ``'cameras.pco'``.
+    parallel : bool, optional
+        If True, check driver modules and VISA addresses concurrently using
+        :class:`~instrumental.drivers.discovery.Discovery`. The order of the returned list is then
+        unspecified.
+    timeout : float or None, optional
+        Deadline in seconds for each driver module or VISA address when `parallel` is True. Checks
+        that take longer are skipped. Ignored if `parallel` is False.
     """
     if server is not None:
         from . import remote
         session = remote.client_session(server)
         return session.list_instruments()
 
-    if blacklist is None:
-        blacklist = conf.prefs['driver_blacklist']
-    elif isinstance(blacklist, basestring):
-        blacklist = [blacklist]
+    if parallel:
+        from .discovery import Discovery
+        return list(Discovery(module=module, blacklist=blacklist, timeout=timeout))
 
-    if module:
-        check_visa = any(module in driver_name and driver_name not in blacklist and
-                         'visa_info' in info_dict
-                         for driver_name,info_dict in driver_info.items())
-    else:
-        check_visa = True
+    blacklist = resolve_blacklist(blacklist)
+    found = {}  # Complete listings to store in the discovery cache
 
     inst_list = []
-    if check_visa:
+    if should_check_visa(module, blacklist):
         try:
             import pyvisa
             try:
                 inst_list.extend(list_visa_instruments())
+                if not module:
+                    found['visa'] = list(inst_list)
             except pyvisa.VisaIOError:
                 pass  # Hide visa errors
         except (ImportError, ConfigError):
@@ -696,9 +885,14 @@ def list_instruments(server=None, module=None, blacklist=None):
             continue
 
         try:
-            inst_list.extend(driver_module.list_instruments())
+            mod_list = list(driver_module.list_instruments())
         except AttributeError:
             continue  # Module doesn't have a list_instruments() function
+        inst_list.extend(mod_list)
+        found[mod_name] = mod_list
+
+    from .discovery import discovery_cache
+    discovery_cache().put_many(found)
     return inst_list
 
 
@@ -727,8 +921,8 @@ def _get_visa_instrument(params):
                                           addr + "' not found!")
     else:
         try:
-            rm = pyvisa.ResourceManager()
-            visa_inst = rm.open_resource(addr, open_timeout=50, **kwds)
+            visa_inst = visa_resource_pool().acquire(addr, params.get('visa_backend', ''),
+                                                     open_timeout=50, **kwds)
             # Cache the instrument for possible later use
             params['**visa_instrument'] = visa_inst
         except pyvisa.VisaIOError:
@@ -756,12 +950,16 @@ def _extract_params(inst, kwargs):
         name = inst
         raw_params = conf.instruments.get(name, None)
         if raw_params is None:
-            # Try looking for the string in the output of list_instruments()
+            # Try looking for the string in previously listed instruments, then in the output of
+            # list_instruments()
+            from .discovery import discovery_cache
             test_str = name.lower()
-            for inst_params in list_instruments():
-                if test_str in str(inst_params).lower():
-                    raw_params = inst_params
-                    break
+            raw_params = discovery_cache().find(lambda p: test_str in str(p).lower())
+            if raw_params is None:
+                for inst_params in list_instruments():
+                    if test_str in str(inst_params).lower():
+                        raw_params = inst_params
+                        break
         else:
             alias = name
 
@@ -882,17 +1080,16 @@ def find_matching_drivers(in_params):
 
 
 def find_visa_instrument(params):
-    import pyvisa
-    rm = pyvisa.ResourceManager()
+    pool = visa_resource_pool()
     visa_address = params['visa_address']
+    backend = params.get('visa_backend', '')
 
     if 'module' in params:
         driver_module = import_driver(params['module'], raise_errors=True)
         if hasattr(driver_module, '_instrument'):
             return driver_module._instrument(params)
 
-        log.info("Opening VISA resource '{}'".format(visa_address))
-        visa_inst = rm.open_resource(visa_address, open_timeout=50, timeout=200)
+        visa_inst = pool.acquire(visa_address, backend, open_timeout=50, timeout=200)
 
         if 'classname' in params:
             classname = params['classname']
@@ -908,8 +1105,7 @@ def find_visa_instrument(params):
         return create_instrument(driver_module, classname, params, visa_inst)
 
     else:
-        log.info("Opening VISA resource '{}'".format(visa_address))
-        visa_inst = rm.open_resource(visa_address, open_timeout=50, timeout=200)
+        visa_inst = pool.acquire(visa_address, backend, open_timeout=50, timeout=200)
 
         try:
             driver_module, classname = find_visa_driver_class(visa_inst)
@@ -918,6 +1114,7 @@ def find_visa_instrument(params):
             raise
 
         if hasattr(driver_module, '_instrument'):
+            visa_inst.close()  # The driver opens the instrument itself
             return driver_module._instrument(params)
         else:
             return create_instrument(driver_module, classname, params, visa_inst)
@@ -927,6 +1124,8 @@ def create_instrument(driver_module, classname, paramset, visa_inst=None):
     log.info("Creating instrument using default method")
     cls = getattr(driver_module, classname)
     if visa_inst is not None:
+        module = driver_submodule_name(driver_module.__name__)
+        visa_inst = iotrace.wrap(visa_inst, dict(paramset, module=module, classname=classname))
         return cls._create(paramset, _rsrc=visa_inst)
     else:
         return cls._create(paramset)
@@ -943,39 +1142,109 @@ def find_visa_instrument_by_module(in_paramset):
     raise Exception("No instrument from driver {} detected".format(driver_name))
 
 
+def _normalize_idn_field(value):
+    """Normalize case and whitespace of a manufacturer or model string"""
+    return ' '.join(value.split()).lower()
+
+
+class VisaDriverIndex(object):
+    """Lookup table from ``*IDN?`` manufacturer/model strings to VISA driver classes
+
+    Built from the ``visa_info`` entries of `driver_info`. Model strings containing the wildcards
+    ``*``, ``?``, or ``[...]`` (as in `fnmatch`) match families of models, e.g. ``'DPO4*'``. Exact
+    model matches take precedence over wildcard matches.
+    """
+    def __init__(self, info):
+        self.exact = {}  # (manufac, model) -> (driver_name, classname)
+        self.families = {}  # manufac -> list of (model_pattern, driver_name, classname)
+        self.visa_drivers = []  # All drivers with visa_info, in driver_info order
+        self.idn_drivers = set()  # Drivers which list at least one manufac/model
+
+        for driver_name, mod_info in info.items():
+            if 'visa_info' not in mod_info:
+                continue
+            self.visa_drivers.append(driver_name)
+
+            for classname, cls_info in mod_info['visa_info'].items():
+                if not cls_info:
+                    continue
+                manufac, models = cls_info
+                manufac = _normalize_idn_field(manufac)
+                self.idn_drivers.add(driver_name)
+
+                for model in models:
+                    model = _normalize_idn_field(model)
+                    if any(c in model for c in '*?['):
+                        self.families.setdefault(manufac, []).append((model, driver_name,
+                                                                      classname))
+                    else:
+                        self.exact.setdefault((manufac, model), (driver_name, classname))
+
+    def lookup(self, manufac, model):
+        """Get ``(driver_name, classname)`` for the given IDN strings, or None if unknown"""
+        manufac = _normalize_idn_field(manufac)
+        model = _normalize_idn_field(model)
+        try:
+            return self.exact[(manufac, model)]
+        except KeyError:
+            pass
+
+        for pattern, driver_name, classname in self.families.get(manufac, ()):
+            if fnmatchcase(model, pattern):
+                return driver_name, classname
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def visa_driver_index():
+    """Get the VisaDriverIndex of `driver_info`, building it on first use"""
+    return VisaDriverIndex(driver_info)
+
+
+# Maps (normalized IDN, module filter) to the (driver_name, classname) found by
+# `_check_visa_support()`. Failures aren't cached, since they may be transient (e.g. a timeout)
+_visa_support_cache = {}
+
+
 def find_visa_driver_class(visa_inst, module=None):
     """Search for the appropriate VISA driver, returning (driver_module, classname)
 
     First checks based on the manufacturer/model returned by ``*IDN?``, then ``_check_visa_support``
-    until a match is found. Raises an exception if no match is found.
+    until a match is found. Raises an exception if no match is found. A match found by
+    ``_check_visa_support`` is remembered for each distinct manufacturer/model.
     """
+    index = visa_driver_index()
     if module:
-        all_info = [(drv_name, mod_info['visa_info'])
-                    for (drv_name, mod_info) in driver_info.items()
-                    if 'visa_info' in mod_info and drv_name == module]
+        candidates = [name for name in index.visa_drivers if name == module]
     else:
-        all_info = [(drv_name, mod_info['visa_info'])
-                    for (drv_name, mod_info) in driver_info.items()
-                    if 'visa_info' in mod_info]
+        candidates = index.visa_drivers
 
-    module_supports_idn = any(info for _,info in all_info)
-    if module_supports_idn:
+    idn_key = None
+    if any(name in index.idn_drivers for name in candidates):
         log.info('Checking IDN...')
         inst_manufac, inst_model = get_idn(visa_inst)
 
         # Match IDN against driver manufac/model
         if inst_manufac:
-            for driver_fullname, visa_info in all_info:
-                log.info("Checking manufac/model against those in %s", driver_fullname)
-                for classname, (cls_manufac, cls_models) in visa_info.items():
-                    if inst_manufac == cls_manufac and inst_model in cls_models:
-                        log.info("Match found: %s, %s", driver_fullname, classname)
-                        driver_module = import_driver(driver_fullname, raise_errors=True)
-                        return driver_module, classname
+            match = index.lookup(inst_manufac, inst_model)
+            if match and (not module or match[0] == module):
+                driver_fullname, classname = match
+                log.info("Match found: %s, %s", driver_fullname, classname)
+                driver_module = import_driver(driver_fullname, raise_errors=True)
+                return driver_module, classname
+
+            idn_key = (_normalize_idn_field(inst_manufac), _normalize_idn_field(inst_model),
+                       module)
+            if idn_key in _visa_support_cache:
+                driver_fullname, classname = _visa_support_cache[idn_key]
+                log.info("Using previous `_check_visa_support()` match: %s, %s",
+                         driver_fullname, classname)
+                driver_module = import_driver(driver_fullname, raise_errors=True)
+                return driver_module, classname
 
     # Manually try visa-based drivers
     log.info('Checking support via `_check_visa_support()`...')
-    for driver_fullname, _ in all_info:
+    for driver_fullname in candidates:
         driver_module = import_driver(driver_fullname, raise_errors=False)
         if driver_module is None:
             continue
@@ -988,6 +1257,8 @@ def find_visa_driver_class(visa_inst, module=None):
         classname = driver_module._check_visa_support(visa_inst)
 
         if classname:
+            if idn_key:
+                _visa_support_cache[idn_key] = (driver_fullname, classname)
             return driver_module, classname
 
     raise Exception("No matching VISA driver found")
@@ -1084,9 +1355,31 @@ def find_full_params(normalized_params, driver_module):
         log.info("Driver module missing `list_instruments()`, not filling out paramset")
         return normalized_params
 
-    for inst_params in driver_module.list_instruments():
-        if inst_params.matches(normalized_params):
-            return inst_params
+    return find_module_paramset(driver_module, lambda p: p.matches(normalized_params))
+
+
+def find_module_paramset(driver_module, test):
+    """Find the first ParamSet listed by `driver_module` for which ``test(paramset)`` is true
+
+    Checks the discovery cache first, so the module's ``list_instruments()`` is only called if no
+    cached ParamSet passes the test. Its results then replace the module's cached ones.
+    """
+    from .discovery import discovery_cache
+    cache = discovery_cache()
+    mod_name = driver_submodule_name(driver_module.__name__)
+
+    for paramset in cache.get(mod_name) or ():
+        if test(paramset):
+            log.info("Found matching paramset %r in discovery cache", paramset)
+            return paramset
+
+    paramsets = list(driver_module.list_instruments())
+    cache.put(mod_name, paramsets)
+    for paramset in paramsets:
+        log.debug("Checking against %r", paramset)
+        if test(paramset):
+            return paramset
+    return None
 
 
 # Pretty hacky, but is actually the *least* crazy way I can think of doing this right now. Somehow
@@ -1122,31 +1415,65 @@ def instrument(inst=None, **kwargs):
     >>> inst2 = instrument(visa_address='TCPIP::192.168.1.34::INSTR')
     >>> inst3 = instrument({'visa_address': 'TCPIP:192.168.1.35::INSTR'})
     >>> inst4 = instrument(inst1)
+
+    Instruments found by previous searches are remembered in an on-disk cache (see
+    :class:`~instrumental.drivers.discovery.DiscoveryCache`), so that reopening them doesn't need
+    to search through hardware again. If opening an instrument from cached info fails, the cache
+    entries that were used are dropped and the search is retried once.
+
+    refresh : bool, optional
+        If True, clear the cache before searching for the instrument.
     """
     log.info('Called instrument() with inst=%s, kwargs=%s', inst, kwargs)
     if isinstance(inst, Instrument):
         return inst
 
-    with _reopen_context(kwargs.pop('reopen_policy', 'strict')):
-        params, alias = _extract_params(inst, kwargs)
-
-        if 'server' in params:
-            from . import remote
-            host = params['server']
-            session = remote.client_session(host)
-            inst = session.instrument(params)
-        elif 'visa_address' in params:
-            inst = find_visa_instrument(params)
-        elif 'module' in params and driver_takes_param(params['module'], 'visa_address'):
-            inst = find_visa_instrument_by_module(params)
-        else:
-            inst = find_nonvisa_instrument(params)
+    from .discovery import discovery_cache
+    cache = discovery_cache()
+    if kwargs.pop('refresh', False):
+        cache.invalidate()
 
-        if inst is None:
-            raise Exception("No instrument found that matches {}".format(params))
+    reopen_policy = kwargs.pop('reopen_policy', 'strict')
+    cache.track_served()
+    try:
+        with _reopen_context(reopen_policy):
+            return _open_instrument(inst, kwargs)
+    except InstrumentExistsError:
+        raise
+    except Exception:
+        stale_keys = cache.served()
+        if not stale_keys:
+            raise
+        log.info("Opening from cached params failed, retrying after refreshing %s", stale_keys)
+        cache.invalidate(list(stale_keys))
+        with _reopen_context(reopen_policy):
+            return _open_instrument(inst, kwargs)
+    finally:
+        cache.pop_served()
 
-        inst._alias = alias
-        return inst
+
+def _open_instrument(inst, kwargs):
+    params, alias = _extract_params(inst, kwargs)
+
+    if 'replay' in params:
+        inst = iotrace.open_replay(params)
+    elif 'server' in params:
+        from . import remote
+        host = params['server']
+        session = remote.client_session(host)
+        inst = session.instrument(params)
+    elif 'visa_address' in params:
+        inst = find_visa_instrument(params)
+    elif 'module' in params and driver_takes_param(params['module'], 'visa_address'):
+        inst = find_visa_instrument_by_module(params)
+    else:
+        inst = find_nonvisa_instrument(params)
+
+    if inst is None:
+        raise Exception("No instrument found that matches {}".format(params))
+
+    inst._alias = alias
+    return inst
 
 
 def register_cleanup(func):
@@ -1159,6 +1486,11 @@ def register_cleanup(func):
     return func
 
 
+@register_cleanup
+def _close_visa_pool():
+    visa_resource_pool().close_all()
+
+
 @atexit.register
 def _close_atexit():
     log.info('Program is exiting, closing all instruments...')
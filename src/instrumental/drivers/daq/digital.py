@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion between the values of digital channels and DAQmx port words.
+
+A digital channel is an ordered list of lines, possibly spread over several ports. Bit ``i`` of a
+channel's value belongs to its ``i``-th line, while DAQmx reads and writes uint32 words holding one
+byte per port, in the order the ports first appear in the channel. `LinePacker` precomputes a
+256-entry lookup table for each byte of the value (to pack) and of the word (to unpack), so
+converting an array of samples is a handful of NumPy table lookups, whatever the line order.
+"""
+import numpy as np
+
+__all__ = ['LinePacker']
+
+
+class LinePacker(object):
+    """Packs channel values into DAQmx port words and unpacks them, using lookup tables
+
+    Parameters
+    ----------
+    line_pairs : list of (str, str)
+        The channel's ``(port_name, line_name)`` pairs, e.g. ``('port0', 'line3')``, in order
+    """
+    def __init__(self, line_pairs):
+        if not 0 < len(line_pairs) <= 32:
+            raise ValueError("A digital channel must have between 1 and 32 lines")
+        self.ports = []
+        for port_name, _ in line_pairs:
+            if port_name not in self.ports:
+                self.ports.append(port_name)
+
+        # Bit of the port word that each bit of the value maps to
+        word_bits = [8*self.ports.index(port_name) + int(line_name.replace('line', ''))
+                     for port_name, line_name in line_pairs]
+        if max(word_bits) > 31:
+            raise ValueError("The lines of a digital channel must fit in a 32-bit port word")
+        self.num_lines = len(word_bits)
+
+        byte_vals = np.arange(256, dtype=np.uint32)
+        n_value_bytes = (self.num_lines + 7) // 8
+        n_word_bytes = max(word_bits) // 8 + 1
+        self._pack_tables = np.zeros((n_value_bytes, 256), dtype=np.uint32)
+        self._unpack_tables = np.zeros((n_word_bytes, 256), dtype=np.uint32)
+        for value_bit, word_bit in enumerate(word_bits):
+            bit_set = (byte_vals >> (value_bit % 8)) & 1
+            self._pack_tables[value_bit // 8] |= bit_set << np.uint32(word_bit)
+            bit_set = (byte_vals >> (word_bit % 8)) & 1
+            self._unpack_tables[word_bit // 8] |= bit_set << np.uint32(value_bit)
+
+    @staticmethod
+    def _lookup(tables, arr, out):
+        """Look up each byte of `arr` in its table, ORing the entries together"""
+        arr = np.asarray(arr)
+        if arr.ndim == 0:
+            return LinePacker._lookup(tables, arr.reshape(1), None)[0]
+
+        # View as little-endian bytes, one column per byte
+        arr = np.ascontiguousarray(arr, dtype='<u4')
+        columns = arr.view(np.uint8).reshape(arr.shape + (4,))
+        if out is None:
+            out = np.empty(arr.shape, dtype=np.uint32)
+
+        np.take(tables[0], columns[..., 0], out=out)
+        if len(tables) > 1:
+            entries = np.empty_like(out)
+            for i in range(1, len(tables)):
+                np.take(tables[i], columns[..., i], out=entries)
+                out |= entries
+        return out
+
+    def pack(self, values, out=None):
+        """Convert channel values to port words
+
+        Parameters
+        ----------
+        values : int or array of ints or bools
+            Values whose bit ``i`` is the state of the channel's ``i``-th line. Higher bits are
+            ignored.
+        out : array of uint32, optional
+            Array to write the words into
+
+        Returns
+        -------
+        uint32 or array of uint32
+        """
+        return self._lookup(self._pack_tables, values, out)
+
+    def unpack(self, words, out=None):
+        """Convert port words to channel values
+
+        Parameters
+        ----------
+        words : int or array of ints
+            Port words, as read by DAQmx
+        out : array of uint32, optional
+            Array to write the values into
+
+        Returns
+        -------
+        uint32 or array of uint32
+            Values whose bit ``i`` is the state of the channel's ``i``-th line
+        """
+        return self._lookup(self._unpack_tables, words, out)
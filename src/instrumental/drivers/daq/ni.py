@@ -5,9 +5,12 @@ from past.builtins import unicode, basestring
 
 import sys
 import time
+import queue
 import weakref
+import threading
 from enum import Enum, EnumMeta
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from collections.abc import MutableMapping
 
 import numpy as np
 from nicelib import (NiceLib, load_lib, RetHandler,
@@ -16,12 +19,18 @@ from nicelib import (NiceLib, load_lib, RetHandler,
 from ... import Q_, u
 from .. import ParamSet
 from ...errors import Error, TimeoutError
-from ..util import check_units, check_enums, as_enum
+from ..util import check_units, check_enums, as_enum, magnitude_as
 from ...util import to_str
 from . import DAQ
+from .digital import LinePacker
+from .streamfile import StreamWriter
 
 __all__ = ['NIDAQ', 'AnalogIn', 'AnalogOut', 'VirtualDigitalChannel', 'SampleMode', 'EdgeSlope',
-           'TerminalConfig', 'RelativeTo', 'ProductCategory', 'DAQError']
+           'TerminalConfig', 'RelativeTo', 'ProductCategory', 'DAQError', 'AIStream', 'StreamChunk',
+           'AIData', 'RawAIData', 'BufferRing', 'scale_raw']
+
+# DAQmx errors raised when acquired samples were lost before they could be read
+OVERFLOW_ERRORS = (-200279, -200361)
 
 
 def to_bytes(value, codec='utf-8'):
@@ -128,7 +137,8 @@ class NiceNI(NiceLib):
         CreateAOVoltageChan = Sig('in', 'in', 'in', 'in', 'in', 'in', 'in')
         CreateDIChan = Sig('in', 'in', 'in', 'in')
         CreateDOChan = Sig('in', 'in', 'in', 'in')
-        ReadAnalogF64 = Sig('in', 'in', 'in', 'in', 'arr', 'len=in', 'out', 'ignore')
+        ReadAnalogF64 = Sig('in', 'in', 'in', 'in', 'in', 'in', 'out', 'ignore')
+        ReadBinaryI16 = Sig('in', 'in', 'in', 'in', 'in', 'in', 'out', 'ignore')
         ReadAnalogScalarF64 = Sig('in', 'in', 'out', 'ignore')
         ReadDigitalScalarU32 = Sig('in', 'in', 'out', 'ignore')
         ReadDigitalU32 = Sig('in', 'in', 'in', 'in', 'arr', 'len=in', 'out', 'ignore')
@@ -146,6 +156,8 @@ class NiceNI(NiceLib):
         GetAOUseOnlyOnBrdMem = Sig('in', 'in', 'out')
         SetAOUseOnlyOnBrdMem = Sig('in', 'in', 'in')
         GetBufInputOnbrdBufSize = Sig('in', 'out')
+        GetReadAvailSampPerChan = Sig('in', 'out')
+        GetAIDevScalingCoeff = Sig('in', 'in', 'arr', 'len=4')
         SetWriteRegenMode = Sig('in', 'in')
 
         _sigs_ = sig_pattern((
@@ -593,11 +605,92 @@ class Task(object):
         return read_data
 
     @check_units(timeout='?s')
-    def read(self, timeout=None):
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
-        read_data = self._read_AI_channels(timeout_s)
+    def read(self, timeout=None, raw=False):
+        """Read the analog inputs
+
+        If `raw` is True, returns the unscaled int16 samples as a `RawAIData`, which moves a
+        quarter as many bytes as reading volts and defers scaling until it's needed.
+        """
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
+        read_data = self._read_AI_channels(timeout_s, raw)
         return read_data
 
+    @check_units(fsamp='Hz', timeout='?s')
+    def stream(self, fsamp, chunk_size, callback=None, buffer_size=None, max_queued=16,
+               timeout=None, raw=False, record=None, record_capacity=None):
+        """Continuously acquire from the analog inputs, delivering fixed-size chunks
+
+        Configures the task for continuous sampling at `fsamp`, starts it, and reads the analog
+        inputs on a background thread, `chunk_size` samples per channel at a time. Each chunk is
+        either passed to `callback` (on the background thread), or queued for iterating over the
+        returned `AIStream`::
+
+            >>> with task.stream('1 MHz', 100000) as stream:
+            ...     for chunk in stream:
+            ...         process(chunk.data)
+
+        Parameters
+        ----------
+        fsamp : Quantity
+            Sample frequency
+        chunk_size : int
+            Number of samples per channel in each chunk
+        callback : callable, optional
+            Function called with each `StreamChunk`. It must keep up with the acquisition.
+        buffer_size : int, optional
+            Size of the DAQmx input buffer, in samples per channel. Defaults to the larger of one
+            second of samples and eight chunks.
+        max_queued : int, optional
+            Maximum number of chunks waiting to be iterated over. When the queue is full, the
+            background thread waits for room, while samples build up in the DAQmx buffer.
+        timeout : Quantity, optional
+            Maximum time to wait for each chunk. Defaults to ten chunks' worth of time plus a
+            second.
+        raw : bool, optional
+            If True, chunks hold the unscaled int16 samples. Convert them to volts with
+            `AIStream.scale()`.
+        record : str, optional
+            Path of a stream file to record the chunks to, using a `StreamWriter` (see
+            `instrumental.drivers.daq.streamfile`). The chunks are then written to the file
+            instead of being queued for iteration, though they are still passed to `callback`.
+        record_capacity : int, optional
+            Number of samples per channel to preallocate in the recorded file, e.g. the expected
+            length of the acquisition
+
+        Returns
+        -------
+        AIStream
+            The running stream. Call its `stop()` method (or use it as a context manager) to end
+            the acquisition.
+        """
+        if not self.AIs:
+            raise ValueError("Streaming requires at least one analog input channel")
+        fsamp_hz = magnitude_as(fsamp, 'Hz')
+        if buffer_size is None:
+            buffer_size = max(int(fsamp_hz), 8 * chunk_size)
+        if timeout is None:
+            timeout_s = 10 * chunk_size / fsamp_hz + 1.
+        else:
+            timeout_s = float(magnitude_as(timeout, 's'))
+
+        self.set_timing(fsamp=fsamp, n_samples=buffer_size, mode='continuous')
+        mtasks = [dev_mtasks['AI'] for dev_mtasks in self._mtasks.values() if 'AI' in dev_mtasks]
+        stream = AIStream(self, mtasks, chunk_size, buffer_size, callback, max_queued, timeout_s,
+                          raw)
+        if record is not None:
+            stream.writer = StreamWriter(record, stream.channels, fsamp,
+                                         np.int16 if raw else np.float64, stream.coeffs,
+                                         capacity=record_capacity, max_queued=max_queued)
+            stream.writer.start_time = time.time()
+        try:
+            self.start()
+            stream._start()
+        except Exception:
+            if stream.writer is not None:
+                stream.writer.close()  # Don't leak its thread and open file
+            raise
+        return stream
+
     def write(self, write_data, autostart=True):
         """Write data to the output channels.
 
@@ -714,32 +807,44 @@ class Task(object):
         mtask = next(iter(dev_mtasks.values()))
         mtask.wait_until_done(timeout)
 
-    def _read_AI_channels(self, timeout_s):
-        """ Returns a dict containing the AI buffers. """
+    def _read_AI_channels(self, timeout_s, raw=False):
+        """ Returns a dict (or `AIData`) containing the AI buffers. """
         if len(self.AIs)==0:
             return {}
-        res={}
-        is_scalar=self.fsamp is None
-        for dev_mtasks in self._mtasks.values():
-            if 'AI' not in dev_mtasks:
-                continue
-            mx_task = dev_mtasks['AI']._mx_task
-            buf_size = self.n_samples * len(self.AIs)
-            data, n_samps_read = mx_task.ReadAnalogF64(
-                -1, timeout_s, Val.GroupByChannel, buf_size)
-
-            for i, ch in enumerate(self.AIs):
-                start = i * n_samps_read
-                stop = (i + 1) * n_samps_read
-                ch_data=data[start:stop] if not is_scalar else data[start]
-                res[ch.path]=Q_(ch_data, 'V')
-
-        if is_scalar:
+        mtasks = [dev_mtasks['AI'] for dev_mtasks in self._mtasks.values() if 'AI' in dev_mtasks]
+        chans = [chan for mtask in mtasks for chan in mtask.chans]
+        read_func = '_read_AI_raw_array' if raw else '_read_AI_array'
+        arrays = [getattr(mtask, read_func)(-1, timeout_s, max_samples=self.n_samples)
+                  for mtask in mtasks]
+
+        if raw:
+            n_samps_read = min(arr.shape[1] for arr in arrays)
+            data = arrays[0] if len(arrays) == 1 else np.concatenate(
+                [arr[:, :n_samps_read] for arr in arrays])
+            coeffs = np.concatenate([mtask.AI_scaling_coeffs() for mtask in mtasks])
+            return RawAIData(chans, data, coeffs, self.fsamp)
+
+        if self.fsamp is None:
+            res = {chan: Q_(value, 'V') for chan, value in zip(chans, np.vstack(arrays)[:, 0])}
             res['t'] = Q_(0., 's')
+            return res
+
+        if len(arrays) == 1:
+            data = arrays[0]
         else:
-            end_t = (n_samps_read - 1) / self.fsamp.m_as('Hz') if self.fsamp is not None else 0
-            res['t'] = Q_(np.linspace(0., end_t, n_samps_read), 's')
-        return res
+            n_samps_read = min(arr.shape[1] for arr in arrays)
+            data = np.concatenate([arr[:, :n_samps_read] for arr in arrays])
+        return AIData(chans, data, self.fsamp)
+
+    def use_buffer_ring(self, n_buffers):
+        """Read the analog inputs into a ring of `n_buffers` reused buffers
+
+        See `MiniTask.use_buffer_ring()`. Use ``n_buffers=0`` to allocate new buffers for each read
+        again.
+        """
+        for dev_mtasks in self._mtasks.values():
+            if 'AI' in dev_mtasks:
+                dev_mtasks['AI'].use_buffer_ring(n_buffers)
 
     def _write_AO_channels(self, data, autostart=True):
         if len(self.AOs) == 0:
@@ -753,7 +858,7 @@ class Task(object):
             ao_names = [name for (name, ch)
                         in self.channels.items() if ch.type == 'AO' and ch.daq.name == dev_name]
             arr = np.concatenate(
-                [Q_(data[ao]).to('V').magnitude for ao in ao_names]).astype(np.float64)
+                [magnitude_as(data[ao], 'V') for ao in ao_names]).astype(np.float64)
             n_samps_per_chan = len(list(data.values())[0].magnitude)
             mx_task.WriteAnalogF64(
                 n_samps_per_chan, autostart, -1., Val.GroupByChannel, arr)
@@ -767,10 +872,9 @@ class Task(object):
                 continue
             mx_task = dev_mtasks['DO']._mx_task
             # TODO: add check that input data is the right length
-            arr = np.fromiter((ch._create_DO_int(value)
-                               for (ch_name, ch) in self.channels.items() if ch.type == 'DO'
-                               for value in data[ch_name]),
-                              dtype='uint32')
+            arr = np.concatenate([ch._packer.pack(data[ch_name])
+                                  for (ch_name, ch) in self.channels.items()
+                                  if ch.type == 'DO' and ch.daq.name == dev_name])
             n_samps_per_chan = len(list(data.values())[0])
             mx_task.WriteDigitalU32(n_samps_per_chan, autostart, -1, Val.GroupByChannel, arr)
 
@@ -790,6 +894,364 @@ class Task(object):
         self.clear()
 
 
+class AIData(MutableMapping):
+    """Analog input samples, as a dict-like mapping of channel paths to voltage arrays
+
+    The samples of all channels share a single float64 array, `array`, with one row per channel,
+    and each channel's value is a `Quantity` view of its row. The ``'t'`` entry is the time axis,
+    which is only computed when first accessed. Other entries may be added, as with a dict.
+
+    Attributes
+    ----------
+    channels : list of str
+        Paths of the channels, in the order of the rows of `array`
+    array : array of float64
+        Voltages, of shape (channels, samples)
+    fsamp : Quantity or None
+        Sample frequency
+    offset : int
+        Index of the first sample, used as the start of the time axis
+    """
+    def __init__(self, channels, array, fsamp=None, offset=0):
+        self.channels = list(channels)
+        self.array = array
+        self.fsamp = fsamp
+        self.offset = offset
+        self._rows = {chan: i for i, chan in enumerate(self.channels)}
+        self._extra = {}
+
+    @property
+    def n_samples(self):
+        return self.array.shape[1]
+
+    def time(self):
+        """Compute the time axis of the samples"""
+        if self.fsamp is None:
+            return Q_(np.zeros(self.n_samples), 's')
+        fsamp_hz = magnitude_as(self.fsamp, 'Hz')
+        return Q_(np.arange(self.offset, self.offset + self.n_samples) / fsamp_hz, 's')
+
+    def __getitem__(self, key):
+        try:
+            return self._extra[key]
+        except KeyError:
+            pass
+        if key == 't':
+            t = self._extra['t'] = self.time()
+            return t
+        return Q_(self.array[self._rows[key]], 'V')
+
+    def __setitem__(self, key, value):
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._rows:
+            raise KeyError("Can't delete channel {!r}".format(key))
+        del self._extra[key]
+
+    def __iter__(self):
+        for chan in self.channels:
+            yield chan
+        if 't' not in self._extra:
+            yield 't'
+        for key in self._extra:
+            if key not in self._rows:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        return key in self._rows or key == 't' or key in self._extra
+
+    def __repr__(self):
+        return '<AIData: {} channels x {} samples>'.format(len(self.channels), self.n_samples)
+
+
+class RawAIData(AIData):
+    """Unscaled analog input samples, as read from the device's ADC
+
+    `array` holds int16 samples with one row per channel, and `coeffs` holds each channel's scaling
+    polynomial. A channel's value is scaled to volts each time it is accessed; use `scaled()` to
+    convert all channels at once.
+
+    Attributes
+    ----------
+    coeffs : array of float64
+        Polynomial coefficients of shape (channels, 4), in order of increasing power, converting
+        each channel's raw samples to volts
+    """
+    def __init__(self, channels, array, coeffs, fsamp=None, offset=0):
+        super(RawAIData, self).__init__(channels, array, fsamp, offset)
+        self.coeffs = coeffs
+
+    def scaled(self, out=None):
+        """Convert the samples to volts, returning an `AIData`
+
+        `out` may be given as a float64 array of the same shape as `array` to scale into.
+        """
+        return AIData(self.channels, scale_raw(self.array, self.coeffs, out), self.fsamp,
+                      self.offset)
+
+    def __getitem__(self, key):
+        if key in self._rows and key not in self._extra:
+            i = self._rows[key]
+            return Q_(scale_raw(self.array[i:i+1], self.coeffs[i:i+1])[0], 'V')
+        return super(RawAIData, self).__getitem__(key)
+
+    def __repr__(self):
+        return '<RawAIData: {} channels x {} samples>'.format(len(self.channels), self.n_samples)
+
+
+def scale_raw(raw, coeffs, out=None, chunk_size=1 << 16):
+    """Convert raw samples to volts using per-channel scaling polynomials
+
+    Evaluates each channel's polynomial in place in `out`, `chunk_size` samples at a time so that
+    each chunk stays in cache, without any temporary arrays.
+
+    Parameters
+    ----------
+    raw : array
+        Raw samples, with one row per channel, or a single channel's 1D array
+    coeffs : array
+        Coefficients of each channel's polynomial, in order of increasing power, with one row
+        per channel (or a single row for 1D `raw`)
+    out : array of float64, optional
+        Array of the same shape as `raw` to write the result into
+
+    Returns
+    -------
+    array of float64
+        The scaled samples, in volts
+    """
+    raw = np.asarray(raw)
+    coeffs = np.asarray(coeffs, dtype=np.float64)
+    if out is None:
+        out = np.empty(raw.shape, dtype=np.float64)
+    elif out.shape != raw.shape:
+        raise ValueError("out has shape {}, but raw has shape {}".format(out.shape, raw.shape))
+
+    n_samples = raw.shape[-1]
+    rows = zip(raw, out, coeffs) if raw.ndim == 2 else [(raw, out, coeffs)]
+    for row_in, row_out, poly in rows:
+        poly = np.trim_zeros(poly, 'b') if poly.any() else poly[:1]
+        for start in range(0, n_samples, chunk_size):
+            x = row_in[start:start + chunk_size]
+            y = row_out[start:start + chunk_size]
+            y.fill(poly[-1])
+            for c in poly[-2::-1]:  # Horner's method
+                y *= x
+                y += c
+    return out
+
+
+class BufferRing(object):
+    """A fixed number of preallocated arrays, handed out in turn
+
+    An array returned by `next()` is handed out again after `n_buffers` further calls with the same
+    dtype, so anything read into it must be used or copied before then. Asking for a different
+    shape reallocates that dtype's arrays.
+    """
+    def __init__(self, n_buffers):
+        if n_buffers < 1:
+            raise ValueError("A BufferRing needs at least one buffer")
+        self.n_buffers = n_buffers
+        self._rings = {}  # dtype -> [shape, index, buffers]
+
+    def next(self, shape, dtype=np.float64):
+        dtype = np.dtype(dtype)
+        ring = self._rings.get(dtype)
+        if ring is None or ring[0] != shape:
+            ring = self._rings[dtype] = [shape, 0, [np.empty(shape, dtype)
+                                                    for _ in range(self.n_buffers)]]
+        index = ring[1]
+        ring[1] = (index + 1) % self.n_buffers
+        return ring[2][index]
+
+
+StreamChunk = namedtuple('StreamChunk', ['start', 'data'])
+StreamChunk.__doc__ = """A chunk of streamed samples
+
+``start`` is the index of the chunk's first sample since the start of the stream, and ``data`` is
+a float64 array of voltages (or of int16 raw samples, for a raw stream) with one row per channel
+(see `AIStream.channels`). To avoid allocating memory for each chunk, ``data`` is one of a ring of
+reused buffers; it remains valid until the next chunk is taken from the stream (or the next
+callback returns), so copy it to keep it longer.
+"""
+_STREAM_END = object()
+
+
+class AIStream(object):
+    """Continuous analog input acquisition running on a background thread
+
+    Created by `Task.stream()`. Iterate over the stream to get each `StreamChunk` in order, unless
+    a callback was given or it is recording to a file (in which case iterating just waits for the
+    stream to stop). Iteration ends when the stream is stopped, and raises any error that stopped
+    the acquisition (e.g. a `DAQError` if samples were lost) once the chunks read before it have
+    been consumed.
+
+    Attributes
+    ----------
+    channels : list of str
+        Paths of the channels, in the order of the rows of each chunk's data
+    overflowed : bool
+        Whether samples were lost because the DAQmx buffer overflowed
+    coeffs : array or None
+        For a raw stream, the polynomial coefficients that scale each channel's samples to volts
+        (see `scale_raw()`)
+    writer : StreamWriter or None
+        The writer chunks are recorded with, if any. It is closed when the stream stops.
+    """
+    def __init__(self, task, mtasks, chunk_size, buffer_size, callback, max_queued, timeout_s,
+                 raw=False):
+        self.task = task
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.channels = [chan for mtask in mtasks for chan in mtask.chans]
+        self.raw = raw
+        self.coeffs = (np.concatenate([mtask.AI_scaling_coeffs() for mtask in mtasks])
+                       if raw else None)
+        self.overflowed = False
+        self._mtasks = mtasks
+        self._callback = callback
+        self._timeout_s = timeout_s
+        self._queue = queue.Queue(max_queued)
+        # Enough buffers for one being filled, a full queue, and one being consumed
+        self._buffers = BufferRing(2 if callback is not None else max_queued + 2)
+        self._stop_event = threading.Event()
+        self.error = None
+        self.writer = None
+        self._thread = threading.Thread(target=self._run, name='AIStream')
+        self._thread.daemon = True
+
+        self._n_chunks = 0
+        self._n_blocked = 0
+        self._blocked_time = 0.
+        self._max_queued = 0
+        self._max_backlog = 0
+
+    def _start(self):
+        self._thread.start()
+
+    def _run(self):
+        start = 0
+        avail_funcs = [getattr(mtask._mx_task, 'GetReadAvailSampPerChan', None)
+                       for mtask in self._mtasks]
+        dtype = np.int16 if self.raw else np.float64
+        try:
+            while not self._stop_event.is_set():
+                data = self._buffers.next((len(self.channels), self.chunk_size), dtype)
+                row = 0
+                for mtask, get_avail in zip(self._mtasks, avail_funcs):
+                    if get_avail is not None:
+                        self._max_backlog = max(self._max_backlog, get_avail())
+                    n_chans = len(mtask.chans)
+                    read_func = mtask._read_AI_raw_array if self.raw else mtask._read_AI_array
+                    read_func(self.chunk_size, self._timeout_s, out=data[row:row + n_chans])
+                    row += n_chans
+                self._deliver(StreamChunk(start, data))
+                start += self.chunk_size
+                self._n_chunks += 1
+        except DAQError as e:
+            if not self._stop_event.is_set():
+                self.overflowed = e.code in OVERFLOW_ERRORS
+                self.error = e
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.writer is not None:
+                try:
+                    self.writer.close()
+                except Exception as e:
+                    if self.error is None:
+                        self.error = e
+            self._deliver(_STREAM_END)
+
+    def _deliver(self, chunk):
+        if self._callback is not None or self.writer is not None:
+            if chunk is not _STREAM_END:
+                if self.writer is not None:
+                    self.writer.write(chunk.data)
+                if self._callback is not None:
+                    self._callback(chunk)
+            return
+
+        try:
+            self._queue.put_nowait(chunk)
+        except queue.Full:
+            self._n_blocked += 1
+            t_start = time.perf_counter()
+            while True:
+                try:
+                    self._queue.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stop_event.is_set():
+                        return
+            self._blocked_time += time.perf_counter() - t_start
+        self._max_queued = max(self._max_queued, self._queue.qsize())
+
+    def __iter__(self):
+        while True:
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._thread.is_alive():
+                    continue
+                break  # Stopped while the queue was full, so the end marker was dropped
+            if chunk is _STREAM_END:
+                break
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        """Stop the acquisition and its background thread"""
+        self._stop_event.set()
+        try:
+            self.task.stop()
+        finally:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def scale(self, data, out=None):
+        """Convert a raw chunk's data to volts, as a float64 array (into `out` if given)"""
+        return scale_raw(data, self.coeffs, out)
+
+    def stats(self):
+        """Get a dict of statistics about the stream
+
+        Includes the number of `chunks` read, the number of times the background thread was
+        `blocked` by a full queue and the total `blocked_time` in seconds, the current and maximum
+        number of chunks `queued`, the `max_backlog` of samples per channel waiting in the DAQmx
+        buffer of size `buffer_size`, and whether the buffer `overflowed`. When recording, the
+        `writer` entry holds the `StreamWriter`'s statistics.
+        """
+        stats = {
+            'chunks': self._n_chunks,
+            'samples': self._n_chunks * self.chunk_size,
+            'blocked': self._n_blocked,
+            'blocked_time': self._blocked_time,
+            'queued': self._queue.qsize(),
+            'max_queued': self._max_queued,
+            'max_backlog': self._max_backlog,
+            'buffer_size': self.buffer_size,
+            'overflowed': self.overflowed,
+        }
+        if self.writer is not None:
+            stats['writer'] = self.writer.stats()
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+
 def mk_property(name, conv_in, conv_out, doc=None):
     getter_name = 'Get' + name
     setter_name = 'Set' + name
@@ -824,6 +1286,9 @@ class MiniTask(object):
         self.chans = []
         self.fsamp = None
         self.has_trigger = False
+        self._buffers = None
+        self._scaling_coeffs = None
+        self._di_packer = None
 
     def __enter__(self):
         return self
@@ -852,7 +1317,8 @@ class MiniTask(object):
     @check_units(fsamp='Hz')
     def config_timing(self, fsamp, n_samples, mode='finite', edge='rising', clock=''):
         clock = to_bytes(clock)
-        self._mx_task.CfgSampClkTiming(clock, fsamp.m_as('Hz'), edge.value, mode.value, n_samples)
+        self._mx_task.CfgSampClkTiming(clock, magnitude_as(fsamp, 'Hz'), edge.value, mode.value,
+                                       n_samples)
 
         # Save for later
         self.n_samples = n_samples
@@ -862,7 +1328,7 @@ class MiniTask(object):
     @check_units(level='V')
     def config_analog_edge_trigger(self, source, edge='rising', level='2.5 V'):
         source_path = source if isinstance(source, basestring) else source.path
-        self._mx_task.CfgAnlgEdgeStartTrig(source_path, edge.value, level.m_as('V'))
+        self._mx_task.CfgAnlgEdgeStartTrig(source_path, edge.value, magnitude_as(level, 'V'))
 
     @check_enums(edge=EdgeSlope)
     def config_digital_edge_trigger(self, source, edge='rising', n_pretrig_samples=0):
@@ -937,18 +1403,20 @@ class MiniTask(object):
         self._assert_io_type('AI')
         ai_path = ai if isinstance(ai, basestring) else ai.path
         self.chans.append(ai_path)
+        self._scaling_coeffs = None
         default_min, default_max = self.daq._max_AI_range()
         vmin = default_min if vmin is None else vmin
         vmax = default_max if vmax is None else vmax
-        self._mx_task.CreateAIVoltageChan(ai_path, '', term_cfg.value, vmin.m_as('V'),
-                                          vmax.m_as('V'), Val.Volts, '')
+        self._mx_task.CreateAIVoltageChan(ai_path, '', term_cfg.value, magnitude_as(vmin, 'V'),
+                                          magnitude_as(vmax, 'V'), Val.Volts, '')
 
     def add_AO_channel(self, ao):
         self._assert_io_type('AO')
         ao_path = ao if isinstance(ao, basestring) else ao.path
         self.chans.append(ao_path)
         min, max = self.daq._max_AO_range()
-        self._mx_task.CreateAOVoltageChan(ao_path, '', min.m_as('V'), max.m_as('V'), Val.Volts, '')
+        self._mx_task.CreateAOVoltageChan(ao_path, '', magnitude_as(min, 'V'),
+                                          magnitude_as(max, 'V'), Val.Volts, '')
 
     def add_DI_channel(self, di, split_lines=False):
         self._assert_io_type('DI')
@@ -972,43 +1440,112 @@ class MiniTask(object):
     @check_units(timeout='?s')
     def read_AI_scalar(self, timeout=None):
         self._assert_io_type('AI')
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
         value = self._mx_task.ReadAnalogScalarF64(timeout_s)
         return Q_(value, 'V')
 
+    def use_buffer_ring(self, n_buffers):
+        """Read into a ring of `n_buffers` preallocated buffers instead of allocating for each read
+
+        The data returned by a read is then overwritten `n_buffers` reads later, so it must be
+        used or copied before then. Use ``n_buffers=0`` to allocate new buffers for each read.
+        """
+        self._buffers = BufferRing(n_buffers) if n_buffers else None
+
     @check_units(timeout='?s')
-    def read_AI_channels(self, samples=-1, timeout=None):
-        """Perform an AI read and get a dict containing the AI buffers"""
+    def read_AI_channels(self, samples=-1, timeout=None, out=None):
+        """Perform an AI read and get an `AIData` containing the AI buffers
+
+        Parameters
+        ----------
+        samples : int, optional
+            Number of samples per channel to read. If -1, reads all available samples.
+        timeout : Quantity, optional
+            Maximum time to wait for the samples
+        out : array of float64, optional
+            C-contiguous buffer to read into, with room for `samples` samples of each channel
+            (or a full input buffer's worth if `samples` is -1). Its start is filled channel by
+            channel, and the returned data are views of it.
+        """
         self._assert_io_type('AI')
-        samples = int(samples)
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
+        data = self._read_AI_array(int(samples), timeout_s, out)
+        return AIData(self.chans, data, self.fsamp)
+
+    @check_units(timeout='?s')
+    def read_AI_raw(self, samples=-1, timeout=None, out=None):
+        """Perform an AI read of unscaled int16 samples, and get them as a `RawAIData`
+
+        Takes the same arguments as `read_AI_channels()`, but `out` must be an int16 array. Raw
+        samples are only complete for devices whose ADCs have at most 16 bits.
+        """
+        self._assert_io_type('AI')
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
+        data = self._read_AI_raw_array(int(samples), timeout_s, out)
+        return RawAIData(self.chans, data, self.AI_scaling_coeffs(), self.fsamp)
 
-        if samples == -1:
-            buf_size = self._mx_task.GetBufInputBufSize() * len(self.chans)
+    def AI_scaling_coeffs(self):
+        """Get the polynomial coefficients that scale each channel's raw samples to volts
+
+        Returns an array of shape (channels, 4), in order of increasing power.
+        """
+        if self._scaling_coeffs is None:
+            self._scaling_coeffs = np.array([self._mx_task.GetAIDevScalingCoeff(chan)
+                                             for chan in self.chans], dtype=np.float64)
+        return self._scaling_coeffs
+
+    def _input_buffer(self, samples, out, max_samples, dtype):
+        """Get the flat buffer to read `samples` samples per channel into"""
+        n_chans = len(self.chans)
+        if samples != -1:
+            buf_samples = samples
+        elif max_samples is not None:
+            buf_samples = max_samples
         else:
-            buf_size = samples * len(self.chans)
+            buf_samples = self._mx_task.GetBufInputBufSize()
 
-        data, n_samples_read = self._mx_task.ReadAnalogF64(samples, timeout_s, Val.GroupByChannel,
-                                                           buf_size)
-        res = {}
-        for i, ch_name in enumerate(self.chans):
-            start = i * n_samples_read
-            stop = (i+1) * n_samples_read
-            res[ch_name] = Q_(data[start:stop], 'V')
-        res['t'] = Q_(np.linspace(0, n_samples_read/self.fsamp.m_as('Hz'),
-                                  n_samples_read, endpoint=False), 's')
-        return res
+        if out is None:
+            if self._buffers is None:
+                out = np.empty((n_chans, buf_samples), dtype)
+            else:
+                out = self._buffers.next((n_chans, buf_samples), dtype)
+        elif (out.dtype != dtype or not out.flags.c_contiguous or
+              out.size < n_chans * buf_samples):
+            raise ValueError("out must be a C-contiguous {} array with room for {} samples "
+                             "of {} channels".format(np.dtype(dtype).name, buf_samples, n_chans))
+        return out.reshape(-1)
+
+    def _read_AI_array(self, samples, timeout_s, out=None, max_samples=None):
+        """Read `samples` samples per channel, as an array with one row per channel
+
+        If `samples` is -1, reads all available samples, up to `max_samples` (by default, the
+        size of the input buffer). Reads into `out` if given, otherwise into the next buffer of
+        the ring if one is in use, otherwise into a new array.
+        """
+        n_chans = len(self.chans)
+        flat = self._input_buffer(samples, out, max_samples, np.float64)
+        n_samples_read = self._mx_task.ReadAnalogF64(samples, timeout_s, Val.GroupByChannel,
+                                                     flat, flat.size)
+        return flat[:n_samples_read * n_chans].reshape(n_chans, n_samples_read)
+
+    def _read_AI_raw_array(self, samples, timeout_s, out=None, max_samples=None):
+        """Like `_read_AI_array()`, but reads unscaled int16 samples"""
+        n_chans = len(self.chans)
+        flat = self._input_buffer(samples, out, max_samples, np.int16)
+        n_samples_read = self._mx_task.ReadBinaryI16(samples, timeout_s, Val.GroupByChannel,
+                                                     flat, flat.size)
+        return flat[:n_samples_read * n_chans].reshape(n_chans, n_samples_read)
 
     @check_units(value='V', timeout='?s')
     def write_AO_scalar(self, value, timeout=None):
         self._assert_io_type('AO')
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
-        self._mx_task.WriteAnalogScalarF64(True, timeout_s, float(value.m_as('V')))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
+        self._mx_task.WriteAnalogScalarF64(True, timeout_s, float(magnitude_as(value, 'V')))
 
     @check_units(timeout='?s')
     def read_DI_scalar(self, timeout=None):
         self._assert_io_type('DI')
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
         value = self._mx_task.ReadDigitalScalarU32(timeout_s)
         return value
 
@@ -1018,7 +1555,7 @@ class MiniTask(object):
         self._assert_io_type('DI')
         is_scalar = False  # self.fsamp is None
         samples = int(samples)
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
 
         if is_scalar:
             buf_size = 1 * len(self.chans)
@@ -1039,7 +1576,7 @@ class MiniTask(object):
             res[ch_name] = self._reorder_digital_int(ch_res)
 
         if self.fsamp is not None:
-            end_t = (n_samples_per_chan_read-1) / self.fsamp.m_as('Hz')
+            end_t = (n_samples_per_chan_read-1) / magnitude_as(self.fsamp, 'Hz')
             res['t'] = Q_(np.linspace(0., end_t, n_samples_per_chan_read), 's')
         return res
 
@@ -1050,30 +1587,14 @@ class MiniTask(object):
         if len(lines) == 1:
             return data.astype(bool)
 
-        line_pairs = []
-        ports = []
-        for line_path in lines:
-            dev, port, line = line_path.split('/')
-            line_pairs.append((port, line))
-            if port not in ports:
-                ports.append(port)
-
-        port_bytes = {}
-        for i, port_name in enumerate(ports):
-            port_byte = ((0xFF << 8*i) & data) >> 8*i
-            port_bytes[port_name] = port_byte
-
-        out = np.zeros(data.shape)
-        for i, (port_name, line_name) in enumerate(line_pairs):
-            line_num = int(line_name.replace('line', ''))
-            port_byte = port_bytes[port_name]
-            out += ((port_byte & (1 << line_num)) >> line_num) << i
-        return out
+        if self._di_packer is None:
+            self._di_packer = LinePacker([line_path.split('/')[1:] for line_path in lines])
+        return self._di_packer.unpack(data)
 
     @check_units(timeout='?s')
     def write_DO_scalar(self, value, timeout=None):
         self._assert_io_type('DO')
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
         self._mx_task.WriteDigitalScalarU32(True, timeout_s, value)
 
     @check_units(timeout='?s')
@@ -1086,7 +1607,7 @@ class MiniTask(object):
             The maximum amount of time to wait. If None, waits indefinitely. Raises a TimeoutError
             if the timeout is reached.
         """
-        timeout_s = float(-1. if timeout is None else timeout.m_as('s'))
+        timeout_s = float(-1. if timeout is None else magnitude_as(timeout, 's'))
         try:
             self._mx_task.WaitUntilTaskDone(timeout_s)
         except DAQError as e:
@@ -1109,8 +1630,8 @@ class MiniTask(object):
 
     def write_AO_channels(self, data, timeout=-1.0, autostart=True):
         if timeout != -1.0:
-            timeout = float(Q_(timeout).m_as('s'))
-        arr = np.concatenate([data[ao].m_as('V') for ao in self.chans]).astype(np.float64)
+            timeout = float(magnitude_as(timeout, 's'))
+        arr = np.concatenate([magnitude_as(data[ao], 'V') for ao in self.chans]).astype(np.float64)
         n_samples = len(list(data.values())[0].magnitude)
         self._mx_task.WriteAnalogF64(n_samples, autostart, timeout, Val.GroupByChannel, arr)
 
@@ -1154,8 +1675,8 @@ class AnalogIn(Channel):
     def _add_to_minitask(self, minitask, term_cfg='default'):
         min, max = self.daq._max_AI_range()
         mx_task = minitask._mx_task
-        mx_task.CreateAIVoltageChan(self.path, '', term_cfg.value, min.m_as('V'), max.m_as('V'),
-                                    Val.Volts, '')
+        mx_task.CreateAIVoltageChan(self.path, '', term_cfg.value, magnitude_as(min, 'V'),
+                                    magnitude_as(max, 'V'), Val.Volts, '')
 
     @check_units(duration='?s', fsamp='?Hz')
     def read(self, duration=None, fsamp=None, n_samples=None, vmin=None, vmax=None,
@@ -1233,7 +1754,8 @@ class AnalogOut(Channel):
     def _add_to_minitask(self, minitask):
         min, max = self.daq._max_AO_range()
         mx_task = minitask._mx_task
-        mx_task.CreateAOVoltageChan(self.path, '', min.m_as('V'), max.m_as('V'), Val.Volts, '')
+        mx_task.CreateAOVoltageChan(self.path, '', magnitude_as(min, 'V'), magnitude_as(max, 'V'),
+                                    Val.Volts, '')
 
     @check_units(duration='?s', fsamp='?Hz')
     def read(self, duration=None, fsamp=None, n_samples=None):
@@ -1369,10 +1891,8 @@ class VirtualDigitalChannel(Channel):
         self.direction = None
         self.name = self._generate_name()
         self.num_lines = len(line_pairs)
-        self.ports = []
-        for port_name, line_name in line_pairs:
-            if port_name not in self.ports:
-                self.ports.append(port_name)
+        self._packer = LinePacker(line_pairs)
+        self.ports = self._packer.ports
 
     def _generate_name(self):
         """Fold up ranges. e.g. 1,2,3,4 -> 1:4"""
@@ -1452,30 +1972,12 @@ class VirtualDigitalChannel(Channel):
 
     def _create_DO_int(self, value):
         """Convert nice value to that required by write_DO_scalar()"""
-        out_val = 0
-        for i, (port_name, line_name) in enumerate(self.line_pairs):
-            line_num = int(line_name.replace('line', ''))
-            bit = (value & (1 << i)) >> i
-            byte = bit << line_num
-            byte_num = self.ports.index(port_name)
-            out_val += byte << 8*byte_num
-        return out_val
+        return int(self._packer.pack(value))
 
     def _parse_DI_int(self, value):
         if self.num_lines == 1:
             return bool(value)
-
-        port_bytes = {}
-        for i, port_name in enumerate(self.ports):
-            port_byte = ((0xFF << 8*i) & value) >> 8*i
-            port_bytes[port_name] = int(port_byte)
-
-        out = 0
-        for i, (port_name, line_name) in enumerate(self.line_pairs):
-            line_num = int(line_name.replace('line', ''))
-            port_byte = port_bytes[port_name]
-            out += ((port_byte & (1 << line_num)) >> line_num) << i
-        return out
+        return int(self._packer.unpack(value))
 
     @check_units(duration='?s', fsamp='?Hz')
     def read(self, duration=None, fsamp=None, n_samples=None):
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Recording of streamed DAQ samples to disk.
+
+A stream file starts with `MAGIC`, the header's total size as a little-endian uint32, and a JSON
+header, padded to a multiple of `HEADER_ALIGNMENT` bytes with room to spare for its final rewrite.
+The samples follow as a C-ordered array of shape (samples, channels), so that each chunk is
+appended after the last. The header holds the channel paths, the sample rate, the start time,
+the dtype and number of samples, any extra metadata, and for raw samples each channel's scaling
+polynomial.
+
+`StreamWriter` appends chunks on its own thread through a preallocated `numpy.memmap`, which is
+grown as needed, so acquisitions larger than memory can be recorded. `StreamFile` maps a recording
+for reading. Recordings are usually made with ``Task.stream(..., record=path)``.
+"""
+import os
+import json
+import time
+import queue
+import struct
+import threading
+
+import numpy as np
+
+from ... import Q_
+from ..util import magnitude_as
+from ...log import get_logger
+
+log = get_logger(__name__)
+
+__all__ = ['StreamWriter', 'StreamFile']
+
+MAGIC = b'IVSTREAM'
+HEADER_ALIGNMENT = 4096  # Keeps the samples page-aligned
+HEADER_SLACK = 64  # Extra bytes reserved for values that may grow, e.g. `start_time`
+VERSION = 1
+DEFAULT_CAPACITY = 1 << 20  # Samples per channel preallocated when no capacity is given
+_SIZE = struct.Struct('<I')
+_MAX_SAMPLES = 2**63 - 1  # Stands in for the final `n_samples` when sizing the header
+
+
+def _header_size(header):
+    """Get the size to reserve for `header`, rounded up to a multiple of `HEADER_ALIGNMENT`"""
+    n_bytes = len(MAGIC) + _SIZE.size + len(json.dumps(header).encode('utf-8')) + HEADER_SLACK
+    return -(-n_bytes // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+
+
+def _write_header(f, header, size):
+    header_bytes = MAGIC + _SIZE.pack(size) + json.dumps(header).encode('utf-8')
+    if len(header_bytes) > size:
+        raise ValueError("Stream file header has outgrown its {} bytes".format(size))
+    f.seek(0)
+    f.write(header_bytes.ljust(size, b' '))
+
+
+class StreamWriter(object):
+    """Writes chunks of samples to a stream file on a background thread
+
+    `write()` copies each chunk into one of `max_queued` reusable buffers and queues it, so the
+    caller's buffer can be reused right away. When every buffer is waiting to be written, `write()`
+    blocks until one is free. Call `close()` when done, which finishes writing and records the
+    number of samples in the header.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file to create (or overwrite)
+    channels : list of str
+        Paths of the channels, in the order of the rows of each chunk
+    fsamp : Quantity
+        Sample frequency
+    dtype : numpy dtype, optional
+        Type of the samples, e.g. ``np.int16`` for raw samples
+    coeffs : array, optional
+        For raw samples, each channel's polynomial coefficients for scaling them to volts
+    start_time : float, optional
+        Unix time of the first sample. Defaults to now, and may be set until the writer is closed.
+    capacity : int, optional
+        Number of samples per channel to preallocate. The file grows by doubling past this.
+    max_queued : int, optional
+        Maximum number of chunks waiting to be written
+    metadata : dict, optional
+        Extra JSON-serializable entries for the header
+    """
+    def __init__(self, path, channels, fsamp, dtype=np.float64, coeffs=None, start_time=None,
+                 capacity=None, max_queued=16, metadata=None):
+        self.path = path
+        self.channels = list(channels)
+        self.fsamp = fsamp
+        self.dtype = np.dtype(dtype)
+        self.coeffs = coeffs
+        self.start_time = time.time() if start_time is None else start_time
+        self.metadata = metadata or {}
+        self.error = None
+        self.n_samples = 0
+
+        self._capacity = capacity or DEFAULT_CAPACITY
+        self._max_queued = max_queued
+        self._n_buffers = 0
+        self._free = queue.Queue()
+        self._queue = queue.Queue()
+        self._n_chunks = 0
+        self._n_blocked = 0
+        self._blocked_time = 0.
+        self._max_queue_len = 0
+
+        self._header_size = _header_size(self._header(_MAX_SAMPLES))
+        self._file = open(path, 'w+b')
+        _write_header(self._file, self._header(None), self._header_size)
+        self._map(self._capacity)
+
+        self._thread = threading.Thread(target=self._run, name='StreamWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _header(self, n_samples):
+        return {
+            'version': VERSION,
+            'channels': self.channels,
+            'fsamp': float(magnitude_as(self.fsamp, 'Hz')),
+            'start_time': self.start_time,
+            'dtype': self.dtype.str,
+            'n_samples': n_samples,
+            'coeffs': None if self.coeffs is None else np.asarray(self.coeffs).tolist(),
+            'metadata': self.metadata,
+        }
+
+    def _map(self, capacity):
+        """(Re)map the data section of the file, sized for `capacity` samples per channel"""
+        self._mm = None
+        self._file.truncate(self._header_size +
+                            capacity * len(self.channels) * self.dtype.itemsize)
+        self._capacity = capacity
+        self._mm = np.memmap(self._file, dtype=self.dtype, mode='r+', offset=self._header_size,
+                             shape=(capacity, len(self.channels)))
+
+    def write(self, data):
+        """Queue a chunk of samples, with one row per channel, to be written"""
+        if self.error is not None:
+            raise self.error
+        n_chans, n_samples = data.shape
+        if n_chans != len(self.channels):
+            raise ValueError("Chunk has {} rows, but there are {} channels"
+                             .format(n_chans, len(self.channels)))
+
+        buf = self._get_buffer()
+        if buf is None or buf.shape[1] < n_samples:
+            buf = np.empty((n_chans, n_samples), self.dtype)
+        np.copyto(buf[:, :n_samples], data)
+        self._queue.put((buf, n_samples))
+        self._max_queue_len = max(self._max_queue_len, self._queue.qsize())
+
+    def _get_buffer(self):
+        """Get a free buffer, or None if another may be allocated"""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            if self._n_buffers < self._max_queued:
+                self._n_buffers += 1
+                return None
+
+        self._n_blocked += 1
+        t_start = time.perf_counter()
+        while True:
+            try:
+                buf = self._free.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.error is not None:
+                    raise self.error
+        self._blocked_time += time.perf_counter() - t_start
+        return buf
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            buf, n_samples = item
+            if self.error is None:
+                try:
+                    self._append(buf, n_samples)
+                except Exception as e:
+                    log.exception("Failed to write to stream file %s", self.path)
+                    self.error = e
+            self._free.put(buf)
+
+    def _append(self, buf, n_samples):
+        end = self.n_samples + n_samples
+        if end > self._capacity:
+            self._mm.flush()
+            self._map(max(2 * self._capacity, end))
+        self._mm[self.n_samples:end] = buf[:, :n_samples].T
+        self.n_samples = end
+        self._n_chunks += 1
+
+    def close(self):
+        """Write any queued chunks, finish the header and close the file
+
+        Raises any error that occurred while writing.
+        """
+        if self._file is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._mm.flush()
+            self._mm = None
+            self._file.truncate(self._header_size +
+                                self.n_samples * len(self.channels) * self.dtype.itemsize)
+            _write_header(self._file, self._header(self.n_samples), self._header_size)
+        finally:
+            self._file.close()
+            self._file = None
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        """Get a dict of statistics about the writer
+
+        Includes the number of `chunks` and `samples` written, the number of times `write()` was
+        `blocked` waiting for a free buffer and the total `blocked_time` in seconds, and the current
+        and maximum number of chunks `queued`.
+        """
+        return {
+            'chunks': self._n_chunks,
+            'samples': self.n_samples,
+            'blocked': self._n_blocked,
+            'blocked_time': self._blocked_time,
+            'queued': self._queue.qsize(),
+            'max_queued': self._max_queue_len,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class StreamFile(object):
+    """A stream file, with its samples memory-mapped for reading
+
+    Attributes
+    ----------
+    channels : list of str
+        Paths of the channels, in the order of the columns of `samples`
+    fsamp : Quantity
+        Sample frequency
+    start_time : float
+        Unix time of the first sample
+    coeffs : array or None
+        For raw samples, each channel's polynomial coefficients for scaling them to volts
+    metadata : dict
+        Extra entries of the header
+    samples : numpy.memmap
+        The recorded samples, of shape (samples, channels)
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(len(MAGIC) + _SIZE.size)
+            if len(prefix) < len(MAGIC) + _SIZE.size or not prefix.startswith(MAGIC):
+                raise ValueError("{} is not a stream file".format(path))
+            header_size, = _SIZE.unpack(prefix[len(MAGIC):])
+            header = json.loads(f.read(header_size - len(prefix)).decode('utf-8'))
+
+        self.channels = header['channels']
+        self.fsamp = Q_(header['fsamp'], 'Hz')
+        self.start_time = header['start_time']
+        self.coeffs = None if header['coeffs'] is None else np.array(header['coeffs'])
+        self.metadata = header['metadata']
+        dtype = np.dtype(header['dtype'])
+        n_samples = header['n_samples']
+        if n_samples is None:
+            log.warning("Stream file %s wasn't closed, so it may end with unwritten samples", path)
+            n_samples = ((os.path.getsize(path) - header_size) //
+                         (dtype.itemsize * len(self.channels)))
+        shape = (n_samples, len(self.channels))
+        if n_samples:
+            self.samples = np.memmap(path, dtype=dtype, mode='r', offset=header_size, shape=shape)
+        else:
+            self.samples = np.empty(shape, dtype)  # Can't map an empty region
+
+    @property
+    def n_samples(self):
+        return self.samples.shape[0]
+
+    def read(self, start=0, stop=None):
+        """Read samples `start` through `stop`, as a float64 array of volts with one row per
+        channel"""
+        data = self.samples[start:stop].T
+        if self.coeffs is None:
+            return np.array(data, dtype=np.float64)
+        return np.array([np.polynomial.polynomial.polyval(row, poly)
+                         for row, poly in zip(data, self.coeffs)])
+
+    def time(self, start=0, stop=None):
+        """Get the times of samples `start` through `stop`, relative to the first sample"""
+        start, stop, _ = slice(start, stop).indices(self.n_samples)
+        return Q_(np.arange(start, stop) / self.fsamp.m_as('Hz'), 's')
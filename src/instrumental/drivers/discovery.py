@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent, time-bounded discovery of available instruments.
+
+Each driver module's ``list_instruments()`` and each VISA address is checked by a separate *probe*.
+Probes run in a pool of worker threads, and each has its own deadline. Results are yielded as soon
+as they arrive, and probes that hang or raise are recorded in a `DiscoveryReport` instead of
+blocking or aborting the whole scan.
+
+The results of each scan are also stored in an on-disk `DiscoveryCache`, which `instrument()` uses
+to look up known instruments without enumerating hardware again.
+"""
+from __future__ import division
+
+import os
+import time
+import queue
+import pickle
+import threading
+from past.builtins import basestring
+
+from . import (ParamSet, driver_info, import_driver, probe_visa_address, unique_visa_addresses,
+               resolve_blacklist, should_check_visa)
+from .visa_pool import visa_resource_pool
+from .. import conf
+from ..log import get_logger
+
+log = get_logger(__name__)
+
+__all__ = ['Discovery', 'DiscoveryReport', 'DiscoveryCache', 'discover_instruments',
+           'discovery_cache']
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_WORKERS = 8
+VISA_PROBE_KEY = 'visa'
+CACHE_FILENAME = 'discovery_cache.pkl'
+
+
+class DiscoveryReport(object):
+    """Summary of which probes of a discovery scan completed, timed out, or failed
+
+    Attributes
+    ----------
+    completed : list of str
+        Names of probes that finished successfully
+    timed_out : list of str
+        Names of probes that did not finish before their deadline. Their threads are abandoned, and
+        any result they produce later is discarded.
+    failed : dict
+        Maps the names of probes that raised an exception to that exception
+    durations : dict
+        Maps the name of each finished probe to its run time in seconds
+    elapsed : float
+        Total duration of the scan in seconds, or None if it has not finished
+    """
+    def __init__(self):
+        self.completed = []
+        self.timed_out = []
+        self.failed = {}
+        self.durations = {}
+        self.elapsed = None
+
+    def __repr__(self):
+        return "<DiscoveryReport completed={} timed_out={} failed={}>".format(
+            len(self.completed), len(self.timed_out), len(self.failed))
+
+    @property
+    def ok(self):
+        """True if no probe timed out or failed"""
+        return not (self.timed_out or self.failed)
+
+
+class Probe(object):
+    """A single unit of discovery work
+
+    `func` takes no arguments and returns a list. If `expands` is True, the list contains new
+    `Probe` objects to be scheduled, otherwise it contains `ParamSet` objects. Results of probes
+    sharing the same `cache_key` are stored together in the `DiscoveryCache`, but only if all of
+    those probes succeed.
+    """
+    def __init__(self, name, func, timeout, expands=False, cache_key=None):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.expands = expands
+        self.cache_key = cache_key
+
+    def __repr__(self):
+        return "<Probe '{}'>".format(self.name)
+
+
+class _Worker(object):
+    def __init__(self, tasks, results):
+        self.tasks = tasks
+        self.results = results
+        self.abandoned = False
+        self.thread = threading.Thread(target=self.run, name='instrumental-discovery')
+        self.thread.daemon = True  # Never let a hung driver keep the interpreter alive
+        self.thread.start()
+
+    def run(self):
+        while True:
+            probe = self.tasks.get()
+            if probe is None:
+                return
+
+            self.results.put(('start', probe, self, time.time()))
+            try:
+                value, exc = probe.func(), None
+            except Exception as e:
+                value, exc = None, e
+            self.results.put(('done', probe, value, exc))
+
+            if self.abandoned:
+                return  # Our probe overran its deadline and was replaced by another worker
+
+
+class Discovery(object):
+    """Iterable, concurrent scan for available instruments
+
+    Iterating yields `ParamSet` objects as each probe finishes. Once iteration is done, `report`
+    describes which probes timed out or failed::
+
+        >>> scan = Discovery(timeout=5)
+        >>> for paramset in scan:
+        ...     print(paramset)
+        >>> scan.report.timed_out
+        ['cameras.pco']
+
+    Parameters
+    ----------
+    module : str, optional
+        Only check driver modules whose full name contains this substring, as in
+        `list_instruments()`.
+    blacklist : list or str, optional
+        Driver modules which should not be checked. Defaults to the ``driver_blacklist`` pref in
+        your ``instrumental.conf``.
+    timeout : float or None, optional
+        Deadline for each probe, in seconds, counted from when the probe starts running. If None,
+        probes may run indefinitely.
+    driver_timeouts : dict, optional
+        Per-driver overrides of `timeout`, keyed by module name (e.g. ``'cameras.pco'``). The key
+        ``'visa'`` sets the deadline for listing VISA resources and for checking each VISA address.
+    max_workers : int, optional
+        Maximum number of probes that run at once.
+    """
+    def __init__(self, module=None, blacklist=None, timeout=DEFAULT_TIMEOUT, driver_timeouts=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.module = module
+        self.blacklist = resolve_blacklist(blacklist)
+        self.timeout = timeout
+        self.driver_timeouts = driver_timeouts or {}
+        self.max_workers = max_workers
+        self.report = DiscoveryReport()
+
+    def __iter__(self):
+        return self._run(self._initial_probes())
+
+    def _timeout_for(self, key):
+        return self.driver_timeouts.get(key, self.timeout)
+
+    def _initial_probes(self):
+        probes = []
+        if should_check_visa(self.module, self.blacklist):
+            probes.append(Probe(VISA_PROBE_KEY, self._list_visa_probes,
+                                self._timeout_for(VISA_PROBE_KEY), expands=True,
+                                cache_key=VISA_PROBE_KEY))
+
+        for mod_name in driver_info:
+            if self.module and self.module not in mod_name:
+                continue
+
+            if mod_name in self.blacklist:
+                log.info("Skipping blacklisted driver module '%s'", mod_name)
+                continue
+
+            probes.append(Probe(mod_name, _module_prober(mod_name), self._timeout_for(mod_name),
+                                cache_key=mod_name))
+        return probes
+
+    def _list_visa_probes(self):
+        try:
+            addresses = visa_resource_pool().list_resources()
+        except ImportError:
+            return []  # Ignore if PyVISA is not installed
+
+        timeout = self._timeout_for(VISA_PROBE_KEY)
+        return [Probe(addr, _visa_prober(addr, self.module), timeout, cache_key=VISA_PROBE_KEY)
+                for addr in unique_visa_addresses(addresses)]
+
+    def _run(self, probes):
+        report = self.report
+        start_time = time.time()
+        tasks = queue.Queue()
+        results = queue.Queue()
+        outstanding = set(probes)
+        running = {}  # probe -> (worker, start time)
+        workers = set()
+        found = {}  # cache_key -> list of ParamSets
+        spoiled = set()  # cache_keys with at least one unsuccessful probe
+
+        for probe in probes:
+            tasks.put(probe)
+        for _ in range(min(self.max_workers, len(probes))):
+            workers.add(_Worker(tasks, results))
+
+        try:
+            while outstanding:
+                deadlines = [t0 + p.timeout for p, (_, t0) in running.items()
+                             if p.timeout is not None]
+                wait = max(0., min(deadlines) - time.time()) if deadlines else None
+
+                try:
+                    msg = results.get(timeout=wait)
+                except queue.Empty:
+                    now = time.time()
+                    for probe, (worker, t0) in list(running.items()):
+                        if probe.timeout is not None and now - t0 >= probe.timeout:
+                            log.warning("Discovery probe '%s' timed out after %.1f s",
+                                        probe.name, probe.timeout)
+                            del running[probe]
+                            outstanding.discard(probe)
+                            report.timed_out.append(probe.name)
+                            spoiled.add(probe.cache_key)
+                            worker.abandoned = True
+                            workers.discard(worker)
+                            workers.add(_Worker(tasks, results))
+                    continue
+
+                kind, probe = msg[:2]
+                if probe not in outstanding:
+                    continue  # Late message from a probe that already timed out
+
+                if kind == 'start':
+                    running[probe] = msg[2:]
+                    continue
+
+                _, t0 = running.pop(probe)
+                outstanding.discard(probe)
+                value, exc = msg[2:]
+                report.durations[probe.name] = time.time() - t0
+
+                if exc is not None:
+                    log.info("Discovery probe '%s' failed: <<%s>>", probe.name, str(exc))
+                    report.failed[probe.name] = exc
+                    spoiled.add(probe.cache_key)
+                    continue
+
+                report.completed.append(probe.name)
+                if probe.expands:
+                    for new_probe in value:
+                        outstanding.add(new_probe)
+                        tasks.put(new_probe)
+                    while len(workers) < min(self.max_workers, len(outstanding)):
+                        workers.add(_Worker(tasks, results))
+                else:
+                    if probe.cache_key is not None:
+                        found.setdefault(probe.cache_key, []).extend(value)
+                    for paramset in value:
+                        yield paramset
+
+            self._cache_results(found, spoiled)
+        finally:
+            # Drop any queued work (if iteration stopped early) and tell live workers to exit
+            while True:
+                try:
+                    tasks.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in workers:
+                tasks.put(None)
+            report.elapsed = time.time() - start_time
+
+    def _cache_results(self, found, spoiled):
+        if self.module:
+            found.pop(VISA_PROBE_KEY, None)  # Only a filtered subset of the VISA instruments
+        entries = {key: paramsets for key, paramsets in found.items() if key not in spoiled}
+        if entries:
+            discovery_cache().put_many(entries)
+
+
+def _module_prober(mod_name):
+    def probe():
+        driver_module = import_driver(mod_name, raise_errors=True)
+        if not hasattr(driver_module, 'list_instruments'):
+            return []
+        return list(driver_module.list_instruments())
+    return probe
+
+
+def _visa_prober(addr, module):
+    def probe():
+        paramset = probe_visa_address(addr)
+        if paramset is None or (module and module not in paramset['module']):
+            return []
+        return [paramset]
+    return probe
+
+
+def discover_instruments(**kwds):
+    """Run a full concurrent scan, returning a tuple ``(paramsets, report)``
+
+    Takes the same keyword arguments as `Discovery`.
+    """
+    scan = Discovery(**kwds)
+    paramsets = list(scan)
+    return paramsets, scan.report
+
+
+class DiscoveryCache(object):
+    """On-disk cache of the ParamSets found by each driver module's ``list_instruments()``
+
+    Entries are keyed by driver module name, with VISA instruments grouped under ``'visa'``. An
+    entry is treated as stale once it is older than `ttl` seconds, or if its module provides a
+    ``_discovery_fingerprint()`` function whose result no longer matches the one recorded when the
+    entry was stored. A VISA instrument found by `find()` is also checked against the device now at
+    its address, by identifying it again with ``*IDN?``, so a swapped instrument isn't mistaken for
+    the cached one. Stale entries are only detected when they are looked up.
+
+    Parameters
+    ----------
+    path : str, optional
+        Location of the cache file. Defaults to a file within ``conf.user_data_dir``.
+    ttl : float, optional
+        Lifetime of each entry in seconds. Defaults to the ``discovery_cache_ttl`` pref in your
+        ``instrumental.conf``. A value of zero or less disables the cache.
+    """
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.path.join(conf.user_data_dir, CACHE_FILENAME)
+        self._ttl = ttl
+        self._entries = None
+        self._lock = threading.RLock()
+        self._served = threading.local()
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return conf.prefs.get('discovery_cache_ttl', 0)
+        return self._ttl
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._entries = pickle.load(f)
+            except (IOError, OSError):
+                self._entries = {}
+            except Exception as e:
+                log.info("Discarding unreadable discovery cache: <<%s>>", str(e))
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        dirname = os.path.dirname(self.path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        """Get the list of cached ParamSets for `key`, or None if missing or stale"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                return None
+
+            if time.time() - entry['timestamp'] > self.ttl:
+                log.info("Discovery cache entry for '%s' has expired", key)
+                return None
+
+            if entry['fingerprint'] is not None and entry['fingerprint'] != _fingerprint(key):
+                log.info("Discovery cache entry for '%s' no longer matches the hardware", key)
+                self.invalidate(key)
+                return None
+
+        self._mark_served(key)
+        return [ParamSet(**params) for params in entry['paramsets']]
+
+    def find(self, test):
+        """Get the first fresh cached ParamSet for which ``test(paramset)`` is true, or None
+
+        Only the entry containing a match has its fingerprint checked, so lookups don't import
+        the driver module of every cached entry. A matching VISA instrument is re-identified
+        before it's returned, and the VISA entry is dropped if it no longer matches.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            items = list(self._load().items())
+        now = time.time()
+        for key, entry in items:
+            if now - entry['timestamp'] > self.ttl:
+                continue
+            for params in entry['paramsets']:
+                paramset = ParamSet(**params)
+                if test(paramset):
+                    if self.get(key) is None:
+                        break  # Stale, so look through the other entries
+                    if key == VISA_PROBE_KEY and not _visa_device_matches(paramset):
+                        log.info("Discovery cache entry for '%s' no longer matches the hardware",
+                                 key)
+                        self.invalidate(key)
+                        break
+                    return paramset
+        return None
+
+    def put(self, key, paramsets):
+        """Store the full list of ParamSets found for `key`"""
+        self.put_many({key: paramsets})
+
+    def put_many(self, entries):
+        """Store several lists of ParamSets at once, given as a dict keyed like `put()`"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._load()
+            now = time.time()
+            for key, paramsets in entries.items():
+                self._entries[key] = {
+                    'timestamp': now,
+                    'fingerprint': _fingerprint(key),
+                    'paramsets': [_plain_params(paramset) for paramset in paramsets],
+                }
+            try:
+                self._save()
+            except Exception as e:
+                log.info("Could not write discovery cache: <<%s>>", str(e))
+
+    def invalidate(self, keys=None):
+        """Remove the entries for `keys` (a key or a list of them), or all entries if None"""
+        with self._lock:
+            self._load()
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in ([keys] if isinstance(keys, basestring) else keys):
+                    self._entries.pop(key, None)
+            try:
+                self._save()
+            except Exception as e:
+                log.info("Could not write discovery cache: <<%s>>", str(e))
+
+    def _mark_served(self, key):
+        if getattr(self._served, 'depth', 0):
+            self._served.keys.add(key)
+
+    def track_served(self):
+        """Start recording which keys this thread gets from the cache
+
+        Calls may be nested, in which case the outermost call's record is shared.
+        """
+        depth = getattr(self._served, 'depth', 0)
+        if not depth:
+            self._served.keys = set()
+        self._served.depth = depth + 1
+
+    def served(self):
+        """Get the set of keys gotten since the outermost `track_served()`, without stopping"""
+        return set(getattr(self._served, 'keys', ()))
+
+    def pop_served(self):
+        """Stop recording, returning the set of keys gotten since the matching `track_served()`"""
+        self._served.depth -= 1
+        return self.served()
+
+
+def _plain_params(paramset):
+    """Get a picklable dict copy of `paramset`, excluding special cached objects"""
+    return {k: v for k, v in paramset.items() if not k.startswith('**')}
+
+
+def _fingerprint(key):
+    """Call the driver module's ``_discovery_fingerprint()``, if it has one"""
+    if key == VISA_PROBE_KEY or key not in driver_info:
+        return None
+
+    driver_module = import_driver(key, raise_errors=False)
+    func = getattr(driver_module, '_discovery_fingerprint', None)
+    if func is None:
+        return None
+
+    try:
+        return func()
+    except Exception as e:
+        log.info("Error getting discovery fingerprint of '%s': <<%s>>", key, str(e))
+        return None
+
+
+def _visa_device_matches(paramset):
+    """Check that the VISA instrument at the address of a cached `paramset` is still the same"""
+    found = probe_visa_address(paramset['visa_address'])
+    return found is not None and _plain_params(found) == _plain_params(paramset)
+
+
+def discovery_cache():
+    """Get the process-wide `DiscoveryCache`"""
+    if discovery_cache.instance is None:
+        with discovery_cache.lock:
+            if discovery_cache.instance is None:
+                discovery_cache.instance = DiscoveryCache()
+    return discovery_cache.instance
+
+
+discovery_cache.instance = None
+discovery_cache.lock = threading.Lock()
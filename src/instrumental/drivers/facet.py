@@ -4,13 +4,17 @@
 from __future__ import division
 from past.builtins import basestring
 
+import time
 import numbers
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from typing import Mapping
 
-from ..log import get_logger
+import numpy as np
+
+from ..log import get_logger, DEBUG, INFO
 from .. import u, Q_
-from .util import to_quantity
+from .util import magnitude_as, scpi_root
+from . import iostats
 
 log = get_logger(__name__)
 
@@ -33,12 +37,36 @@ class FacetGroup(object):
             raise KeyError
         return self.__dict__[key]
 
+    def get_many(self, names=None, use_cache=True):
+        """Get the values of several facets at once
+
+        Message-based facets are read using a single compound query. See `get_many()`.
+
+        Parameters
+        ----------
+        names : sequence of str, optional
+            Names of the facets to get. Defaults to all of the group's facets that are readable.
+        use_cache : bool, optional
+            Whether to use the cached values of cached facets
+        """
+        if names is None:
+            names = [name for name in self._names if self[name].facet.fget is not None]
+        facet_data_list = [self[name] for name in names]
+        if not facet_data_list:
+            return OrderedDict()
+        owner = facet_data_list[0].owner
+        return get_many(owner, [fd.facet for fd in facet_data_list], use_cache)
+
 
 class FacetData(object):
     """Per-instance Facet data"""
+    __slots__ = ('dirty', 'cached_val', 'timestamp', 'observers', 'facet', 'owner',
+                 '_manual_value')
+
     def __init__(self, parent_facet, owner):
         self.dirty = True
         self.cached_val = None
+        self.timestamp = None  # Time the cached value was last read or set
         self.observers = []
         self.facet = parent_facet
         self.owner = owner
@@ -55,12 +83,21 @@ class FacetData(object):
         """
         self.observers.append(callback)
 
+    def invalidate(self):
+        """Discard the cached value, so the next get or set goes to the instrument"""
+        self.dirty = True
+        self.timestamp = None
+
     def get_value(self):
         return self.facet.get_value(self.owner)
 
     def set_value(self, value):
         self.facet.set_value(self.owner, value)
 
+    def sweep(self, values, dwell=None, on_point=None, sync=False):
+        """Step through a sequence of values. See `Facet.sweep()`"""
+        return self.facet.sweep(self.owner, values, dwell, on_point, sync)
+
     def create_widget(self, parent=None):
         if self.facet.type == float:
             if self.facet.units:
@@ -111,9 +148,21 @@ class Facet(object):
         Limits specified in `[stop]`, `[start, stop]`, or `[start, stop, step]` format. When given,
         raises a `ValueError` if a user tries to set a value that is out of range. `step`, if given,
         is used to round an in-range value before passing it to fset.
+    ttl : float, optional
+        Time in seconds for which a cached value remains valid after it was last read or set. After
+        this, the next get or set goes to the instrument. Implies `cached=True`.
+    invalidates : sequence of str, optional
+        Names of other facets whose cached values are invalidated whenever this facet is set, e.g.
+        setting a span may change the start and stop frequencies.
     """
+    # Set by MessageFacet, and `scpi` by SCPI_Facet, so that `get_many()` can combine the queries of
+    # several SCPI facets
+    get_msg = None
+    msg_convert = None
+    scpi = False
+
     def __init__(self, fget=None, fset=None, doc=None, cached=False, type=None, units=None,
-                 value=None, limits=None, name=None):
+                 value=None, limits=None, name=None, ttl=None, invalidates=()):
         if fget is not None:
             self.name = fget.__name__
 
@@ -124,7 +173,9 @@ class Facet(object):
             doc = fget.__doc__
         self.__doc__ = doc
 
-        self.cacheable = cached
+        self.cacheable = cached or ttl is not None
+        self.ttl = ttl
+        self.invalidates = tuple(invalidates)
         self.type = type
         self.units = None if units is None else u.parse_units(units)
         self.name = name  # This is auto-filled by InstrumentMeta.__new__ later
@@ -163,6 +214,10 @@ class Facet(object):
         else:
             raise ValueError("`limits` must be a sequence of length 1 to 3")
 
+        # String limits name attributes of the instrument, so they must be looked up on each check
+        self._has_limits = self.limits != (None, None, None)
+        self._attr_limits = any(isinstance(limit, basestring) for limit in self.limits)
+
     def instance(self, obj):
         """Get the FacetData associated with `obj`"""
         try:
@@ -206,27 +261,58 @@ class Facet(object):
 
         instance = self.instance(obj)
 
-        if not (self.cacheable and use_cache) or instance.dirty:
-            log.debug('Getting value of facet %s', self.name)
-            instance.cached_val = self.conv_get(self.fget(obj))
-            instance.dirty = False
-        else:
+        verbose = log.isEnabledFor(DEBUG)
+        if not (self.cacheable and use_cache) or instance.dirty or self._expired(instance):
+            if verbose:
+                log.debug('Getting value of facet %s', self.name)
+            if iostats.active:
+                t_start = time.perf_counter()
+                raw_value = self.fget(obj)
+                iostats.record(obj, 'get', self.name, t_start)
+            else:
+                raw_value = self.fget(obj)
+            self._store_value(instance, raw_value)
+        elif verbose:
             log.debug('Using cached value of facet %s', self.name)
 
-        log.debug('Facet value was %s', instance.cached_val)
+        if verbose:
+            log.debug('Facet value was %s', instance.cached_val)
         return instance.cached_val
 
+    def _store_value(self, instance, raw_value):
+        """Convert the raw value returned by fget and cache it in `instance`"""
+        instance.cached_val = self.conv_get(raw_value)
+        instance.dirty = False
+        instance.timestamp = time.monotonic()
+
+    def _expired(self, instance):
+        """Whether `instance`'s cached value is too old to use"""
+        if instance.timestamp is None:
+            return True
+        return self.ttl is not None and time.monotonic() - instance.timestamp >= self.ttl
+
+    def _needs_get(self, obj, use_cache):
+        instance = self.instance(obj)
+        return not (self.cacheable and use_cache) or instance.dirty or self._expired(instance)
+
     def __set__(self, obj, qty):
         self.set_value(obj, qty)
 
     def convert_user_input(self, value, obj):
         """Validate and convert an input value to its 'external' form"""
         if self.units is not None:
-            q = to_quantity(value).to(self.units)
-            return Q_(self.convert_raw_input(q.magnitude, obj), q.units)
+            return Q_(self.convert_raw_input(self.to_magnitude(value), obj), self.units)
         else:
             return self.convert_raw_input(value, obj)
 
+    def to_magnitude(self, value):
+        """Convert a quantity (or str) to its magnitude in the facet's units
+
+        Uses the shared conversion factors of `magnitude_as()`, so the units of each input are only
+        converted by pint once, except for units with an offset (e.g. degC).
+        """
+        return magnitude_as(value, self.units)
+
     def convert_raw_input(self, input_value, obj):
         value = input_value if self.type is None else self.type(input_value)
         return self.check_limits(value, obj)
@@ -237,7 +323,9 @@ class Facet(object):
 
     def check_limits(self, value, obj):
         """Check raw value (magnitude) against the Facet's limits"""
-        start, stop, step = self._load_limits(obj)
+        if not self._has_limits:
+            return value
+        start, stop, step = self._load_limits(obj) if self._attr_limits else self.limits
         if start is not None and value < start:
             raise ValueError("Value below lower limit of {}".format(
                 Q_(start, self.units) if self.units else start))
@@ -249,11 +337,118 @@ class Facet(object):
             offset = value - start
             if offset % step != 0:
                 new_value = start + int(round(offset / step)) * step
-                log.debug("Coercing value from %s to %s due to limit step", value, new_value)
+                if log.isEnabledFor(DEBUG):
+                    log.debug("Coercing value from %s to %s due to limit step", value, new_value)
                 return new_value
 
         return value
 
+    def convert_many(self, values, obj):
+        """Validate and convert a sequence of input values to an array of magnitudes
+
+        Like `convert_user_input()`, but the type conversion and limit checks are applied to the
+        whole array at once.
+        """
+        if self.units is None:
+            magnitudes = np.asarray(values)
+        elif isinstance(values, Q_):
+            magnitudes = np.asarray(self.to_magnitude(values))
+        else:
+            magnitudes = np.array([self.to_magnitude(value) for value in values])
+
+        if magnitudes.ndim != 1:
+            raise ValueError("Values must be a one-dimensional sequence")
+        if self.type in (int, float, bool):
+            magnitudes = magnitudes.astype(self.type)
+        elif self.type is not None:
+            magnitudes = np.array([self.type(m) for m in magnitudes.tolist()])
+
+        return self.check_limits_many(magnitudes, obj)
+
+    def check_limits_many(self, magnitudes, obj):
+        """Check an array of raw values against the Facet's limits, like `check_limits()`"""
+        if not self._has_limits:
+            return magnitudes
+        start, stop, step = self._load_limits(obj) if self._attr_limits else self.limits
+        if start is not None and (magnitudes < start).any():
+            raise ValueError("Value {} below lower limit of {}".format(
+                magnitudes[magnitudes < start][0], Q_(start, self.units) if self.units else start))
+        if stop is not None and (magnitudes > stop).any():
+            raise ValueError("Value {} above upper limit of {}".format(
+                magnitudes[magnitudes > stop][0], Q_(stop, self.units) if self.units else stop))
+
+        if step is not None:
+            offset = magnitudes - start
+            coerced = start + np.round(offset / step) * step
+            magnitudes = np.where(offset % step != 0, coerced, magnitudes)
+        return magnitudes
+
+    def sweep(self, obj, values, dwell=None, on_point=None, sync=False):
+        """Set the facet to each of a sequence of values in turn
+
+        All the values are converted and checked against the facet's limits before any are set,
+        and are then written back-to-back, without reading anything back from the instrument
+        unless `sync` is True.
+
+        Parameters
+        ----------
+        obj : Instrument
+            The instrument whose facet to sweep
+        values : sequence or array Quantity
+            Values to step through. If the facet has units, either an array Quantity or a sequence
+            of anything that `set_value()` accepts.
+        dwell : float, optional
+            Time in seconds to remain at each point, measured from when it was set
+        on_point : callable, optional
+            Called as ``on_point(index, value)`` once each point is set, e.g. to take a measurement
+        sync : bool, optional
+            Whether to wait for each setting to complete by querying ``*OPC?`` before moving on.
+            Requires a SCPI instrument.
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with a row per point, with the `value` actually applied (after
+            rounding to the limit step), as a magnitude in the facet's units, and the `time` it was
+            set, in seconds (from `time.monotonic()`)
+        """
+        if self.fset is None:
+            raise AttributeError("Cannot set a read-only Facet")
+
+        magnitudes = self.convert_many(values, obj)
+        instance = self.instance(obj)
+        record = np.zeros(len(magnitudes), dtype=[('value', magnitudes.dtype), ('time', float)])
+        if log.isEnabledFor(INFO):
+            log.info('Sweeping facet %s through %d values', self.name, len(magnitudes))
+
+        value = instance.cached_val
+        for i, magnitude in enumerate(magnitudes.tolist()):
+            self.fset(obj, self.in_map[magnitude] if self.in_map else magnitude)
+            if sync:
+                obj.query('*OPC?')
+            t_point = time.monotonic()
+            record[i] = (magnitude, t_point)
+
+            if instance.observers or on_point is not None:
+                old, value = value, magnitude if self.units is None else Q_(magnitude, self.units)
+                if instance.observers:
+                    change = ChangeEvent(name=self.name, old=old, new=value)
+                    for callback in instance.observers:
+                        callback(change)
+                if on_point is not None:
+                    on_point(i, value)
+
+            if dwell:
+                time.sleep(max(0., t_point + dwell - time.monotonic()))
+
+        if len(magnitudes):
+            last = magnitudes[-1].item()
+            instance.cached_val = last if self.units is None else Q_(last, self.units)
+            instance.timestamp = time.monotonic()
+            for name in self.invalidates:
+                getattr(obj.__class__, name).instance(obj).invalidate()
+        return record
+
     def set_value(self, obj, value, use_cache=True):
         if self.fset is None:
             raise AttributeError("Cannot set a read-only Facet")
@@ -261,17 +456,30 @@ class Facet(object):
         instance = self.instance(obj)
         value = self.convert_user_input(value, obj)
 
-        if not (self.cacheable and use_cache) or instance.cached_val != value:
-            log.info('Setting value of facet %s', self.name)
-            self.fset(obj, self.conv_set(value))
-            change = ChangeEvent(name=self.name, old=instance.cached_val, new=value)
-            for callback in instance.observers:
-                callback(change)
-        else:
+        verbose = log.isEnabledFor(INFO)
+        if (not (self.cacheable and use_cache) or instance.cached_val != value or
+                self._expired(instance)):
+            if verbose:
+                log.info('Setting value of facet %s', self.name)
+            if iostats.active:
+                t_start = time.perf_counter()
+                self.fset(obj, self.conv_set(value))
+                iostats.record(obj, 'set', self.name, t_start)
+            else:
+                self.fset(obj, self.conv_set(value))
+            for name in self.invalidates:
+                getattr(obj.__class__, name).instance(obj).invalidate()
+            if instance.observers:
+                change = ChangeEvent(name=self.name, old=instance.cached_val, new=value)
+                for callback in instance.observers:
+                    callback(change)
+        elif verbose:
             log.info('Skipping set of facet %s, cached value matches', self.name)
 
         instance.cached_val = value
-        log.info('Facet value is %s', value)
+        instance.timestamp = time.monotonic()
+        if verbose:
+            log.info('Facet value is %s', value)
 
     def __call__(self, fget):
         return self.getter(fget)
@@ -295,9 +503,10 @@ class AbstractFacet(Facet):
 
 class ManualFacet(Facet):
     def __init__(self, doc=None, cached=False, type=None, units=None, value=None, limits=None,
-                 name=None, save_on_set=True):
+                 name=None, save_on_set=True, ttl=None, invalidates=()):
         Facet.__init__(self, self._manual_fget, self._manual_fset, doc=doc, cached=cached,
-                       type=type, units=units, value=value, limits=limits, name=name)
+                       type=type, units=units, value=value, limits=limits, name=name, ttl=ttl,
+                       invalidates=invalidates)
         self.save_on_set = save_on_set
 
     def _manual_fget(self, owner):
@@ -360,7 +569,10 @@ def MessageFacet(get_msg=None, set_msg=None, convert=None, **kwds):
         def fset(obj, value):
             obj.write(set_msg.format(value))
 
-    return Facet(fget, fset, **kwds)
+    facet = Facet(fget, fset, **kwds)
+    facet.get_msg = get_msg
+    facet.msg_convert = convert
+    return facet
 
 
 def SCPI_Facet(msg, convert=None, readonly=False, **kwds):
@@ -382,4 +594,59 @@ def SCPI_Facet(msg, convert=None, readonly=False, **kwds):
     """
     get_msg = msg + '?'
     set_msg = None if readonly else msg + ' {}'
-    return MessageFacet(get_msg, set_msg, convert=convert, **kwds)
+    facet = MessageFacet(get_msg, set_msg, convert=convert, **kwds)
+    facet.scpi = True
+    return facet
+
+
+def get_many(obj, facets, use_cache=True):
+    """Get the values of several of `obj`'s facets, using as few queries as possible
+
+    The get-messages of SCPI facets (see `SCPI_Facet`) are joined by ';' and sent as a single
+    compound query, whose response is split on ';' and used to fill in each facet's value. Other
+    facets, including other `MessageFacet` ones, are read one at a time, as usual. If the response
+    doesn't have one field per message (e.g. because a returned string contained a ';'), the SCPI
+    facets are queried individually instead.
+
+    Parameters
+    ----------
+    obj : Instrument
+        Instrument whose facets to get. Its SCPI facets require a `query()` method, as provided by
+        `VisaMixin`.
+    facets : sequence of Facet
+        The facets to get
+    use_cache : bool, optional
+        Whether to use the cached values of cached facets
+
+    Returns
+    -------
+    OrderedDict
+        Map from facet name to value, in the order of `facets`
+    """
+    batched = [facet for facet in facets if facet.scpi and facet._needs_get(obj, use_cache)]
+    fetched = set()
+
+    if len(batched) > 1:
+        # Make each message absolute, since SCPI resolves headers following a ';' relative to the
+        # previous one
+        messages = [scpi_root(facet.get_msg) for facet in batched]
+        log.debug('Getting values of facets %s in one query',
+                  ', '.join(facet.name for facet in batched))
+        fields = [field.strip() for field in obj.query(';'.join(messages)).split(';')]
+
+        if len(fields) == len(batched):
+            for facet, field in zip(batched, fields):
+                raw_value = field if facet.msg_convert is None else facet.msg_convert(field)
+                facet._store_value(facet.instance(obj), raw_value)
+            fetched.update(batched)
+        else:
+            log.info('Compound response had %d fields, expected %d; querying individually',
+                     len(fields), len(batched))
+
+    values = OrderedDict()
+    for facet in facets:
+        if facet in fetched:
+            values[facet.name] = facet.instance(obj).cached_val
+        else:
+            values[facet.name] = facet.get_value(obj, use_cache)
+    return values
@@ -24,16 +24,122 @@ _BASIC_TYPE_MAP = {
     'Boolean': bool, # Handle a common alias
 }
 
+
+def _resolve_type_option(type_str: str) -> type | None:
+    """Resolve a type name from a validation rule to a Python type or Enum class, if possible"""
+    expected_py_type = _BASIC_TYPE_MAP.get(type_str)
+    if expected_py_type is not None:
+        return expected_py_type
+    enum_class = globals().get(type_str)
+    if isinstance(enum_class, type) and issubclass(enum_class, Enum):
+        return enum_class
+    return None
+
+
+def _make_param_check(func_name: str, param_name: str,
+                      rule: Dict[str, Any]) -> Callable[[Any], None] | None:
+    """Build the function that validates one parameter against its rule
+
+    Returns None if the rule has nothing to check.
+    """
+    type_options = rule.get('type_options', [])
+    if not type_options or 'Any' in type_options:  # Allow 'Any' to bypass type checks
+        allowed_types = None
+    else:
+        allowed_types = tuple(t for t in map(_resolve_type_option, type_options) if t is not None)
+        if float in allowed_types:
+            allowed_types += (int,)  # Allow int to be passed for a float parameter
+    expected_types_str = ", ".join(type_options)
+
+    min_val = rule.get('min_val')
+    max_val = rule.get('max_val')
+    min_val = None if min_val is None else float(min_val)
+    max_val = None if max_val is None else float(max_val)
+
+    if allowed_types is None and min_val is None and max_val is None:
+        return None
+
+    def check(arg_value: Any) -> None:
+        if allowed_types is not None and not isinstance(arg_value, allowed_types):
+            raise TypeError(
+                f"Parameter '{param_name}' for {func_name} expected one of types "
+                f"[{expected_types_str}], but got {type(arg_value).__name__} "
+                f"with value {arg_value!r}."
+            )
+
+        if isinstance(arg_value, Enum) or (min_val is None and max_val is None):
+            return
+        try:
+            value = float(arg_value)
+        except (TypeError, ValueError):
+            return  # Not a number, so range limits don't apply
+        if min_val is not None and value < min_val:
+            raise ValueError(
+                f"Parameter '{param_name}' for {func_name} is {arg_value}, "
+                f"which is less than minimum value {rule['min_val']}."
+            )
+        if max_val is not None and value > max_val:
+            raise ValueError(
+                f"Parameter '{param_name}' for {func_name} is {arg_value}, "
+                f"which is greater than maximum value {rule['max_val']}."
+            )
+    return check
+
+
 def validate_parameters(rules_list: List[Dict[str, Any]] | None = None):
+    """Decorator that validates a method's arguments against `rules_list`, then passes Enums by name
+
+    Each rule gives a parameter's `name`, its allowed `type_options` (basic type names, or names of
+    Enum classes in this module), and optionally its `min_val` and `max_val`. The checks for each
+    parameter are built once, when the method is decorated, so calls only pay for running them.
+    Validation can be turned off for an instrument by setting its `strict_validation` to False, in
+    which case arguments are only converted.
+    """
     if rules_list is None:
         rules_list = []
-    
+
     param_rules: Dict[str, Dict[str, Any]] = {rule['name']: rule for rule in rules_list}
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        sig = inspect.signature(func)
+        params = list(sig.parameters.values())[1:]  # Skip 'self'
+        names = [p.name for p in params]
+        checks = {name: _make_param_check(func.__name__, name, param_rules[name])
+                  for name in names if name in param_rules}
+        checks = {name: check for name, check in checks.items() if check is not None}
+        pos_checks = [checks.get(name) for name in names]
+
+        # Methods with only plain positional parameters can skip binding their arguments
+        simple = all(p.kind == p.POSITIONAL_OR_KEYWORD for p in params)
+        defaults = [p.default for p in params]
+
+        def fill_args(args: tuple, kwargs: Dict[str, Any]) -> List[Any] | None:
+            """Put the arguments in positional order, or return None if they need binding"""
+            n_args = len(args)
+            if not simple or n_args > len(names):
+                return None
+            values = list(args)
+            n_found = 0
+            for name, default in zip(names[n_args:], defaults[n_args:]):
+                if name in kwargs:
+                    values.append(kwargs[name])
+                    n_found += 1
+                elif default is inspect.Parameter.empty:
+                    return None  # Missing argument
+                else:
+                    values.append(default)
+            return values if n_found == len(kwargs) else None
+
         @functools.wraps(func)
         def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
-            sig = inspect.signature(func)
+            values = fill_args(args, kwargs)
+            if values is not None:
+                if self.strict_validation:
+                    for check, arg_value in zip(pos_checks, values):
+                        if check is not None:
+                            check(arg_value)
+                return func(self, *[arg.name if isinstance(arg, Enum) else arg for arg in values])
+
             try:
                 bound_args = sig.bind(self, *args, **kwargs)
             except TypeError as e:
@@ -41,88 +147,15 @@ def validate_parameters(rules_list: List[Dict[str, Any]] | None = None):
                     f"Error binding arguments for {func.__name__}{sig}: {e}. "
                     f"Provided args: {args}, kwargs: {kwargs}"
                 ) from e
-            
             bound_args.apply_defaults()
-            
-            # --- 1. Validation Phase ---
-            for param_name, arg_value in bound_args.arguments.items():
-                if param_name == 'self':
-                    continue
-
-                rule = param_rules.get(param_name)
-                if not rule:
-                    continue
-
-                type_options = rule.get('type_options', [])
-                if not type_options or 'Any' in type_options: # Allow 'Any' to bypass type checks
-                    pass
-                else:
-                    type_match_found = False
-                    for type_str_opt in type_options:
-                        expected_py_type = _BASIC_TYPE_MAP.get(type_str_opt)
-                        if expected_py_type:
-                            # Handle basic Python types (int, float, str, bool)
-                            # Allow int to be passed for a float parameter
-                            if (expected_py_type is float and isinstance(arg_value, int)) or \
-                               isinstance(arg_value, expected_py_type):
-                                type_match_found = True
-                                break
-                        else:
-                            # Assume type_str_opt is an Enum class name string
-                            enum_class = globals().get(type_str_opt)
-                            if enum_class and isinstance(enum_class, type) and issubclass(enum_class, Enum):
-                                if isinstance(arg_value, enum_class):
-                                    type_match_found = True
-                                    break
-                                # else:
-                                    # Coercion logic for enums from raw values was here, removed for stricter typing based on user request focus.
-                                    # If needed, it could be: 
-                                    # try: enum_class(arg_value); type_match_found = True; break
-                                    # except (ValueError, TypeError): pass
-                            # else:
-                                # print(f"Warning: Unrecognized type '{type_str_opt}' in validation rule for '{param_name}' of {func.__name__}")
-
-                    if not type_match_found:
-                        expected_types_str = ", ".join(type_options)
-                        raise TypeError(
-                            f"Parameter '{param_name}' for {func.__name__} expected one of types "
-                            f"[{expected_types_str}], but got {type(arg_value).__name__} with value {arg_value!r}."
-                        )
-
-                # --- Min/Max Value Validation ---
-                current_value_for_range_check = arg_value
-
-                if not isinstance(current_value_for_range_check, Enum):
-                    min_val = rule.get('min_val')
-                    if min_val is not None:
-                        try:
-                            if float(current_value_for_range_check) < float(min_val):
-                                raise ValueError(
-                                    f"Parameter '{param_name}' for {func.__name__} is {current_value_for_range_check}, "
-                                    f"which is less than minimum value {min_val}."
-                                )
-                        except (TypeError, ValueError):
-                            pass 
-
-                    max_val = rule.get('max_val')
-                    if max_val is not None:
-                        try:
-                            if float(current_value_for_range_check) > float(max_val):
-                                raise ValueError(
-                                    f"Parameter '{param_name}' for {func.__name__} is {current_value_for_range_check}, "
-                                    f"which is greater than maximum value {max_val}."
-                                )
-                        except (TypeError, ValueError):
-                            pass
-
-            # --- 2. Transformation Phase (Enum to .value for mixed Unions) ---
-            for param_name, arg_value in bound_args.arguments.items():
-                if param_name == 'self':
-                    continue
 
+            arguments = bound_args.arguments
+            for param_name in names:
+                arg_value = arguments.get(param_name)
+                if self.strict_validation and param_name in checks:
+                    checks[param_name](arg_value)
                 if isinstance(arg_value, Enum):
-                    bound_args.arguments[param_name] = arg_value.name
-            
+                    arguments[param_name] = arg_value.name
             return func(*bound_args.args, **bound_args.kwargs)
         return wrapper
     return decorator
@@ -713,6 +746,9 @@ class Keysight33500B(FunctionGenerator, VisaMixin):
     This class is auto-generated from an SDL file.
     """
     _INST_PARAMS_ = ['visa_address']
+    # Whether methods check their arguments' types and ranges. Set to False to skip the checks
+    # (e.g. in a tight loop with known-good values)
+    strict_validation = True
     _INST_VISA_INFO_ = (
         'Agilent Technologies', [
             '33509B',
@@ -5,9 +5,8 @@ Driver module for Rigol signal generators.
 """
 from enum import Enum, auto
 
-from pyvisa import ResourceManager
-
 from .. import ParamSet, SCPI_Facet, VisaMixin
+from ..visa_pool import visa_resource_pool
 from . import FunctionGenerator
 
 _INST_PARAMS = ['visa_address']
@@ -31,10 +30,8 @@ def list_instruments():
     paramsets = []
     model_string = '|'.join('{:04X}'.format(spec.value) for spec in SpecTypes)
     search_string = "USB[0-9]*::0x{:04X}::0x({})".format(MANUFACTURER_ID, model_string)
-    rm = ResourceManager()
-
     try:
-        raw_spec_list = rm.list_resources(search_string)
+        raw_spec_list = visa_resource_pool().resource_manager().list_resources(search_string)
     except:
         return paramsets
 
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of instrument I/O.
+
+While recording is enabled (see `enable()` and `capture()`), each write and query made through
+`VisaMixin`, each facet get and set that reaches the instrument, and each message sent or received
+by a remote `Messenger` is counted, sized, and timed. Statistics are kept per source (an instrument
+or a remote session) and per command, e.g. an SCPI header such as ``'freq:cent?'`` or a facet
+name. Latencies go into logarithmically binned histograms, from which percentiles are estimated.
+
+When nothing is recording, the cost to each operation is a single truth test.
+"""
+import math
+import time
+import threading
+import contextlib
+from weakref import WeakKeyDictionary
+from collections import OrderedDict
+
+__all__ = ['IOStats', 'LatencyHistogram', 'enable', 'disable', 'capture', 'global_stats',
+           'scpi_command']
+
+BINS_PER_DECADE = 20  # Percentiles are accurate to within ~6%
+MIN_LATENCY = 1e-7
+N_DECADES = 9  # Latencies from 100 ns to 100 s are binned; others go in the end bins
+
+active = []  # IOStats that are currently recording. Never rebound, so it can be checked cheaply
+_active_lock = threading.Lock()  # Held while changing `active`
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies (in seconds) in logarithmically spaced bins"""
+    __slots__ = ('counts', 'max')
+    n_bins = N_DECADES * BINS_PER_DECADE + 2
+
+    def __init__(self):
+        self.counts = [0] * self.n_bins
+        self.max = 0.
+
+    def add(self, latency):
+        if latency > MIN_LATENCY:
+            i = int(math.log10(latency / MIN_LATENCY) * BINS_PER_DECADE) + 1
+            self.counts[min(i, self.n_bins - 1)] += 1
+        else:
+            self.counts[0] += 1
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, p):
+        """Estimate the `p`-th percentile latency, or None if the histogram is empty"""
+        rank = sum(self.counts) * p / 100.
+        if not rank:
+            return None
+
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                break
+        if i == 0:
+            return MIN_LATENCY
+        # Geometric center of the bin, which can't exceed the largest latency seen
+        return min(MIN_LATENCY * 10**((i - 0.5) / BINS_PER_DECADE), self.max)
+
+
+class _CommandStats(object):
+    __slots__ = ('count', 'sent', 'received', 'total', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.sent = 0
+        self.received = 0
+        self.total = 0.
+        self.histogram = LatencyHistogram()
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sent': self.sent,
+            'received': self.received,
+            'total': self.total,
+            'mean': self.total / self.count,
+            'p50': self.histogram.percentile(50),
+            'p99': self.histogram.percentile(99),
+            'max': self.histogram.max,
+        }
+
+
+class IOStats(object):
+    """I/O statistics, collected per source and per command while recording
+
+    Use `start()` and `stop()` to control recording, or `capture()` to record within a block.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = WeakKeyDictionary()  # source -> {(kind, command): _CommandStats}
+
+    def start(self):
+        with _active_lock:
+            if self not in active:
+                active.append(self)
+
+    def stop(self):
+        with _active_lock:
+            if self in active:
+                active.remove(self)
+
+    @property
+    def recording(self):
+        return self in active
+
+    def reset(self):
+        with self._lock:
+            self._sources.clear()
+
+    def add(self, source, kind, command, latency, sent=0, received=0):
+        """Add a single operation's statistics
+
+        Parameters
+        ----------
+        source : object
+            The instrument or session performing the I/O. Only a weak reference is kept to it.
+        kind : str
+            Kind of operation, e.g. ``'write'``, ``'query'``, ``'get'`` or ``'set'``
+        command : str
+            Command the operation is grouped under
+        latency : float
+            Duration of the operation, in seconds
+        sent, received : int, optional
+            Number of bytes sent and received
+        """
+        with self._lock:
+            try:
+                table = self._sources[source]
+            except KeyError:
+                table = self._sources[source] = {}
+            try:
+                stats = table[kind, command]
+            except KeyError:
+                stats = table[kind, command] = _CommandStats()
+            stats.count += 1
+            stats.sent += sent
+            stats.received += received
+            stats.total += latency
+            stats.histogram.add(latency)
+
+    def summary(self, source):
+        """Get the statistics for `source`
+
+        Returns
+        -------
+        OrderedDict
+            Maps each ``(kind, command)`` to a dict of its `count`, bytes `sent` and `received`,
+            and its `total`, `mean`, `p50`, `p99` and `max` latency in seconds. Ordered by total
+            latency, largest first.
+        """
+        with self._lock:
+            table = self._sources.get(source, {})
+            items = sorted(table.items(), key=lambda item: item[1].total, reverse=True)
+            return OrderedDict((key, stats.as_dict()) for key, stats in items)
+
+    def sources(self):
+        """Get a list of the sources that have recorded statistics"""
+        with self._lock:
+            return list(self._sources.keys())
+
+    def report(self, limit=None):
+        """Format the statistics of all sources as a table of commands, by total latency
+
+        Parameters
+        ----------
+        limit : int, optional
+            Maximum number of commands to include
+        """
+        rows = []
+        for source in self.sources():
+            name = type(source).__name__
+            for (kind, command), s in self.summary(source).items():
+                rows.append((name, kind, command, s))
+        rows.sort(key=lambda row: row[3]['total'], reverse=True)
+
+        lines = ['{:<20} {:<6} {:<24} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            'source', 'kind', 'command', 'count', 'total (s)', 'p50 (ms)', 'p99 (ms)', 'bytes')]
+        for name, kind, command, s in rows[:limit]:
+            lines.append('{:<20} {:<6} {:<24} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10}'.format(
+                name[:20], kind, command[:24], s['count'], s['total'], 1e3*s['p50'],
+                1e3*s['p99'], s['sent'] + s['received']))
+        return '\n'.join(lines)
+
+
+def record(source, kind, command, t_start, sent=0, received=0):
+    """Record an operation that started at ``time.perf_counter()`` value `t_start` to all active
+    IOStats"""
+    latency = time.perf_counter() - t_start
+    for stats in list(active):  # `stop()` may be called from another thread
+        stats.add(source, kind, command, latency, sent, received)
+
+
+def scpi_command(message):
+    """Reduce an SCPI message to its headers, e.g. ``':freq:cent 1e6;:span?'`` to
+    ``'freq:cent;span?'``, so that its statistics are grouped regardless of parameters"""
+    return ';'.join(part.split(None, 1)[0].lstrip(':') if part.strip() else ''
+                    for part in message.split(';'))
+
+
+def global_stats():
+    """Get the process-wide `IOStats`, which records while enabled by `enable()`"""
+    if global_stats.instance is None:
+        global_stats.instance = IOStats()
+    return global_stats.instance
+
+
+global_stats.instance = None
+
+
+def enable():
+    """Start recording I/O statistics to the process-wide `IOStats`"""
+    global_stats().start()
+
+
+def disable():
+    """Stop recording I/O statistics to the process-wide `IOStats`"""
+    global_stats().stop()
+
+
+@contextlib.contextmanager
+def capture():
+    """Context manager that records I/O statistics made within its block
+
+    Yields a new `IOStats`, which stops recording at the end of the block. This is independent of
+    the process-wide statistics.
+
+        >>> with iostats.capture() as stats:
+        ...     run_calibration()
+        >>> print(stats.report(limit=10))
+    """
+    stats = IOStats()
+    stats.start()
+    try:
+        yield stats
+    finally:
+        stats.stop()
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+Recording and replay of instrument I/O.
+
+Within a `recording()` block, each VISA resource handed to a driver by `instrument()`, and each
+serial port a driver opens with `open_port()`, is wrapped so that every method call, attribute get
+and attribute set made on it is appended to a trace file, along with its result and timing. The
+trace can later stand in for the hardware: ``instrument(replay='scope.trace')`` creates the
+recorded driver with a resource that answers each call from the trace. This makes it possible to
+run and benchmark drivers offline, e.g. on CI.
+
+A trace file starts with `MAGIC`, followed by a sequence of records. Each record is a
+`RECORD` header (op, stream, start time, duration, payload length) and a pickled payload. Each
+wrapped resource is a separate stream, introduced by an `OPEN` record holding its instrument's
+params.
+
+Replay is strict: the driver must make the same calls, with the same arguments, in the same order
+as when it was recorded, or a `TraceMismatchError` is raised. Resources used from several threads
+at once (e.g. by a serial reader thread) are recorded in the order the calls completed, so they
+may not replay reliably.
+
+Trace payloads are pickled, and loading a trace unpickles them, which can run arbitrary code. Only
+replay traces from sources you trust.
+"""
+import time
+import pickle
+import struct
+import functools
+import threading
+import contextlib
+
+from ..errors import Error
+from ..log import get_logger
+
+log = get_logger(__name__)
+
+__all__ = ['TraceMismatchError', 'TraceRecorder', 'Trace', 'recording', 'open_port',
+           'open_replay']
+
+MAGIC = b'IVTRACE\x01'
+RECORD = struct.Struct('<BHddI')  # op, stream, start, duration, payload length
+OPEN, CALL, GET, SET = range(4)
+SUBOBJECTS = {'visalib'}  # Attributes whose own calls are recorded, e.g. visalib.read()
+TIMINGS = ('fast', 'real')
+
+
+class TraceMismatchError(Error):
+    pass
+
+
+class _SubObject(object):
+    """Marks a recorded attribute whose calls were recorded too"""
+
+
+class _Missing(object):
+    """Marks a recorded attribute that didn't exist"""
+
+
+class _Opaque(object):
+    """Stands in for a value that couldn't be pickled, e.g. a context manager"""
+    def __init__(self, type_name):
+        self.type_name = type_name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __repr__(self):
+        return '<Opaque {}>'.format(self.type_name)
+
+
+def _dumps(value):
+    try:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+
+
+class TraceRecorder(object):
+    """Writes the I/O of wrapped resources to a trace file
+
+    Parameters
+    ----------
+    path : str
+        Path of the trace file, which is overwritten
+    """
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._n_streams = 0
+        self._t0 = time.perf_counter()
+
+    def wrap(self, obj, params, kind):
+        """Wrap `obj` so its I/O is recorded as a new stream
+
+        Parameters
+        ----------
+        obj : object
+            The resource to wrap, e.g. a pyvisa resource or a serial port
+        params : dict
+            Params of the instrument using `obj`, including its `module` and `classname`
+        kind : str
+            Kind of resource, either ``'visa'`` (the resource is passed to the driver by
+            `instrument()`) or ``'serial'`` (the driver opens it with `open_port()`)
+        """
+        params = {k: v for k, v in dict(params).items() if not k.startswith('**')}
+        data = self._encode(OPEN, (params, kind))
+        with self._lock:
+            # Replay numbers streams in the order of their OPEN records, so write it while the
+            # stream's number is reserved
+            stream = self._n_streams
+            self._n_streams += 1
+            self._write_record(OPEN, stream, self._t0, 0., data)
+        log.info("Recording I/O of %s to stream %d of '%s'", params, stream, self.path)
+        return _RecordingProxy(obj, _RecordedStream(self, stream), '')
+
+    def _write(self, op, stream, t_start, duration, payload):
+        data = self._encode(op, payload)
+        with self._lock:
+            self._write_record(op, stream, t_start, duration, data)
+
+    def _encode(self, op, payload):
+        data = _dumps(payload)
+        if data is None and op == CALL:
+            name, args, kwds, result, raised = payload
+            if raised:
+                result = Error(repr(result))
+            data = _dumps((name, args, kwds, result, raised))
+            if data is None:
+                args = args if _dumps((args, kwds)) is not None else _Opaque('args')
+                data = _dumps((name, args, kwds, _Opaque(type(result).__name__), raised))
+        elif data is None:
+            data = _dumps((payload[0], _Opaque(type(payload[1]).__name__)))
+        return data
+
+    def _write_record(self, op, stream, t_start, duration, data):
+        """Write a record to the file. The caller must hold `_lock`."""
+        if not self.closed:
+            self._file.write(RECORD.pack(op, stream, t_start - self._t0, duration, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+
+
+class _RecordedStream(object):
+    __slots__ = ('recorder', 'id')
+
+    def __init__(self, recorder, id):
+        self.recorder = recorder
+        self.id = id
+
+    def call(self, name, method, *args, **kwds):
+        if self.recorder.closed:
+            return method(*args, **kwds)
+        t_start = time.perf_counter()
+        try:
+            result = method(*args, **kwds)
+        except Exception as e:
+            self.recorder._write(CALL, self.id, t_start, time.perf_counter() - t_start,
+                                 (name, args, kwds, e, True))
+            raise
+        self.recorder._write(CALL, self.id, t_start, time.perf_counter() - t_start,
+                             (name, args, kwds, result, False))
+        return result
+
+
+class _RecordingProxy(object):
+    __slots__ = ('_obj', '_stream', '_prefix')
+
+    def __init__(self, obj, stream, prefix):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_stream', stream)
+        object.__setattr__(self, '_prefix', prefix)
+
+    def __getattr__(self, name):
+        stream = self._stream
+        full_name = self._prefix + name
+        t_start = time.perf_counter()
+        try:
+            value = getattr(self._obj, name)
+        except AttributeError:
+            value = _Missing
+        if value is not _Missing and callable(value):
+            return functools.partial(stream.call, full_name, value)
+
+        if not stream.recorder.closed:
+            recorded = _SubObject if name in SUBOBJECTS else value
+            stream.recorder._write(GET, stream.id, t_start, time.perf_counter() - t_start,
+                                   (full_name, recorded))
+        if value is _Missing:
+            raise AttributeError(name)
+        elif name in SUBOBJECTS:
+            return _RecordingProxy(value, stream, full_name + '.')
+        return value
+
+    def __setattr__(self, name, value):
+        t_start = time.perf_counter()
+        setattr(self._obj, name, value)
+        stream = self._stream
+        if not stream.recorder.closed:
+            stream.recorder._write(SET, stream.id, t_start, time.perf_counter() - t_start,
+                                   (self._prefix + name, value))
+
+    def __repr__(self):
+        return '<Recording {!r}>'.format(self._obj)
+
+
+class Trace(object):
+    """The streams of a trace file, loaded into memory
+
+    Attributes
+    ----------
+    streams : list of (params, kind, records)
+        Each stream's instrument params, resource kind, and list of ``(op, duration, payload)``
+        records
+    """
+    def __init__(self, path):
+        self.path = path
+        self.streams = []
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise Error("'{}' is not an I/O trace file".format(path))
+
+        offset = len(MAGIC)
+        while offset < len(data):
+            op, stream, _, duration, length = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            payload = pickle.loads(data[offset:offset+length])
+            offset += length
+            if op == OPEN:
+                params, kind = payload
+                self.streams.append((params, kind, []))
+            else:
+                self.streams[stream][2].append((op, duration, payload))
+
+    def find_stream(self, params):
+        """Get the first stream whose params match all of `params`"""
+        for stream in self.streams:
+            if all(stream[0].get(k) == v for k, v in params.items()):
+                return stream
+        raise TraceMismatchError("No stream in trace '{}' matches {}".format(self.path, params))
+
+
+class _ReplayCursor(object):
+    """Position within a stream's records, shared by a replay resource and its subobjects"""
+    __slots__ = ('records', 'index', 'timing', 'lock')
+
+    def __init__(self, records, timing):
+        self.records = records
+        self.index = 0
+        self.timing = timing
+        self.lock = threading.Lock()
+
+    def take(self, op, name):
+        with self.lock:
+            if self.index >= len(self.records):
+                raise TraceMismatchError("Trace ended, but the driver accessed '{}'".format(name))
+            rec_op, duration, payload = self.records[self.index]
+            if rec_op != op or payload[0] != name:
+                raise TraceMismatchError("Trace record {} is a {} of '{}', but the driver made a "
+                                         "{} of '{}'".format(self.index, _OP_NAMES[rec_op],
+                                                             payload[0], _OP_NAMES[op], name))
+            self.index += 1
+        if self.timing == 'real':
+            time.sleep(duration)
+        return payload
+
+    def peek_op(self, name):
+        with self.lock:
+            if self.index < len(self.records):
+                rec_op, _, payload = self.records[self.index]
+                if payload[0] == name:
+                    return rec_op
+        return None
+
+
+_OP_NAMES = {OPEN: 'open', CALL: 'call', GET: 'get', SET: 'set'}
+
+
+class _ReplayResource(object):
+    """Resource whose calls and attributes are answered from a recorded stream"""
+    __slots__ = ('_cursor', '_prefix')
+
+    def __init__(self, cursor, prefix=''):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_prefix', prefix)
+
+    def __getattr__(self, name):
+        full_name = self._prefix + name
+        if self._cursor.peek_op(full_name) == CALL:
+            return functools.partial(self._call, full_name)
+
+        _, value = self._cursor.take(GET, full_name)
+        if value is _Missing:
+            raise AttributeError(name)
+        elif value is _SubObject:
+            return _ReplayResource(self._cursor, full_name + '.')
+        return value
+
+    def __setattr__(self, name, value):
+        self._cursor.take(SET, self._prefix + name)
+
+    def _call(self, name, *args, **kwds):
+        _, rec_args, rec_kwds, result, raised = self._cursor.take(CALL, name)
+        if not isinstance(rec_args, _Opaque) and _dumps((args, kwds)) != _dumps((rec_args,
+                                                                                 rec_kwds)):
+            raise TraceMismatchError("Driver called {} with args {}, {}, but the trace has {}, "
+                                     "{}".format(name, args, kwds, rec_args, rec_kwds))
+        if raised:
+            raise result
+        return result
+
+    def __repr__(self):
+        return '<Replay {}/{}>'.format(self._cursor.index, len(self._cursor.records))
+
+
+_recorder = None  # TraceRecorder of the active recording() block
+_replay_ports = []  # Replay resources waiting to be opened by open_port()
+
+
+@contextlib.contextmanager
+def recording(path):
+    """Context manager that records the I/O of instruments opened within its block to `path`
+
+    Yields the `TraceRecorder`. Instruments opened within the block continue to work normally
+    after it ends, but are no longer recorded.
+
+        >>> with iotrace.recording('scope.trace'):
+        ...     scope = instrument('myscope')
+        ...     scope.get_data()
+        >>> scope = instrument(replay='scope.trace')
+        >>> scope.get_data()  # Answered from the trace
+    """
+    global _recorder
+    if _recorder is not None:
+        raise Error("Already recording to '{}'".format(_recorder.path))
+    _recorder = TraceRecorder(path)
+    try:
+        yield _recorder
+    finally:
+        _recorder.close()
+        _recorder = None
+
+
+def wrap(obj, params, kind='visa'):
+    """Wrap `obj` for recording if within a `recording()` block, otherwise return it as-is"""
+    if _recorder is None:
+        return obj
+    return _recorder.wrap(obj, params, kind)
+
+
+def open_port(opener, params, *args, **kwds):
+    """Open a port (e.g. a serial port) for a driver, supporting recording and replay
+
+    Drivers that open their own ports should use this rather than calling the port's constructor
+    directly, e.g. ``open_port(Serial, self._paramset, port, baudrate=9600)``.
+
+    Parameters
+    ----------
+    opener : callable
+        Called with `args` and `kwds` to open the port, except during replay
+    params : dict
+        Params of the instrument opening the port
+    """
+    if _replay_ports:
+        return _replay_ports.pop(0)
+    return wrap(opener(*args, **kwds), params, 'serial')
+
+
+def open_replay(params):
+    """Create an instrument whose I/O is answered from a trace
+
+    This is what ``instrument(replay=path, ...)`` calls. Any params other than `replay` and
+    `replay_timing` select which of the trace's streams to replay; by default, the first.
+
+    Parameters
+    ----------
+    params : dict
+        Must include `replay`, the path of the trace file. May include `replay_timing`, either
+        ``'fast'`` (the default) to answer each call immediately, or ``'real'`` to take as long as
+        each call took when recorded.
+    """
+    from . import ParamSet, import_driver, create_instrument
+
+    timing = params.get('replay_timing', 'fast')
+    if timing not in TIMINGS:
+        raise ValueError("replay_timing must be one of {}".format(TIMINGS))
+    trace = Trace(params['replay'])
+    rec_params, kind, records = trace.find_stream(
+        {k: v for k, v in params.items() if k not in ('replay', 'replay_timing')})
+    resource = _ReplayResource(_ReplayCursor(records, timing))
+
+    driver_module = import_driver(rec_params['module'], raise_errors=True)
+    paramset = ParamSet(**rec_params)
+    if kind == 'visa':
+        return create_instrument(driver_module, rec_params['classname'], paramset, resource)
+
+    _replay_ports.append(resource)
+    try:
+        return create_instrument(driver_module, rec_params['classname'], paramset)
+    finally:
+        if resource in _replay_ports:
+            _replay_ports.remove(resource)
@@ -32,7 +32,7 @@ from ctypes import (c_int32, c_bool, byref, create_string_buffer,
                     Structure, POINTER, oledll)
 from . import Motion
 from .. import ParamSet
-from ..util import check_units, check_enums
+from ..util import check_units, check_enums, to_quantity, magnitude_as
 from ...errors import InstrumentNotFoundError
 from ... import Q_
 
@@ -119,7 +119,7 @@ class Actor(Motion):
             amplitude of the actuator signal in volt-compatible units. The
             allowed range of inputs is from 0 V to 45 V.
         """
-        amp_in_mV = int(Q_(amplitude).to('mV').magnitude)
+        amp_in_mV = int(magnitude_as(amplitude, 'mV'))
         if not (0 <= amp_in_mV <= 45e3):
             raise Exception("Amplitude must be between 0 and 45 V")
         self._c._controlAmplitude(self.axis, amp_in_mV, set=True)
@@ -141,7 +141,7 @@ class Actor(Motion):
             frequency of the actuator signal in Hz-compatible units. The
             allowed range of inputs is from 1 Hz to 2 kHz.
         """
-        freq_in_mHz = int(Q_(frequency).to('mHz').magnitude)
+        freq_in_mHz = int(magnitude_as(frequency, 'mHz'))
         if not (1e3 <= freq_in_mHz <= 2e6):
             raise Exception("Frequency must be between 1 Hz and 2 kHz")
         self._c._controlFrequency(self.axis, freq_in_mHz, set=True)
@@ -251,7 +251,7 @@ class Actor(Motion):
         """
         at_target = self.at_target(delta_pos)
         while not at_target:
-            time.sleep(update_interval.to('s').magnitude)
+            time.sleep(magnitude_as(update_interval, 's'))
             at_target = self.at_target(delta_pos)
             if at_target:
                 return
@@ -264,14 +264,14 @@ class Actor(Motion):
         """
         if delta_pos is None:
             if self._actor_type==ActorType.LinearStage:
-                delta_pos = Q_('1nm')
-            if self._actor_type==Goniometer:
-                delta_pos = Q_('1 urad')
+                delta_pos = to_quantity('1 nm')
+            if self._actor_type==ActorType.Goniometer:
+                delta_pos = to_quantity('1 urad')
         target = self.get_target()
         position = self.get_position()
         delta = target - position
-        delta = delta.to(self._pos_units).magnitude
-        if delta <= delta_pos.to(self._pos_units).magnitude:
+        delta = magnitude_as(delta, self._pos_units)
+        if delta <= magnitude_as(delta_pos, self._pos_units):
             return True
         else:
             return False
@@ -7,6 +7,8 @@ import pyvisa
 
 from ... import Q_, u
 from .. import ParamSet, SCPI_Facet, VisaMixin
+from ..visa_pool import visa_resource_pool
+from ...errors import ConfigError
 from . import PowerSupply
 
 _INST_PARAMS_ = ['visa_address']
@@ -18,12 +20,18 @@ def list_instruments():
     """Get a list of all power supplies currently attached"""
     paramsets = []
     search_string = "ASRL?*"
-    rm = pyvisa.ResourceManager()
-    raw_spec_list = rm.list_resources(search_string)
+    pool = visa_resource_pool()
+    try:
+        raw_spec_list = pool.list_resources(query=search_string)
+    except ConfigError:
+        return paramsets  # No VISA library available
 
     for spec in raw_spec_list:
         try:
-            inst = rm.open_resource(spec, read_termination='\n', write_termination='\n')
+            inst = pool.acquire(spec, probe=True, read_termination='\n', write_termination='\n')
+        except pyvisa.errors.VisaIOError:
+            continue
+        try:
             idn = inst.query("*IDN?")
             manufacturer, model, serial, version = idn.rstrip().split(',', 4)
             if re.match('DP7[0-9]{2}', model):
@@ -31,6 +39,8 @@ def list_instruments():
         except pyvisa.errors.VisaIOError as vio:
             # Ignore unknown serial devices
             pass
+        finally:
+            inst.close()
 
     return paramsets
 
@@ -5,13 +5,23 @@ Support for instruments on remote servers.
 """
 
 from __future__ import absolute_import, unicode_literals, print_function
+import time
 import atexit
+import asyncio
 import socket
 import struct
 import threading
+import contextlib
+import collections
 import pickle
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures import wait as wait_futures
 
-from . import instrument, list_instruments, Instrument
+from past.builtins import basestring
+
+from . import instrument, list_instruments, Instrument, ParamSet, iostats
+from .facet import Facet, ChangeEvent
 from .. import conf
 from ..log import get_logger
 
@@ -21,14 +31,63 @@ try:
 except ImportError:
     import SocketServer as socketserver
 
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
 log = get_logger(__name__)
 
 DEFAULT_PORT = 28265
+DEFAULT_TIMEOUT = 2.0
 
-# Header format is:
-# 1 unsigned byte - message id
+# Frame header format is:
+# 1 unsigned byte - frame kind (REQUEST, RESPONSE or EVENT)
+# 1 unsigned byte - flags (see FLAG_* below)
+# 4 unsigned bytes - request id, which a response shares with its request. For an EVENT pushed by
+#                    the server, this is instead the id of its subscription.
 # 8 unsigned bytes - message length in bytes (not including header)
-STRUCT = struct.Struct('!BQ')
+STRUCT = struct.Struct('!BBIQ')
+REQUEST = 0
+RESPONSE = 1
+EVENT = 2
+KIND_NAMES = {REQUEST: 'request', RESPONSE: 'response', EVENT: 'event'}
+MAX_REQUEST_ID = 2**32
+
+# The message holds out-of-band buffers. It then begins with a table giving the number of buffers
+# and the length of the pickle data, followed by the length of each buffer. The pickle data comes
+# next, then the buffers, each starting on a BUFFER_ALIGNMENT-byte boundary.
+FLAG_BUFFERS = 0x01
+# The sender is able to receive messages with out-of-band buffers
+FLAG_ACCEPT_BUFFERS = 0x02
+# Parts of the message are compressed. The buffer table is followed by a byte giving the length of
+# the codec's name, then the name itself. Compressed parts have _COMPRESSED_BIT set in their length.
+FLAG_COMPRESSED = 0x04
+# The message is part of a delta-encoded stream. Buffers with _DELTA_BIT set in their length were
+# XORed with the corresponding buffer of the stream's previous message.
+FLAG_DELTA = 0x08
+
+BUFFER_TABLE = struct.Struct('!IQ')
+BUFFER_ALIGNMENT = 8
+_COMPRESSED_BIT = 1 << 63
+_DELTA_BIT = 1 << 62
+_LENGTH_MASK = _DELTA_BIT - 1
+
+# Once compression is negotiated, message parts at least this large are compressed
+DEFAULT_COMPRESSION_THRESHOLD = 64 * 1024
+
+# Contiguous buffers (e.g. of NumPy arrays) at least this large are sent out-of-band, directly from
+# their memory, rather than being copied into the pickle data
+OUT_OF_BAND_THRESHOLD = 64 * 1024
+OUT_OF_BAND = pickle.HIGHEST_PROTOCOL >= 5
+
+_MAX_IOV = 512  # Max number of chunks passed to a single sendmsg() call
+
+# Shortest interval at which the server will sample a value for a subscription
+MIN_SAMPLE_INTERVAL = 0.01
+
+# Max number of threads the server uses to run requests
+DEFAULT_MAX_WORKERS = 16
 
 
 class FakeLock(object):
@@ -47,172 +106,854 @@ class RemoteTimeoutError(RemoteError):
     pass
 
 
-class Messenger(object):
-    """Low-level messenger used to send and receive discrete, numbered byte-level messages"""
-    def __init__(self):
-        self.leftover = None
+class Codec(object):
+    """Compression codec usable by remote sessions. Create one using `register_codec()`."""
+    def __init__(self, name, compress, decompress):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
 
-    def _send_message(self, message, id):
-        encoded = self.encode(message, id, len(message))
-        try:
-            self.sock.sendall(encoded)
-        except socket.timeout:
-            raise RemoteTimeoutError("Timed out while sending message data")
-        except Exception as e:
-            raise RemoteError("Socket error while sending message data: {}".format(str(e)))
+    def __repr__(self):
+        return '<Codec {!r}>'.format(self.name)
 
-    def _recv_message(self):
-        if self.leftover:
-            bytes_recd = len(self.leftover)
-            chunks = [self.leftover]
+    def pack(self, buf, threshold):
+        """Compress `buf` if it's large enough and compresses well
+
+        Returns a tuple ``(chunk, length)``, where `length` is tagged with `_COMPRESSED_BIT` if
+        `chunk` was compressed.
+        """
+        n_bytes = memoryview(buf).nbytes
+        if n_bytes < threshold:
+            return buf, n_bytes
+        compressed = self.compress(buf)
+        if len(compressed) >= n_bytes:
+            return buf, n_bytes
+        return compressed, len(compressed) | _COMPRESSED_BIT
+
+
+CODECS = collections.OrderedDict()  # name -> Codec
+
+
+def register_codec(name, compress, decompress):
+    """Register a compression codec for use by remote sessions
+
+    `compress` takes a bytes-like object and returns its compressed bytes, and `decompress`
+    reverses this. A codec can only be used if both the client and server have registered it under
+    the same name. The built-in codecs are 'zlib' and (if available) 'lzma'.
+    """
+    CODECS[name] = Codec(name, compress, decompress)
+
+
+register_codec('zlib', lambda data: zlib.compress(data, 1), zlib.decompress)
+if lzma is not None:
+    register_codec('lzma', lambda data: lzma.compress(data, preset=0), lzma.decompress)
+
+
+def _delta_encode(buffers, refs):
+    """XOR each buffer with its counterpart in `refs`, then replace `refs` with copies of `buffers`
+
+    Returns the list of encoded buffers and a list of which ones are deltas.
+    """
+    import numpy as np
+    encoded = []
+    is_delta = []
+    arrays = [np.frombuffer(buf, np.uint8) for buf in buffers]
+    for i, arr in enumerate(arrays):
+        ref = refs[i] if i < len(refs) else None
+        if ref is not None and ref.size == arr.size:
+            encoded.append(memoryview(np.bitwise_xor(arr, ref)))
+            is_delta.append(True)
         else:
-            bytes_recd = 0
+            encoded.append(buffers[i])
+            is_delta.append(False)
+    refs[:] = [arr.copy() for arr in arrays]
+    return encoded, is_delta
+
+
+class Messenger(object):
+    """Low-level messenger used to send and receive discrete, numbered byte-level messages
+
+    Each message is a tuple ``(data, buffers)`` of pickle data and the out-of-band buffers it
+    refers to. Buffers are sent straight from the memory of their objects and received directly
+    into a single preallocated bytearray, so large arrays are never copied between the socket and
+    the objects that use them.
+
+    If a `codec` is set, parts of outgoing messages that are at least `compression_threshold`
+    bytes are compressed. Incoming messages name their codec, so they can be decompressed
+    regardless of this setting.
+    """
+    def __init__(self):
+        self.send_lock = threading.Lock()
+        self.peer_accepts_buffers = False
+        self.codec = None
+        self.compression_threshold = DEFAULT_COMPRESSION_THRESHOLD
+        self.delta_refs = {}  # stream id -> buffers of its previous message
+        self._header = bytearray(STRUCT.size)
+
+    def _send_message(self, message, id, kind, delta=False):
+        self._send_frames([(message, id, kind)], delta)
+
+    def _send_frames(self, frames, delta=False):
+        """Send a sequence of ``(message, id, kind)`` frames using a single write
+
+        If `delta` is True, each frame is delta-encoded against the previous one sent with its id.
+        """
+        with self.send_lock:
+            # Encode while holding the lock, so delta-encoded messages go out in the same order
+            # their refs were updated
             chunks = []
+            for message, id, kind in frames:
+                refs = None
+                if delta and self.codec is not None:
+                    refs = self.delta_refs.setdefault(id, [])
+                chunks.extend(self.encode(message, id, kind, self.codec,
+                                          self.compression_threshold, refs))
+            chunks = _coalesce(chunks)
+            if iostats.active:
+                n_bytes = sum(memoryview(chunk).nbytes for chunk in chunks)
+                t_start = time.perf_counter()
+            else:
+                t_start = None
 
-        while bytes_recd < 9:
             try:
-                chunk = self.sock.recv(4096)
+                if hasattr(self.sock, 'sendmsg'):
+                    self._sendmsg_all(chunks)
+                else:
+                    for chunk in chunks:
+                        self.sock.sendall(chunk)
             except socket.timeout:
-                raise RemoteTimeoutError("Timed out while waiting for message data")
+                raise RemoteTimeoutError("Timed out while sending message data")
             except Exception as e:
-                raise RemoteError("Socket error while waiting for message data: {}".format(str(e)))
-
-            chunks.append(chunk)
-            bytes_recd += len(chunk)
-            if not chunk:
-                if bytes_recd == 0:
-                    return None
-                raise RuntimeError("Socket connection ended unexpectedly")
-
-        id, length = self.read_header(b''.join(chunks))
-
-        while bytes_recd < length+9:
+                raise RemoteError("Socket error while sending message data: {}".format(str(e)))
+
+            if t_start is not None:
+                command = KIND_NAMES[frames[0][2]] if len(frames) == 1 else 'batch'
+                iostats.record(self, 'send', command, t_start, n_bytes)
+
+    def _sendmsg_all(self, chunks):
+        # Scatter-gather equivalent of sendall()
+        i = 0
+        while i < len(chunks):
+            n_sent = self.sock.sendmsg(chunks[i:i+_MAX_IOV])
+            while i < len(chunks) and n_sent >= len(chunks[i]):
+                n_sent -= len(chunks[i])
+                i += 1
+            if n_sent:
+                chunks[i] = chunks[i][n_sent:]
+
+    def _recv_exactly(self, view):
+        """Fill the writable buffer `view` from the socket
+
+        Returns False if the connection was closed before any data arrived.
+        """
+        n_recd = 0
+        while n_recd < len(view):
             try:
-                chunk = self.sock.recv(4096)
+                n = self.sock.recv_into(view[n_recd:])
             except socket.timeout:
                 raise RemoteTimeoutError("Timed out while waiting for message data")
             except Exception as e:
                 raise RemoteError("Socket error while waiting for message data: {}".format(str(e)))
 
-            chunks.append(chunk)
-            bytes_recd += len(chunk)
-            if not chunk:
-                raise RuntimeError("Socket connection ended unexpectedly")
+            if not n:
+                if n_recd == 0:
+                    return False
+                raise RemoteError("Socket connection ended unexpectedly")
+            n_recd += n
+        return True
 
-        full_msg = b''.join(chunks)
-        chunks = [full_msg[9+length:]]
-        return full_msg[9:], id
+    def _recv_message(self):
+        """Receive one frame, returning ``(message, id, kind)``, or None if the connection closed"""
+        if not self._recv_exactly(memoryview(self._header)):
+            return None
+        kind, flags, id, length = STRUCT.unpack(self._header)
+        self.peer_accepts_buffers = bool(flags & FLAG_ACCEPT_BUFFERS)
+
+        # Latency is measured from the arrival of the header, not counting time spent idle
+        t_start = time.perf_counter() if iostats.active else None
+        payload = bytearray(length)
+        if length and not self._recv_exactly(memoryview(payload)):
+            raise RemoteError("Socket connection ended unexpectedly")
+        if t_start is not None:
+            iostats.record(self, 'recv', KIND_NAMES.get(kind, str(kind)), t_start,
+                           received=STRUCT.size + length)
+
+        refs = None
+        if flags & FLAG_DELTA:
+            refs = self.delta_refs.get(id)
+            if refs is None:
+                # Late message from a delta-encoded stream we've closed, which can't be decoded
+                return self._recv_message()
+
+        if flags & FLAG_BUFFERS:
+            return self.split_buffers(payload, flags, refs), id, kind
+        return (payload, ()), id, kind
 
     @staticmethod
-    def encode(message, id, length):
-        return STRUCT.pack(id, length) + message
+    def encode(message, id, kind, codec=None, threshold=DEFAULT_COMPRESSION_THRESHOLD, refs=None):
+        """Encode a message as a list of chunks to be sent in order
+
+        If a `codec` is given, the pickle data and each buffer are compressed if they're at least
+        `threshold` bytes. If `refs` is a list, the message is part of a delta-encoded stream:
+        buffers are XORed with their counterparts in `refs` (from the stream's previous message),
+        and `refs` is updated in place.
+        """
+        data, buffers = message
+        flags = FLAG_ACCEPT_BUFFERS if OUT_OF_BAND else 0
+        compress = codec is not None and (len(data) >= threshold or
+                                          any(buf.nbytes >= threshold for buf in buffers))
+        if not (buffers or compress or refs is not None):
+            return [STRUCT.pack(kind, flags, id, len(data)), data]
+
+        if refs is not None:
+            flags |= FLAG_DELTA
+            buffers, is_delta = _delta_encode(buffers, refs)
+        else:
+            is_delta = [False] * len(buffers)
+
+        data_len = len(data)
+        if compress:
+            flags |= FLAG_COMPRESSED
+            data, data_len = codec.pack(data, threshold)
+
+        packed = []
+        lengths = []
+        for buf, delta in zip(buffers, is_delta):
+            if compress:
+                buf, buf_len = codec.pack(buf, threshold)
+            else:
+                buf_len = buf.nbytes
+            packed.append(buf)
+            lengths.append(buf_len | _DELTA_BIT if delta else buf_len)
+
+        table = (BUFFER_TABLE.pack(len(packed), data_len) +
+                 struct.pack('!{}Q'.format(len(packed)), *lengths))
+        if compress:
+            name = codec.name.encode('utf-8')
+            table += struct.pack('!B', len(name)) + name
+
+        chunks = [None, table, data]
+        offset = len(table) + len(data)
+        for buf in packed:
+            padding = -offset % BUFFER_ALIGNMENT
+            if padding:
+                chunks.append(b'\0' * padding)
+            chunks.append(buf)
+            offset += padding + memoryview(buf).nbytes
+
+        chunks[0] = STRUCT.pack(kind, flags | FLAG_BUFFERS, id, offset)
+        return chunks
 
     @staticmethod
-    def decode(message):
-        id, length = STRUCT.unpack(message[:9])
-        return message[9:], id, length
+    def split_buffers(payload, flags=FLAG_BUFFERS, refs=None):
+        """Split a received payload into its pickle data and its buffers
+
+        Uncompressed buffers are memoryviews of `payload`. For a message in a delta-encoded
+        stream, `refs` must be the list of the stream's previous buffers, and is updated in place.
+        """
+        view = memoryview(payload)
+        n_buffers, data_len = BUFFER_TABLE.unpack_from(view)
+        lengths = struct.unpack_from('!{}Q'.format(n_buffers), view, BUFFER_TABLE.size)
+        offset = BUFFER_TABLE.size + 8*n_buffers
+
+        codec = None
+        if flags & FLAG_COMPRESSED:
+            name_len = view[offset]
+            name = bytes(view[offset+1:offset+1+name_len]).decode('utf-8')
+            offset += 1 + name_len
+            try:
+                codec = CODECS[name]
+            except KeyError:
+                raise RemoteError("Received message compressed with unknown codec "
+                                  "'{}'".format(name))
+
+        data = view[offset:offset + (data_len & _LENGTH_MASK)]
+        offset += data_len & _LENGTH_MASK
+        if data_len & _COMPRESSED_BIT:
+            data = codec.decompress(data)
+
+        buffers = []
+        for i, buf_len in enumerate(lengths):
+            offset += -offset % BUFFER_ALIGNMENT
+            buf = view[offset:offset + (buf_len & _LENGTH_MASK)]
+            offset += buf_len & _LENGTH_MASK
+
+            if buf_len & _COMPRESSED_BIT:
+                buf = bytearray(codec.decompress(buf))  # Writable, like uncompressed buffers
+            if buf_len & _DELTA_BIT:
+                import numpy as np
+                arr = np.frombuffer(buf, np.uint8)
+                np.bitwise_xor(arr, refs[i], out=arr)
+            buffers.append(buf)
+
+        if refs is not None:
+            import numpy as np
+            refs[:] = [np.frombuffer(buf, np.uint8).copy() for buf in buffers]
+        return data, buffers
 
     @staticmethod
     def read_header(message):
-        id, length = STRUCT.unpack(message[:9])
+        kind, flags, id, length = STRUCT.unpack(message[:STRUCT.size])
         return id, length
 
 
+def _coalesce(chunks):
+    """Join runs of small chunks, leaving large ones as zero-copy memoryviews"""
+    out = []
+    small = []
+    for chunk in chunks:
+        if len(chunk) < OUT_OF_BAND_THRESHOLD:
+            small.append(chunk)
+            continue
+        if small:
+            out.append(memoryview(b''.join(small)))
+            small = []
+        out.append(memoryview(chunk).cast('B'))
+    if small:
+        out.append(memoryview(b''.join(small)))
+    return out
+
+
 class Session(object):
     """High-level session"""
     @staticmethod
-    def serialize(obj):
-        return pickle.dumps(obj)
+    def serialize(obj, out_of_band=False):
+        """Pickle `obj` into a message tuple ``(data, buffers)``
+
+        If `out_of_band` is True (and supported by this version of Python), large contiguous
+        buffers such as the data of NumPy arrays and array-valued Quantities are left out of the
+        pickle data and returned in `buffers`, so they can be sent without being copied.
+        """
+        if not (out_of_band and OUT_OF_BAND):
+            return pickle.dumps(obj), ()
+
+        buffers = []
+
+        def buffer_callback(pickle_buffer):
+            raw = pickle_buffer.raw()
+            if raw.nbytes < OUT_OF_BAND_THRESHOLD:
+                return True  # Serialize in-band
+            buffers.append(raw)
+
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)
+        return data, buffers
 
     @staticmethod
-    def deserialize(data):
+    def deserialize(message):
+        data, buffers = message
+        if buffers:
+            return pickle.loads(data, buffers=buffers)
         return pickle.loads(data)
 
 
 class ClientMessenger(Messenger):
-    def __init__(self, host, port):
+    """Client end of a connection, which may have many requests in flight at once
+
+    Responses are read by a background thread and handed to the `Future` of the request with the
+    matching id, so requests can be pipelined rather than each waiting a full round trip.
+    """
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT):
         super(ClientMessenger, self).__init__()
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.settimeout(2.0)
-        self.sock.connect((host, port))
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.settimeout(None)  # The reader thread waits indefinitely for responses
         self.host = host
+        self.timeout = timeout
         self.curr_id = 0
+        self.connected = True
+        self.pending = {}  # id -> Future
+        self.pending_lock = threading.Lock()
+        self.subscriptions = {}  # subscription id -> Subscription
+        self.curr_sub_id = 0
+
+        self.reader = threading.Thread(target=self._read_responses,
+                                       name='RemoteReader-{}:{}'.format(host, port))
+        self.reader.daemon = True
+        self.reader.start()
+
+    def send_requests(self, requests):
+        """Send a sequence of request messages to the server in a single write
+
+        Returns a list of Futures, one per request, which will hold the response messages. Use
+        `result()` to wait for them.
+        """
+        frames = []
+        futures = []
+        with self.pending_lock:
+            if not self.connected:
+                raise RemoteError("Connection to server {} is closed".format(self.host))
+            for request in requests:
+                id = self.curr_id
+                self.curr_id = (self.curr_id + 1) % MAX_REQUEST_ID
+                future = self.pending[id] = Future()
+                future.request_id = id
+                futures.append(future)
+                frames.append((request, id, REQUEST))
 
-    def make_request(self, request_bytes):
-        """Send request bytes to the server, and return its response bytes"""
-        id = self.curr_id
-        self.curr_id = (self.curr_id + 1) % 256
-        self._send_message(request_bytes, id)
-        response_bytes, resp_id = self._recv_message()
+        try:
+            self._send_frames(frames)
+        except RemoteError:
+            self._abandon(futures)
+            raise
+        return futures
+
+    def result(self, future, timeout=None):
+        """Wait for the response message of a request sent via `send_requests()`"""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self._abandon([future])
+            raise RemoteTimeoutError("Timed out while waiting for response")
+
+    def make_request(self, request):
+        """Send a request message to the server, and return its response message"""
+        future, = self.send_requests([request])
+        return self.result(future)
+
+    def _abandon(self, futures):
+        # Any late response to these requests will be discarded
+        with self.pending_lock:
+            for future in futures:
+                self.pending.pop(future.request_id, None)
+
+    def _read_responses(self):
+        error = RemoteError("Connection to server {} was closed".format(self.host))
+        try:
+            while True:
+                frame = self._recv_message()
+                if frame is None:
+                    break
+                message, id, kind = frame
+
+                if kind == EVENT:
+                    subscription = self.subscriptions.get(id)
+                    if subscription is not None:
+                        subscription._deliver(message)
+                    continue
+
+                with self.pending_lock:
+                    future = self.pending.pop(id, None)
+                if future is None:
+                    log.info("Discarding response to abandoned request %d", id)
+                    continue
+                future.set_result(message)
+        except RemoteError as e:
+            if self.connected:
+                log.info("Lost connection to server %s: %s", self.host, str(e))
+                error = e
+        finally:
+            with self.pending_lock:
+                self.connected = False
+                pending, self.pending = self.pending, {}
+            for future in pending.values():
+                future.set_exception(error)
+            for subscription in list(self.subscriptions.values()):
+                subscription._end(error)
+
+    def new_subscription_id(self):
+        with self.pending_lock:
+            sub_id = self.curr_sub_id
+            self.curr_sub_id = (self.curr_sub_id + 1) % MAX_REQUEST_ID
+        return sub_id
 
-        if resp_id != id:
-            raise RuntimeError("Message IDs do not match")
+    def close(self):
+        with self.pending_lock:
+            self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, socket.error):
+            pass
+        self.sock.close()
+
+
+class RemoteFuture(object):
+    """The eventual result of a request to a server
+
+    Returned in place of the usual result by requests made inside a `ClientSession.batch()` block.
+    Within the block, calling the future of a method lookup (e.g. ``inst.get_data(...)``) turns it
+    into a queued call of that method.
+    """
+    def __init__(self, session, message):
+        self._session = session
+        self._message = message
+        self._raw_future = None
+        self._done = False
+        self._value = None
 
-        return response_bytes
+    def __repr__(self):
+        state = 'done' if self._done else ('pending' if self._raw_future else 'queued')
+        return '<RemoteFuture {} {}>'.format(self._message['command'], state)
+
+    def __call__(self, *args, **kwargs):
+        if self._raw_future is not None:
+            return self.result()(*args, **kwargs)
+
+        if self._message['command'] != 'attr' or 'args' in self._message:
+            raise RemoteError("Only attribute lookups can be called within a batch")
+        self._message.update(command='callattr', args=args, kwargs=kwargs)
+        return self
+
+    def done(self):
+        """Whether the response has arrived"""
+        return self._done or (self._raw_future is not None and self._raw_future.done())
+
+    def result(self, timeout=None):
+        """Wait for and return the result of the request, raising any remote exception"""
+        if not self._done:
+            if self._raw_future is None:
+                raise RemoteError("Request has not been sent yet; its batch is still open")
+            response = self._session.messenger.result(self._raw_future, timeout)
+            self._value = self._session._process_response(response)
+            self._done = True
+
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+    def _fail(self, exc):
+        self._value = exc
+        self._done = True
+
+
+class Subscription(object):
+    """Values pushed by a server for a subscription made via `ClientSession.subscribe()`
+
+    Iterating over a subscription yields each pushed ``ChangeEvent`` as it arrives, and ends when
+    the subscription is closed. If a callback was given, it's instead called with each event from
+    a dedicated thread. At most `maxlen` unconsumed events are kept; beyond that the oldest are
+    discarded and counted in `dropped`.
+    """
+    def __init__(self, session, sub_id, callback=None, maxlen=1000):
+        self.session = session
+        self.id = sub_id
+        self.dropped = 0
+        self.closed = False
+        self._error = None
+        self._queue = collections.deque()
+        self._maxlen = maxlen
+        self._cond = threading.Condition()
+
+        if callback is not None:
+            self._dispatcher = threading.Thread(target=self._dispatch, args=(callback,),
+                                                name='Subscription-{}'.format(sub_id))
+            self._dispatcher.daemon = True
+            self._dispatcher.start()
+
+    def __repr__(self):
+        return '<Subscription {}{}>'.format(self.id, ' closed' if self.closed else '')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event = self.get()
+        if event is None:
+            raise StopIteration
+        return event
+    next = __next__
+
+    def get(self, timeout=None):
+        """Wait for the next event
+
+        Returns None if the subscription was closed. Raises a `RemoteTimeoutError` if `timeout`
+        seconds pass with no event, and re-raises any exception the server hit while sampling.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue or self.closed, timeout):
+                raise RemoteTimeoutError("Timed out while waiting for an event")
+            if not self._queue:
+                if self._error is not None:
+                    raise self._error
+                return None
+            message = self._queue.popleft()
+
+        event = self.session.deserialize(message)
+        if isinstance(event, Exception):
+            self._end(None)
+            raise event
+        return event
 
     def close(self):
-        self.sock.close()
+        """Cancel the subscription on the server"""
+        if self.closed:
+            return
+        self.session.messenger.subscriptions.pop(self.id, None)
+        self.session.messenger.delta_refs.pop(self.id, None)
+        self._end(None)
+        try:
+            self.session._request_now(command='unsubscribe', sub_id=self.id)
+        except RemoteError as e:
+            log.info("Could not unsubscribe %s: %s", self, str(e))
+
+    def _deliver(self, message):
+        with self._cond:
+            if len(self._queue) >= self._maxlen:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append(message)
+            self._cond.notify_all()
+
+    def _end(self, error):
+        with self._cond:
+            self.closed = True
+            self._error = error
+            self._cond.notify_all()
+
+    def _dispatch(self, callback):
+        while True:
+            try:
+                event = self.get()
+            except Exception as e:
+                log.info("%s ended with error: %s", self, str(e))
+                return
+            if event is None:
+                return
+            try:
+                callback(event)
+            except Exception:
+                log.exception("Error in callback of %s", self)
 
 
 class ClientSession(Session):
-    def __init__(self, host, port, server):
+    def __init__(self, host, port, server, timeout=DEFAULT_TIMEOUT, compression=None):
         self.host = host
         self.port = port
         self.server = server
+        self._local = threading.local()  # Holds each thread's open batch
         try:
-            self.messenger = ClientMessenger(host, port)
+            self.messenger = ClientMessenger(host, port, timeout)
         except socket.timeout:
             raise RemoteTimeoutError("Could not connect to host at {}:{}; timed out".format(host, port))
         except Exception as e:
             raise RemoteError("Socket error while connecting to host: {}".format(str(e)))
 
+        if compression:
+            self.set_compression(compression)
+
     def close(self):
         self.messenger.close()
 
-    def request(self, **message_dict):
-        log.debug('Sending request %r', message_dict)
-        message = self.serialize(message_dict)
-        response = self.messenger.make_request(message)
+    def set_compression(self, codecs=('zlib',), threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        """Negotiate compression of large messages with the server
+
+        Both sides compress the parts of messages (the pickle data and each large array) that are
+        at least `threshold` bytes, as long as compression makes them smaller. Compression pays
+        off on slow links; on a fast local network it usually just costs CPU time.
+
+        Parameters
+        ----------
+        codecs : str or sequence of str
+            Names of acceptable codecs, in order of preference. The server uses the first one it
+            also supports. Pass an empty sequence to turn compression off.
+        threshold : int, optional
+            Size in bytes above which message parts are compressed
+
+        Returns
+        -------
+        str or None
+            Name of the codec chosen by the server, or None if there was no common codec
+        """
+        if isinstance(codecs, basestring):
+            codecs = [codecs]
+        for name in codecs:
+            if name not in CODECS:
+                raise ValueError("Unknown codec '{}'. Available codecs are {}".format(
+                    name, ', '.join(CODECS)))
+
+        name = self._request_now(command='compression', codecs=list(codecs), threshold=threshold)
+        self.messenger.codec = CODECS[name] if name else None
+        self.messenger.compression_threshold = threshold
+        return name
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager that sends the requests made within it together in a single write
+
+        Within the block, remote attribute lookups and method calls made by this thread return a
+        `RemoteFuture` instead of waiting for the response, and attribute and item assignments are
+        queued. Once the block exits, all the queued requests are sent at once and their
+        responses are waited for. The server handles the requests to each instrument in order,
+        but requests to different instruments may run concurrently and finish in any order. An
+        exception raised by a queued assignment is re-raised on exit, while those of lookups and
+        calls are raised by their future's ``result()``::
+
+            with session.batch():
+                inst.span = '1 MHz'
+                center = inst.center
+                data = inst.get_data('ch1')
+            print(center.result(), data.result())
+
+        Batches may be nested, in which case the outermost batch does the sending.
+        """
+        if self._batch is not None:
+            yield
+            return
+
+        batch = self._local.batch = []
+        try:
+            yield
+        except BaseException:
+            for future in batch:
+                future._fail(RemoteError("Request was not sent; its batch was aborted"))
+            raise
+        finally:
+            self._local.batch = None
+
+        if batch:
+            self._send_batch(batch)
+
+    @property
+    def _batch(self):
+        return getattr(self._local, 'batch', None)
+
+    def _send_batch(self, batch):
+        log.debug('Sending batch of %d requests', len(batch))
+        raw_futures = self.messenger.send_requests([self._serialize_request(future._message)
+                                                    for future in batch])
+        for future, raw_future in zip(batch, raw_futures):
+            future._raw_future = raw_future
+
+        first_error = None
+        for future in batch:
+            try:
+                future.result()
+            except Exception as e:
+                if first_error is None and future._message['command'] in ('setattr', 'setitem'):
+                    first_error = e
+        if first_error is not None:
+            raise first_error
+
+    def _serialize_request(self, message_dict):
+        # Only use out-of-band buffers once the server has shown that it understands them
+        return self.serialize(message_dict, out_of_band=self.messenger.peer_accepts_buffers)
+
+    def _process_response(self, response):
         response_obj = self.deserialize(response)
         log.debug('Got response %r', response_obj)
+        if isinstance(response_obj, RemoteObject):
+            response_obj._session = self
+        return response_obj
+
+    def request_async(self, **message_dict):
+        """Send a request without waiting for its response, returning a `RemoteFuture`
+
+        If this thread has an open batch, the request is queued rather than sent.
+        """
+        future = RemoteFuture(self, message_dict)
+        batch = self._batch
+        if batch is not None:
+            log.debug('Queueing request %r', message_dict)
+            batch.append(future)
+        else:
+            log.debug('Sending request %r', message_dict)
+            request = self._serialize_request(message_dict)
+            future._raw_future, = self.messenger.send_requests([request])
+        return future
+
+    def request(self, **message_dict):
+        """Make a request and wait for its result. Returns a `RemoteFuture` if batching."""
+        future = self.request_async(**message_dict)
+        if self._batch is not None:
+            return future
+        return future.result()
+
+    def _request_now(self, **message_dict):
+        # For requests whose results are needed immediately, even within a batch
+        log.debug('Sending request %r', message_dict)
+        response = self.messenger.make_request(self._serialize_request(message_dict))
+        response_obj = self._process_response(response)
         if isinstance(response_obj, Exception):
             raise response_obj
         return response_obj
 
     def list_instruments(self):
-        instr_list = self.request(command='list')
+        instr_list = self._request_now(command='list')
         for instr in instr_list:
             instr['server'] = self.server
         return instr_list
 
     def instrument(self, params):
-        response = self.request(command='create', params=params)
-        response._session = self
-        return response
+        return self._request_now(command='create', params=params)
 
     def get_obj_attr(self, obj_id, attr):
-        obj = self.request(command='attr', obj_id=obj_id, attr=attr)
-        if isinstance(obj, RemoteObject):
-            obj._session = self
-        return obj
+        return self.request(command='attr', obj_id=obj_id, attr=attr)
 
     def set_obj_attr(self, obj_id, attr, value):
         self.request(command='setattr', obj_id=obj_id, attr=attr, value=value)
 
     def get_obj_item(self, obj_id, key):
-        obj = self.request(command='item', obj_id=obj_id, key=key)
-        if isinstance(obj, RemoteObject):
-            obj._session = self
-        return obj
+        return self.request(command='item', obj_id=obj_id, key=key)
 
     def set_obj_item(self, obj_id, key, value):
         self.request(command='setitem', obj_id=obj_id, key=key, value=value)
 
     def get_obj_call(self, obj_id, *args, **kwargs):
-        obj = self.request(command='call', obj_id=obj_id, args=args, kwargs=kwargs)
-        if isinstance(obj, RemoteObject):
-            obj._session = self
-        return obj
+        return self.request(command='call', obj_id=obj_id, args=args, kwargs=kwargs)
+
+    def stats(self):
+        """Get the server's request statistics, as described by `InstrumentExecutor.stats()`"""
+        return self._request_now(command='stats')
+
+    def subscribe(self, obj, name, callback=None, interval=None, on_change=False, max_rate=None,
+                  args=None, maxlen=1000, delta=False):
+        """Subscribe to values of a remote object's attribute, pushed by the server
+
+        Without an `interval`, `name` must be a facet of `obj`, and a ``ChangeEvent`` is pushed
+        each time the facet is set on the server. Otherwise, the server samples the attribute
+        every `interval` seconds and pushes ``ChangeEvent(name, None, value)``.
+
+        Parameters
+        ----------
+        obj : RemoteObject
+            The remote instrument (or other object) to watch
+        name : str
+            Name of the facet or attribute
+        callback : callable, optional
+            Function called with each event, from a separate thread. If not given, iterate over
+            the returned `Subscription` to get the events.
+        interval : float, optional
+            Sampling interval in seconds. The server enforces a minimum of `MIN_SAMPLE_INTERVAL`.
+        on_change : bool, optional
+            When sampling, only push values that differ from the previous sample
+        max_rate : float, optional
+            When observing a facet, the max number of events pushed per second. Changes that come
+            faster are merged, keeping the ``old`` value of the first and ``new`` value of the
+            last.
+        args : tuple, optional
+            When sampling, call the attribute with these arguments and push the result, e.g. to
+            stream ``latest_frame()`` from a camera
+        maxlen : int, optional
+            Number of unconsumed events to keep before discarding the oldest
+        delta : bool, optional
+            Send each array as its difference from the one in the previous event, which greatly
+            improves compression of e.g. camera frames that change little between events. Only
+            takes effect if compression is enabled (see `set_compression()`).
+
+        Returns
+        -------
+        Subscription
+        """
+        sub_id = self.messenger.new_subscription_id()
+        subscription = Subscription(self, sub_id, callback, maxlen)
+        self.messenger.subscriptions[sub_id] = subscription
+        if delta:
+            self.messenger.delta_refs[sub_id] = []
+        try:
+            self._request_now(command='subscribe', obj_id=obj._obj_id, sub_id=sub_id, attr=name,
+                              interval=interval, on_change=on_change, max_rate=max_rate,
+                              args=args, delta=delta)
+        except Exception:
+            self.messenger.subscriptions.pop(sub_id, None)
+            self.messenger.delta_refs.pop(sub_id, None)
+            subscription._end(None)
+            raise
+        return subscription
 
 
 class ServerMessenger(Messenger):
@@ -220,36 +961,301 @@ class ServerMessenger(Messenger):
     def __init__(self, socket):
         super(ServerMessenger, self).__init__()
         self.sock = socket
-        self.curr_id = None
 
     def listen(self):
-        """Listen for an incoming byte message. Returns None if connection was closed"""
-        full_msg = self._recv_message()
-        if full_msg:
-            msg, id = full_msg
-            self.curr_id = id
-            return msg
-        return None
-
-    def respond(self, response_bytes):
-        """Respond (in bytes) to a message received via listen()"""
-        if self.curr_id is None:
-            raise Exception("Invalid message id. respond() must be used to respond to a "
-                            "message received via listen()")
-        self._send_message(response_bytes, self.curr_id)
+        """Listen for an incoming byte message
+
+        Returns a tuple ``(message, id)``, or None if the connection was closed.
+        """
+        frame = self._recv_message()
+        if frame is None:
+            return None
+        msg, id, kind = frame
+        return msg, id
+
+    def respond(self, response, id):
+        """Send a response message to the message with the given id, received via listen()"""
+        self._send_message(response, id, RESPONSE)
+
+    def push(self, message, sub_id, delta=False):
+        """Send an unrequested message for subscription `sub_id`
+
+        If `delta` is True and compression is enabled, the message's buffers are delta-encoded
+        against those of the previous message pushed for this subscription.
+        """
+        self._send_message(message, sub_id, EVENT, delta)
+
+
+_NOTHING = object()
+
+
+def _same_value(a, b):
+    try:
+        return bool(a == b)
+    except ValueError:  # Elementwise comparison, e.g. of arrays
+        import numpy as np
+        return np.array_equal(a, b)
+
+
+class FacetObserver(object):
+    """Server-side subscription that pushes the ChangeEvents of a facet
+
+    Events are pushed at most `max_rate` times per second. Events that come faster are merged and
+    pushed once the rate allows.
+    """
+    def __init__(self, session, sub_id, entry, facet, max_rate=None, delta=False):
+        self.session = session
+        self.sub_id = sub_id
+        self.entry = entry
+        self.delta = delta
+        self.facet_data = facet.instance(entry.obj)
+        self.min_period = (1. / max_rate) if max_rate else 0.
+        self.last_push = 0.
+        self.pending = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.facet_data.observe(self.on_change)
+
+    def stop(self):
+        try:
+            self.facet_data.observers.remove(self.on_change)
+        except ValueError:
+            pass
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.pending = None
+
+    def on_change(self, event):
+        with self.lock:
+            if self.pending is not None:
+                self.pending = event._replace(old=self.pending.old)
+                return
+
+            wait = self.last_push + self.min_period - time.time()
+            if wait > 0:
+                self.pending = event
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+                return
+            self.last_push = time.time()
+        self.session.push(self.sub_id, event, self.entry, self.delta)
+
+    def flush(self):
+        with self.lock:
+            event, self.pending = self.pending, None
+            self.timer = None
+            self.last_push = time.time()
+        if event is not None:
+            self.session.push(self.sub_id, event, self.entry, self.delta)
+
+
+class Sampler(threading.Thread):
+    """Server-side subscription that periodically samples an attribute and pushes its value
+
+    If `args` is given, the attribute is called with them and the result is pushed instead. An
+    exception raised while sampling is pushed to the client, ending the subscription.
+    """
+    def __init__(self, session, sub_id, entry, attr, interval, args=None, on_change=False,
+                 delta=False):
+        super(Sampler, self).__init__(name='Sampler-{}'.format(attr))
+        self.daemon = True
+        self.session = session
+        self.sub_id = sub_id
+        self.entry = entry
+        self.attr = attr
+        self.interval = max(interval, MIN_SAMPLE_INTERVAL)
+        self.args = args
+        self.on_change = on_change
+        self.delta = delta
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def sample(self):
+        with self.entry.lock:
+            value = getattr(self.entry.obj, self.attr)
+            if self.args is not None:
+                value = value(*self.args)
+        return value
+
+    def run(self):
+        last_value = _NOTHING
+        next_time = time.time()
+        while not self.stopped.is_set():
+            try:
+                value = self.sample()
+            except Exception as e:
+                log.info("Sampling '%s' failed: %s", self.attr, str(e))
+                self.session.push(self.sub_id, e, self.entry)
+                return
+
+            if not (self.on_change and last_value is not _NOTHING and
+                    _same_value(value, last_value)):
+                self.session.push(self.sub_id, ChangeEvent(self.attr, None, value), self.entry,
+                                  self.delta)
+            last_value = value
+
+            # Skip ahead rather than bursting if we've fallen behind
+            next_time = max(next_time + self.interval, time.time())
+            self.stopped.wait(next_time - time.time())
 
 
 class ObjectEntry(object):
-    def __init__(self, obj, remote_obj, lock, share):
+    """Server-side record of an object that clients can access remotely
+
+    `key` identifies the executor queue used for requests on the object. An instrument has its own
+    queue, which is shared with the objects obtained through it (e.g. its methods and channels).
+    """
+    def __init__(self, obj, remote_obj, lock, share, key=None, label=None):
         self.id = id(obj)
         self.obj = obj
         self.remote_obj = remote_obj
         self.lock = lock
         self.share = share
+        self.key = self.id if key is None else key
+        self.label = repr(obj) if label is None else label
+
+
+class _TaskQueue(object):
+    def __init__(self, label, window):
+        self.label = label
+        self.tasks = collections.deque()
+        self.running = False
+        self.discarded = False  # Remove once idle
+        self.calls = 0
+        self.total_wait = 0.
+        self.total_latency = 0.
+        self.max_latency = 0.
+        self.recent = collections.deque(maxlen=window)  # Latencies of the most recent calls
+
+    def record(self, wait, latency):
+        self.calls += 1
+        self.total_wait += wait
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.recent.append(latency)
+
+    def stats(self):
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return recent[min(int(p * len(recent)), len(recent) - 1)] if recent else 0.
+        return {
+            'name': self.label,
+            'depth': len(self.tasks),
+            'running': self.running,
+            'calls': self.calls,
+            'mean_wait': (self.total_wait / self.calls) if self.calls else 0.,
+            'mean_latency': (self.total_latency / self.calls) if self.calls else 0.,
+            'p50_latency': percentile(0.5),
+            'p99_latency': percentile(0.99),
+            'max_latency': self.max_latency,
+        }
+
+
+class InstrumentExecutor(object):
+    """Bounded thread pool that runs the tasks for each key (e.g. an instrument) one at a time
+
+    Tasks with the same key run in the order they were submitted, while tasks with different keys
+    run in parallel on up to `max_workers` threads. A key with queued tasks gives up its thread
+    after each one, so busy instruments can't starve the others.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Max number of worker threads
+    window : int, optional
+        Number of recent calls per key used to calculate latency percentiles
+    """
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, window=1000):
+        self.max_workers = max_workers
+        self.window = window
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='InstrumentWorker')
+        self._queues = {}  # key -> _TaskQueue
+        self._lock = threading.Lock()
+
+    def submit(self, key, label, fn, *args):
+        """Queue ``fn(*args)`` to run after any other tasks with `key`, returning a Future"""
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _TaskQueue(label, self.window)
+            queue.discarded = False
+            queue.tasks.append((future, fn, args, time.time()))
+            if queue.running:
+                return future
+            queue.running = True
+        self._pool.submit(self._run_next, key)
+        return future
+
+    def _run_next(self, key):
+        with self._lock:
+            queue = self._queues[key]
+            future, fn, args, t_submit = queue.tasks.popleft()
+
+        t_start = time.time()
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+        t_end = time.time()
+
+        with self._lock:
+            queue.record(t_start - t_submit, t_end - t_start)
+            if not queue.tasks:
+                queue.running = False
+                if queue.discarded and self._queues.get(key) is queue:
+                    del self._queues[key]
+                return
+        self._pool.submit(self._run_next, key)
+
+    def discard(self, key):
+        """Forget the queue for `key`, e.g. once its instrument is closed
+
+        A queue that still has tasks is removed once they have run, unless more are submitted.
+        """
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                return
+            if queue.running or queue.tasks:
+                queue.discarded = True
+            else:
+                del self._queues[key]
+
+    def stats(self):
+        """Get a dict of executor statistics
+
+        Includes the number of `workers`, the number of keys with a task `active`, the total number
+        of tasks `queued`, and a list of per-key `queues`. Each queue's dict gives its `name`,
+        `depth`, number of `calls`, and their mean time spent waiting in the queue, along with the
+        mean, median, 99th-percentile and max latency (in seconds) of running them.
+        """
+        with self._lock:
+            queues = [queue.stats() for queue in self._queues.values()]
+        return {
+            'workers': self.max_workers,
+            'active': sum(1 for q in queues if q['running']),
+            'queued': sum(q['depth'] for q in queues),
+            'queues': queues,
+        }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait)
 
 
 class ServerSession(Session):
-    def __init__(self, socket, shared_obj_table, table_lock):
+    # Cheap commands that are handled directly by the connection's thread rather than queued
+    inline_commands = ('subscribe', 'unsubscribe', 'compression', 'stats')
+
+    def __init__(self, socket, shared_obj_table, table_lock, executor=None):
         self.command_handler = {
             'create': self.handle_create,
             'list': self.handle_list,
@@ -257,13 +1263,23 @@ class ServerSession(Session):
             'setattr': self.handle_setattr,
             'item': self.handle_item,
             'setitem': self.handle_setitem,
-            'call': self.handle_call
+            'call': self.handle_call,
+            'callattr': self.handle_callattr,
+            'subscribe': self.handle_subscribe,
+            'unsubscribe': self.handle_unsubscribe,
+            'compression': self.handle_compression,
+            'stats': self.handle_stats,
         }
         self.shared_obj_table = shared_obj_table
         self.shared_table_lock = table_lock
+        self.executor = InstrumentExecutor() if executor is None else executor
+        self.in_flight = set()  # Futures of queued requests
+        self.in_flight_lock = threading.Lock()
+        self.session_key = ('session', id(self))  # Queue for requests not tied to an object
 
         self.messenger = ServerMessenger(socket)
         self.obj_table = {}  # id -> ObjectEntry
+        self.subscriptions = {}  # subscription id -> FacetObserver or Sampler
 
     def _get_shared_inst(self, params):
         """Get shared instrument if it exists, otherwise create it and add it to the table"""
@@ -275,16 +1291,10 @@ class ServerSession(Session):
             except KeyError:
                 inst = self.shared_obj_table[key] = instrument(params)
                 inst._server_refcount = 0
+                inst._server_lock = threading.RLock()
             inst._server_refcount += 1
 
-            # Get or create module-level lock
-            module_name = inst.__class__.__module__
-            try:
-                lock = self.shared_obj_table[module_name]
-            except KeyError:
-                lock = self.shared_obj_table[module_name] = threading.RLock()
-
-        return inst, lock
+        return inst, inst._server_lock
 
     def _close_shared_inst(self, entry):
         with entry.lock:
@@ -302,6 +1312,7 @@ class ServerSession(Session):
                               if v is entry.obj]
             for key in keys_to_remove:
                 del self.shared_obj_table[key]
+            self.executor.discard(entry.key)
 
     def handle_create(self, request):
         params = request['params']._dict.copy()
@@ -313,7 +1324,7 @@ class ServerSession(Session):
         else:
             # TODO: Add warning or error if instrument is already shared
             inst = instrument(params)
-            lock = FAKE_LOCK
+            lock = threading.RLock()  # Guards against e.g. samplers running alongside requests
 
         obj_id = id(inst)
         remote_obj = RemoteInstrument._create_remote(request['params'], obj_id, None, dir(inst),
@@ -357,10 +1368,71 @@ class ServerSession(Session):
         with entry.lock:
             return entry.obj(*request['args'], **request['kwargs']), entry.lock
 
+    def handle_callattr(self, request):
+        obj_id = request['obj_id']
+        entry = self.obj_table[obj_id]
+        with entry.lock:
+            method = getattr(entry.obj, request['attr'])
+            return method(*request['args'], **request['kwargs']), entry.lock
+
+    def handle_subscribe(self, request):
+        entry = self.obj_table[request['obj_id']]
+        sub_id = request['sub_id']
+        attr = request['attr']
+
+        if request.get('interval') is None:
+            facet = getattr(type(entry.obj), attr, None)
+            if not isinstance(facet, Facet):
+                raise TypeError("'{}' is not a facet, so it must be sampled using an "
+                                "`interval`".format(attr))
+            subscription = FacetObserver(self, sub_id, entry, facet, request.get('max_rate'),
+                                         request.get('delta', False))
+        else:
+            subscription = Sampler(self, sub_id, entry, attr, request['interval'],
+                                   request.get('args'), request.get('on_change', False),
+                                   request.get('delta', False))
+
+        self.subscriptions[sub_id] = subscription
+        subscription.start()
+        return sub_id, FAKE_LOCK
+
+    def handle_unsubscribe(self, request):
+        subscription = self.subscriptions.pop(request['sub_id'], None)
+        if subscription is not None:
+            subscription.stop()
+        self.messenger.delta_refs.pop(request['sub_id'], None)
+        return None, FAKE_LOCK
+
+    def handle_stats(self, request):
+        return self.executor.stats(), FAKE_LOCK
+
+    def handle_compression(self, request):
+        names = [name for name in request['codecs'] if name in CODECS]
+        self.messenger.codec = CODECS[names[0]] if names else None
+        self.messenger.compression_threshold = request['threshold']
+        log.info("Using compression codec %s", self.messenger.codec)
+        return (names[0] if names else None), FAKE_LOCK
+
+    def push(self, sub_id, value, entry, delta=False):
+        """Push `value`, obtained from `entry`, to the client as an event of subscription
+        `sub_id`"""
+        if sub_id not in self.subscriptions:
+            return  # Unsubscribed while this event was being produced
+        out_of_band = self.messenger.peer_accepts_buffers
+        try:
+            with entry.lock:
+                message = self.serialize(value, entry.lock, out_of_band, entry)
+                self.messenger.push(message, sub_id, delta)
+        except RemoteError as e:
+            log.info("Could not push event, ending subscription %d: %s", sub_id, str(e))
+            subscription = self.subscriptions.pop(sub_id, None)
+            if subscription is not None:
+                subscription.stop()
+
     def handle_none(self, request):
         return Exception("Unknown command"), FAKE_LOCK
 
-    def serialize(self, obj, lock):
+    def serialize(self, obj, lock, out_of_band=False, parent=None):
         parent_serialize = super(ServerSession, self).serialize
 
         # Use RemoteObject if obj has one
@@ -371,43 +1443,90 @@ class ServerSession(Session):
 
         with lock:
             try:
-                bytes = parent_serialize(obj)
+                message = parent_serialize(obj, out_of_band)
             except TypeError:
-                bytes = parent_serialize(self.new_remote_obj(obj, lock))
-        return bytes
+                message = parent_serialize(self.new_remote_obj(obj, lock, parent))
+        return message
 
-    def new_remote_obj(self, obj, lock):
+    def new_remote_obj(self, obj, lock, parent=None):
+        """Create a RemoteObject for `obj`, which was obtained through the object of `parent`"""
         with lock:
             obj_id = id(obj)
             remote_obj = RemoteObject(obj_id, dir(obj), repr(obj))
-            shared = (lock is not FAKE_LOCK)
-            self.obj_table[obj_id] = ObjectEntry(obj, remote_obj, lock, shared)
+            if parent is None:
+                entry = ObjectEntry(obj, remote_obj, lock, False)
+            else:
+                entry = ObjectEntry(obj, remote_obj, lock, parent.share, parent.key, parent.label)
+            self.obj_table[obj_id] = entry
             return remote_obj
 
+    def queue_key(self, command, request):
+        """Get the executor key and label under which to queue a request"""
+        entry = self.obj_table.get(request.get('obj_id'))
+        if entry is not None:
+            return entry.key, entry.label
+        elif command == 'list':
+            return 'list', 'list_instruments'
+        return self.session_key, 'session {}'.format(self.session_key[1])
+
+    def run_request(self, id, command, request):
+        handler = self.command_handler.get(command, self.handle_none)
+        try:
+            response, lock = handler(request)
+        except Exception as e:
+            log.exception(e)
+            response = e
+            lock = FAKE_LOCK
+
+        if command == 'create' and not isinstance(response, Exception):
+            parent = self.obj_table[response._obj_id]
+        else:
+            parent = self.obj_table.get(request.get('obj_id'))
+
+        log.info('Sending response %r', response)
+        out_of_band = self.messenger.peer_accepts_buffers
+        try:
+            with lock:
+                # Out-of-band buffers point into the response's own memory, so they must be sent
+                # before the lock guarding it is released
+                self.messenger.respond(self.serialize(response, lock, out_of_band, parent), id)
+        except RemoteError as e:
+            log.info("Could not send response: %s", str(e))
+
     def handle_requests(self):
         while True:
-            message_bytes = self.messenger.listen()
-            if message_bytes is None:
+            frame = self.messenger.listen()
+            if frame is None:
                 log.info("Received EOF, closing connection.")
                 break
+            message, id = frame
 
-            request = self.deserialize(message_bytes)
+            request = self.deserialize(message)
             log.debug('Received request %r', request)
             command = request.pop('command')
 
-            try:
-                handler = self.command_handler.get(command, self.handle_none)
-                response, lock = handler(request)
-            except Exception as e:
-                log.exception(e)
-                response = e
-                lock = FAKE_LOCK
+            if command in self.inline_commands:
+                self.run_request(id, command, request)
+                continue
+
+            # Requests for different instruments run in parallel, while those for the same
+            # instrument run one at a time, in order
+            key, label = self.queue_key(command, request)
+            future = self.executor.submit(key, label, self.run_request, id, command, request)
+            with self.in_flight_lock:
+                self.in_flight.add(future)
+            future.add_done_callback(self._request_done)
 
-            log.info('Sending response %r', response)
-            self.messenger.respond(self.serialize(response, lock))
+        with self.in_flight_lock:
+            in_flight = list(self.in_flight)
+        wait_futures(in_flight)
 
         # Clean up before we exit
         log.info('Cleaning up open objects')
+        for subscription in list(self.subscriptions.values()):
+            subscription.stop()
+        self.subscriptions.clear()
+
         for entry in self.obj_table.values():
             if isinstance(entry.obj, Instrument):
                 if entry.share:
@@ -418,23 +1537,42 @@ class ServerSession(Session):
                         entry.obj.close()
                     except Exception:
                         log.info('Closing instrument failed!')
+                    self.executor.discard(entry.key)
+        self.executor.discard(self.session_key)
         self.obj_table.clear()
 
+    def _request_done(self, future):
+        with self.in_flight_lock:
+            self.in_flight.discard(future)
+
 
 class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     def handle(self):
         log.info("Opening connection to client...")
-        session = ServerSession(self.request, self.server.shared_obj_table, self.server.table_lock)
+        session = ServerSession(self.request, self.server.shared_obj_table, self.server.table_lock,
+                                self.server.executor)
         session.handle_requests()
 
 
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    def __init__(self, server_address):
+    """Instrument server
+
+    Each connection gets a thread that reads its requests, which are then run by a shared
+    `InstrumentExecutor` with up to `max_workers` threads. Requests for different instruments run
+    in parallel, while those for the same instrument (even from different clients, if shared) run
+    one at a time in the order received.
+    """
+    def __init__(self, server_address, max_workers=DEFAULT_MAX_WORKERS):
         socketserver.TCPServer.__init__(self, server_address, ThreadedTCPRequestHandler)
         self.shared_obj_table = {}
         self.table_lock = threading.RLock()
+        self.executor = InstrumentExecutor(max_workers)
         log.info("Server started...")
 
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+        self.executor.shutdown(wait=False)
+
 
 class RemoteObject(object):
     def __init__(self, id, dirlist, reprname, session=None):
@@ -499,8 +1637,8 @@ class RemoteInstrument(RemoteObject, Instrument):
         return obj
 
 
-def client_session(server):
-    """Get the session connected to `server`. Creates one if it doesn't exist yet."""
+def _parse_server(server):
+    """Get the ``(host, port)`` of `server`, which may be an alias from the [servers] config"""
     if server in conf.servers:
         host = conf.servers[server]
     else:
@@ -513,13 +1651,326 @@ def client_session(server):
     else:
         host = host
         port = DEFAULT_PORT
+    return host, port
+
 
+def client_session(server):
+    """Get the session connected to `server`. Creates one if it doesn't exist yet."""
+    host, port = _parse_server(server)
     if (host, port) not in client_session.sessions:
         client_session.sessions[(host, port)] = ClientSession(host, port, server)
     return client_session.sessions[(host, port)]
 client_session.sessions = {}
 
 
+class AsyncClientMessenger(object):
+    """asyncio counterpart of `ClientMessenger`, using the same framing"""
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.connected = False
+        self.peer_accepts_buffers = False
+        self.curr_id = 0
+        self.pending = {}  # id -> asyncio.Future
+        self._send_lock = None
+        self._reader_task = None
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        family, type_, proto, _, addr = infos[0]
+        sock = socket.socket(family, type_, proto)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, addr), self.timeout)
+        except BaseException:
+            sock.close()
+            raise
+
+        self.sock = sock
+        self.connected = True
+        self.peer_accepts_buffers = False
+        self._send_lock = asyncio.Lock()
+        self._reader_task = loop.create_task(self._read_responses(sock))
+
+    async def make_request(self, request):
+        """Send a request message to the server, and return its response message"""
+        if not self.connected:
+            raise RemoteError("Connection to server {} is closed".format(self.host))
+
+        loop = asyncio.get_running_loop()
+        id = self.curr_id
+        self.curr_id = (self.curr_id + 1) % MAX_REQUEST_ID
+        future = self.pending[id] = loop.create_future()
+
+        try:
+            async with self._send_lock:
+                for chunk in _coalesce(Messenger.encode(request, id, REQUEST)):
+                    await loop.sock_sendall(self.sock, chunk)
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise RemoteTimeoutError("Timed out while waiting for response")
+        except OSError as e:
+            raise RemoteError("Socket error while sending message data: {}".format(str(e)))
+        finally:
+            self.pending.pop(id, None)
+
+    async def _recv_exactly(self, sock, view):
+        loop = asyncio.get_running_loop()
+        n_recd = 0
+        while n_recd < len(view):
+            n = await loop.sock_recv_into(sock, view[n_recd:])
+            if not n:
+                if n_recd == 0:
+                    return False
+                raise RemoteError("Socket connection ended unexpectedly")
+            n_recd += n
+        return True
+
+    async def _read_responses(self, sock):
+        error = RemoteError("Connection to server {} was closed".format(self.host))
+        header = bytearray(STRUCT.size)
+        try:
+            while await self._recv_exactly(sock, memoryview(header)):
+                kind, flags, id, length = STRUCT.unpack(header)
+                self.peer_accepts_buffers = bool(flags & FLAG_ACCEPT_BUFFERS)
+
+                payload = bytearray(length)
+                if length and not await self._recv_exactly(sock, memoryview(payload)):
+                    raise RemoteError("Socket connection ended unexpectedly")
+                if flags & FLAG_BUFFERS:
+                    message = Messenger.split_buffers(payload, flags)
+                else:
+                    message = (payload, ())
+
+                if kind != RESPONSE:
+                    continue  # Subscriptions aren't supported by the asyncio client
+
+                future = self.pending.pop(id, None)
+                if future is None or future.done():
+                    log.info("Discarding response to abandoned request %d", id)
+                    continue
+                future.set_result(message)
+        except (OSError, RemoteError) as e:
+            if self.connected:
+                log.info("Lost connection to server %s: %s", self.host, str(e))
+                error = RemoteError("Lost connection to server {}: {}".format(self.host, str(e)))
+        finally:
+            if self.sock is sock:
+                self.connected = False
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def close(self):
+        self.connected = False
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader_task = None
+
+
+class AsyncClientSession(Session):
+    """Session with an instrument server, for use from an asyncio event loop
+
+    All requests are coroutines, so one event loop can drive many servers concurrently (e.g.
+    using ``asyncio.gather()``), and many requests may be in flight on each connection. Connecting
+    is retried with exponential backoff, both initially and after the connection is lost.
+    Instruments opened before a reconnect are reopened automatically when next used.
+
+    Parameters
+    ----------
+    host : str
+        Hostname or IP address of the server
+    port : int, optional
+        Port number of the server
+    server : str, optional
+        Name used for the server in the params of its instruments. Defaults to ``'host:port'``.
+    timeout : float, optional
+        Time in seconds to wait when connecting, and for the response to each request
+    retries : int, optional
+        Number of times to retry a failed connection attempt
+    backoff : float, optional
+        Delay in seconds before the first retry. The delay doubles for each later retry.
+    max_backoff : float, optional
+        Maximum delay between retries
+    """
+    def __init__(self, host, port=DEFAULT_PORT, server=None, timeout=DEFAULT_TIMEOUT, retries=3,
+                 backoff=0.5, max_backoff=8.0):
+        self.host = host
+        self.port = port
+        self.server = server or '{}:{}'.format(host, port)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.generation = 0  # Incremented with each new connection
+        self.messenger = AsyncClientMessenger(host, port, timeout)
+        self._connect_lock = None
+
+    @classmethod
+    def from_server(cls, server, **kwds):
+        """Create a session for `server`, which may be an alias from the [servers] config"""
+        host, port = _parse_server(server)
+        return cls(host, port, server, **kwds)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+    async def connect(self):
+        """Connect to the server if not already connected, retrying with exponential backoff"""
+        if self.messenger.connected:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.messenger.connected:
+                return
+
+            delay = self.backoff
+            for attempt in range(self.retries + 1):
+                try:
+                    await self.messenger.connect()
+                    break
+                except (OSError, asyncio.TimeoutError) as e:
+                    if attempt == self.retries:
+                        raise RemoteError("Could not connect to host at {}:{}: {}".format(
+                            self.host, self.port, str(e) or type(e).__name__))
+                    log.info("Connecting to %s:%s failed (%s), retrying in %g s", self.host,
+                             self.port, str(e) or type(e).__name__, delay)
+                    await asyncio.sleep(delay)
+                    delay = min(2*delay, self.max_backoff)
+            self.generation += 1
+
+    async def close(self):
+        await self.messenger.close()
+
+    async def request(self, **message_dict):
+        await self.connect()
+        log.debug('Sending request %r', message_dict)
+        request = self.serialize(message_dict, out_of_band=self.messenger.peer_accepts_buffers)
+        response = await self.messenger.make_request(request)
+
+        response_obj = self.deserialize(response)
+        log.debug('Got response %r', response_obj)
+        if isinstance(response_obj, Exception):
+            raise response_obj
+        if isinstance(response_obj, RemoteObject):
+            response_obj = AsyncRemoteObject._from_remote(self, response_obj)
+        return response_obj
+
+    async def list_instruments(self):
+        instr_list = await self.request(command='list')
+        for instr in instr_list:
+            instr['server'] = self.server
+        return instr_list
+
+    async def instrument(self, params=None, **kwds):
+        """Open an instrument on the server, returning an `AsyncRemoteInstrument`
+
+        Takes a ParamSet or dict of params, and/or params as keyword arguments.
+        """
+        params = dict(params._dict if isinstance(params, ParamSet) else (params or {}), **kwds)
+        params['server'] = self.server
+        return await self.request(command='create', params=ParamSet(**params))
+
+
+class AsyncRemoteObject(object):
+    """Proxy for an object on a server, used through an `AsyncClientSession`
+
+    Attribute lookups and method calls return awaitables::
+
+        center = await sa.center
+        trace = await sa.get_trace('ch1')
+        await sa.set_attr('span', '1 MHz')
+    """
+    def __init__(self, session, obj_id, dirlist, reprname):
+        self.__dict__.update(_session=session, _obj_id=obj_id, _dirlist=dirlist,
+                             _reprname=reprname, _generation=session.generation)
+
+    @classmethod
+    def _from_remote(cls, session, remote_obj):
+        state = remote_obj.__dict__
+        if '_paramset' in state:
+            obj = AsyncRemoteInstrument(session, state['_obj_id'], state['_dirlist'],
+                                        state['_reprname'])
+            obj.__dict__['_paramset'] = state['_paramset']
+            return obj
+        return cls(session, state['_obj_id'], state['_dirlist'], state['_reprname'])
+
+    def __dir__(self):
+        return self._dirlist
+
+    def __repr__(self):
+        return self._reprname
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _AsyncAttr(self, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Remote attributes must be set using `await obj.set_attr(name, "
+                             "value)`")
+
+    def __call__(self, *args, **kwargs):
+        return self._request(command='call', args=args, kwargs=kwargs)
+
+    async def _request(self, **message_dict):
+        await self._session.connect()
+        if self._generation != self._session.generation:
+            await self._reattach()
+        return await self._session.request(obj_id=self._obj_id, **message_dict)
+
+    async def _reattach(self):
+        raise RemoteError("{} belonged to a connection to the server that was "
+                          "lost".format(self._reprname))
+
+    async def set_attr(self, name, value):
+        """Set attribute `name` of the remote object"""
+        await self._request(command='setattr', attr=name, value=value)
+
+    async def get_item(self, key):
+        return await self._request(command='item', key=key)
+
+    async def set_item(self, key, value):
+        await self._request(command='setitem', key=key, value=value)
+
+
+class AsyncRemoteInstrument(AsyncRemoteObject):
+    """`AsyncRemoteObject` for an instrument, which is reopened if its connection was lost"""
+    async def _reattach(self):
+        log.info("Reopening %s after reconnecting", self._reprname)
+        new = await self._session.instrument(self._paramset)
+        self.__dict__.update(_obj_id=new._obj_id, _generation=new._generation)
+
+
+class _AsyncAttr(object):
+    """Awaitable attribute of an `AsyncRemoteObject`, which may also be called as a method"""
+    def __init__(self, obj, name):
+        self._obj = obj
+        self._name = name
+
+    def __await__(self):
+        return self._obj._request(command='attr', attr=self._name).__await__()
+
+    def __call__(self, *args, **kwargs):
+        return self._obj._request(command='callattr', attr=self._name, args=args, kwargs=kwargs)
+
+
 @atexit.register
 def _cleanup_sessions():
     for session in client_session.sessions.values():
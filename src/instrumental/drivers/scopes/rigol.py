@@ -8,9 +8,9 @@ import time
 from enum import Enum
 
 import numpy as np
-from pyvisa import ResourceManager
 
 from .. import ParamSet, SCPI_Facet, VisaMixin
+from ..visa_pool import visa_resource_pool
 from . import Scope
 
 _INST_PARAMS_ = ['visa_address']
@@ -33,9 +33,8 @@ def list_instruments():
     model_string = model_string.rstrip(' || ')
     search_string = "USB?*?{{VI_ATTR_MANF_ID==0x{:04X} && ({})}}".format(MANUFACTURER_ID, model_string)
 
-    rm = ResourceManager()
     try:
-        raw_spec_list = rm.list_resources(search_string)
+        raw_spec_list = visa_resource_pool().resource_manager().list_resources(search_string)
     except:
         return paramsets
 
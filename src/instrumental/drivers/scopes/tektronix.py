@@ -14,7 +14,7 @@ from ... import Q_, u
 from ...errors import Error
 from ...util import to_str
 from .. import Facet, SCPI_Facet, VisaMixin
-from ..util import visa_context
+from ..util import visa_context, parse_units, magnitude_as
 from . import Scope
 
 MODEL_CHANNELS = {
@@ -182,16 +182,14 @@ class TekScope(Scope, VisaMixin):
         self.write("header OFF")
 
     def _waveform_params(self):
-        return {
-            'xin': float(self.query("wfmpre:xincr?")),
-            'ymu': float(self.query("wfmpre:ymult?")),
-            'xze': float(self.query("wfmpre:xzero?")),
-            'yze': float(self.query("wfmpre:yzero?")),
-            'pt_o': float(self.query("wfmpre:pt_off?")),
-            'yof': float(self.query("wfmpre:yoff?")),
-            'xun': strstr(self.query("wfmpre:xun?")),
-            'yun': strstr(self.query("wfmpre:yun?")),
-        }
+        with self.transaction():
+            resp = {key: self.query_async("wfmpre:{}?", name) for key, name in
+                    [('xin', 'xincr'), ('ymu', 'ymult'), ('xze', 'xzero'), ('yze', 'yzero'),
+                     ('pt_o', 'pt_off'), ('yof', 'yoff'), ('xun', 'xun'), ('yun', 'yun')]}
+        params = {key: float(r.value) for key, r in resp.items() if key not in ('xun', 'yun')}
+        params['xun'] = strstr(resp['xun'].value)
+        params['yun'] = strstr(resp['yun'].value)
+        return params
 
     def get_data(self, channel=1, width=2, bounds=None):
         """Retrieve a trace from the scope.
@@ -222,17 +220,16 @@ class TekScope(Scope, VisaMixin):
             self.write("data:width {}", width)
             self.write("data:encdg RIBinary")
 
-        if bounds is None:
-            start = 1
-            # scope *should* truncate this to record length if it's too big
-            stop = getattr(self, 'max_waveform_length', 1000000)
-        else:
-            start, stop = bounds
-            wfm_len = self.waveform_length
-            if not (1 <= start <= stop <= wfm_len):
-                raise ValueError('bounds must satisfy 1 <= start <= stop <= {}'.format(wfm_len))
+            if bounds is None:
+                start = 1
+                # scope *should* truncate this to record length if it's too big
+                stop = getattr(self, 'max_waveform_length', 1000000)
+            else:
+                start, stop = bounds
+                wfm_len = self.waveform_length  # Sent along with the writes above
+                if not (1 <= start <= stop <= wfm_len):
+                    raise ValueError('bounds must satisfy 1 <= start <= stop <= {}'.format(wfm_len))
 
-        with self.transaction():
             self.write("data:start {}".format(start))
             self.write("data:stop {}".format(stop))
 
@@ -259,7 +256,7 @@ class TekScope(Scope, VisaMixin):
 
         unit_str = unit_map.get(unit_str, unit_str)
         try:
-            units = u.parse_units(unit_str)
+            units = parse_units(unit_str)
         except UndefinedUnitError:
             units = u.dimensionless
         return units
@@ -334,7 +331,8 @@ class TekScope(Scope, VisaMixin):
         res = self.query(prefix+':value?;mean?;stddev?;minimum?;maximum?;count?;units?').split(';')
         units = res.pop(-1).strip('"')
         count = int(res.pop(-1))
-        stats = {k: Q_(rval+units) for k, rval in zip(keys, res)}
+        units = self._tek_units(units)
+        stats = {k: Q_(float(rval), units) for k, rval in zip(keys, res)}
         stats['count'] = count
 
         num_samples = int(self.query('measurement:statistics:weighting?'))
@@ -364,7 +362,7 @@ class TekScope(Scope, VisaMixin):
             if code in (547, 548, 549):
                 raise ClippingError(message)
 
-        return Q_(raw_value+units)
+        return Q_(float(raw_value), self._tek_units(units))
 
     def measure(self, channel, meas_type):
         """Perform immediate measurement."""
@@ -581,7 +579,7 @@ class MSO_DPO_2000(StatScope):
     meas.facet(SCPI_Facet('measu:meas{}:type'))
 
     def set_min_window(self, width):
-        width_s = Q_(width).m_as('s')
+        width_s = magnitude_as(width, 's')
         mantissa, exponent = (float(x) for x in format(width_s, 'e').split('e'))
         if mantissa <= 2:
             scale_s = 0.2 * 10.**exponent
@@ -640,8 +638,8 @@ def load_csv(filename):
             x_mag.append(float(x))
             y_mag.append(float(y))
 
-        x_units = u.parse_units(info['Horizontal Units'])
-        y_units = u.parse_units(info['Vertical Units'])
+        x_units = parse_units(info['Horizontal Units'])
+        y_units = parse_units(info['Vertical Units'])
         x_offset = 0.  # Not in CSV?
         y_offset = float(info['Vertical Offset'])
         x_scale = float(info['Horizontal Scale'])
@@ -11,11 +11,11 @@ import numpy as np
 from cffi import FFI
 from future.utils import PY2
 from nicelib import NiceLib, NiceObject, RetHandler, Sig, load_lib, ret_ignore
-from pyvisa import ResourceManager
 
 from ... import Q_
 from ...errors import Error
 from .. import ParamSet
+from ..visa_pool import visa_resource_pool
 from ..util import check_enums, check_units
 from . import Spectrometer
 
@@ -38,9 +38,8 @@ def list_instruments():
     """Get a list of all spectrometers currently attached"""
     paramsets = []
     search_string = "USB?*?{VI_ATTR_MANF_ID==0x1313 && ((VI_ATTR_MODEL_CODE==0x8081) || (VI_ATTR_MODEL_CODE==0x8083) || (VI_ATTR_MODEL_CODE==0x8085) || (VI_ATTR_MODEL_CODE==0x8087) || (VI_ATTR_MODEL_CODE==0x8089))}"
-    rm = ResourceManager()
     try:
-        raw_spec_list = rm.list_resources(search_string)
+        raw_spec_list = visa_resource_pool().resource_manager().list_resources(search_string)
     except:
         return paramsets
 
@@ -7,6 +7,7 @@ import copy
 import contextlib
 from inspect import getfullargspec
 import pint
+import numpy as np
 
 from past.builtins import basestring
 
@@ -71,6 +72,85 @@ def as_enum(enum_type, arg):
         raise ValueError("{} is not a valid {} enum".format(arg, enum_type.__name__))
 
 
+def conversion_factor(from_units, to_units):
+    """Get the factor converting magnitudes in `from_units` to `to_units`
+
+    Returns None if the conversion isn't a pure scaling, i.e. either unit has an offset
+    (e.g. degC). Raises a `pint.DimensionalityError` if the units are incompatible.
+    """
+    factor = Q_(1., from_units).to(to_units).magnitude
+    if Q_(0., from_units).to(to_units).magnitude != 0:
+        return None
+    return factor
+
+
+def parse_units(units):
+    """Get the pint Unit for a unit string, parsing each distinct string only once"""
+    try:
+        return parse_units.cache[units]
+    except KeyError:
+        unit = parse_units.cache[units] = u.parse_units(units)
+        return unit
+
+
+parse_units.cache = {}
+
+
+def magnitude_as(value, units):
+    """Get the magnitude of a Quantity (or anything `to_quantity()` accepts) in `units`
+
+    Like pint's ``Quantity.m_as()``, but the factor for converting between each pair of units is
+    computed only once, so repeated conversions don't reparse or reconvert the units.
+    """
+    if not isinstance(value, Q_):
+        value = to_quantity(value)
+    key = (value.units, units)
+    try:
+        factor = magnitude_as.factors[key]
+    except KeyError:
+        factor = magnitude_as.factors[key] = conversion_factor(value.units, units)
+
+    if factor is None:
+        return value.m_as(units)  # Offset units
+    elif factor == 1:
+        return value.magnitude
+    return value.magnitude * factor
+
+
+magnitude_as.factors = {}  # Map from (from_units, to_units) to conversion factor
+
+
+def clear_unit_caches():
+    """Clear the caches of parsed quantities, units and conversion factors"""
+    to_quantity.cache.clear()
+    parse_units.cache.clear()
+    magnitude_as.factors.clear()
+
+
+def _is_array(value):
+    """Whether `value` is an array or a Quantity of one, i.e. something a callee could change"""
+    if isinstance(value, Q_):
+        value = value.magnitude
+    return isinstance(value, np.ndarray)
+
+
+def _copy_if_array(value):
+    """Copy `value` if it's an array or a Quantity of one, so a callee can't change the original"""
+    return copy.copy(value) if _is_array(value) else value
+
+
+def _parse_unit_spec(spec):
+    """Parse a unit spec like 'V' or '?V' into an (optional, units) tuple, or None"""
+    if spec is None:
+        return None
+    elif isinstance(spec, basestring):
+        optional = spec.startswith('?')
+        if optional:
+            spec = spec[1:]
+        return (optional, to_quantity(spec))
+    raise TypeError("Each arg spec must be a string or None")
+
+
 def check_units(*pos, **named):
     """Decorator to enforce the dimensionality of input args and return values.
 
@@ -81,43 +161,43 @@ def check_units(*pos, **named):
         def set_voltage(value):
             pass  # `value` will be a pint.Quantity with Volt-like units
     """
-    def inout_map(arg, unit_info, name=None):
-        if unit_info is None:
-            return arg
-
-        use_units_msg = (" Make sure you're passing in a unitful value, either as a string or by "
-                         "using `instrumental.u` or `instrumental.Q_()`")
+    use_units_msg = (" Make sure you're passing in a unitful value, either as a string or by "
+                     "using `instrumental.u` or `instrumental.Q_()`")
 
+    def checker_factory(unit_info, name):
         optional, units = unit_info
-        if optional and arg is None:
-            return None
-        elif arg == 0:
-            # Allow naked zeroes as long as we're using absolute units (e.g. not degF)
-            # It's a bit dicey using this private method; works in 0.6 at least
-            if units._ok_for_muldiv():
-                return Q_(arg, units)
+        known_units = set()  # Input units already found to have the right dimensionality
+
+        def dimensionality_error(from_units, extra_info):
+            if name is not None:
+                extra_msg = " for argument '{}'.".format(name) + extra_info
             else:
-                if name is not None:
-                    extra_msg = " for argument '{}'.".format(name) + use_units_msg
-                    raise pint.DimensionalityError(u.dimensionless.units, units.units,
-                                                   extra_msg=extra_msg)
-                else:
-                    extra_msg = " for return value." + use_units_msg
-                    raise pint.DimensionalityError(u.dimensionless.units, units.units,
-                                                   extra_msg=extra_msg)
-        else:
-            q = to_quantity(arg)
+                extra_msg = " for return value." + extra_info
+            return pint.DimensionalityError(from_units, units.units, extra_msg=extra_msg)
+
+        def checker(arg):
+            if isinstance(arg, Q_):
+                if arg.units in known_units:
+                    return _copy_if_array(arg)
+                q = arg
+            elif optional and arg is None:
+                return None
+            elif arg == 0:
+                # Allow naked zeroes as long as we're using absolute units (e.g. not degF)
+                # It's a bit dicey using this private method; works in 0.6 at least
+                if units._ok_for_muldiv():
+                    return Q_(arg, units)
+                raise dimensionality_error(u.dimensionless.units, use_units_msg)
+            else:
+                q = to_quantity(arg)
+
             if q.dimensionality != units.dimensionality:
-                extra_info = '' if isinstance(arg, Q_) else use_units_msg
-                if name is not None:
-                    extra_msg = " for argument '{}'.".format(name) + extra_info
-                    raise pint.DimensionalityError(q.units, units.units, extra_msg=extra_msg)
-                else:
-                    extra_msg = " for return value." + extra_info
-                    raise pint.DimensionalityError(q.units, units.units, extra_msg=extra_msg)
-            return q
+                raise dimensionality_error(q.units, '' if isinstance(arg, Q_) else use_units_msg)
+            known_units.add(q.units)
+            return _copy_if_array(q) if q is arg else q
+        return checker
 
-    return _unit_decorator(inout_map, inout_map, pos, named)
+    return _unit_decorator(checker_factory, checker_factory, pos, named)
 
 
 def unit_mag(*pos, **named):
@@ -131,51 +211,51 @@ def unit_mag(*pos, **named):
             pass  # The input must be in Volt-like units and `value` will be a raw number
                   # expressing the magnitude in Volts
     """
-    def in_map(arg, unit_info, name):
-        if unit_info is None:
-            return arg
-
+    def in_factory(unit_info, name):
         optional, units = unit_info
-        if optional and arg is None:
-            return None
-        elif arg == 0:
-            # Allow naked zeroes as long as we're using absolute units (e.g. not degF)
-            # It's a bit dicey using this private method; works in 0.6 at least
-            if units._ok_for_muldiv():
-                return arg
+        factors = {}  # Map from input units to the factor converting them to `units`
+
+        def checker(arg):
+            if isinstance(arg, Q_):
+                q = arg
+            elif optional and arg is None:
+                return None
+            elif arg == 0:
+                # Allow naked zeroes as long as we're using absolute units (e.g. not degF)
+                # It's a bit dicey using this private method; works in 0.6 at least
+                if units._ok_for_muldiv():
+                    return arg
+                raise pint.DimensionalityError(u.dimensionless.units, units.units,
+                                               extra_msg=" for argument '{}'".format(name))
             else:
-                if name is not None:
-                    raise pint.DimensionalityError(u.dimensionless.units, units.units,
-                                                   extra_msg=" for argument '{}'".format(name))
-                else:
-                    raise pint.DimensionalityError(u.dimensionless.units, units.units,
-                                                   extra_msg=" for return value")
-        else:
-            q = to_quantity(arg)
+                q = to_quantity(arg)
+
             try:
-                if q.units == units:
-                    return q.magnitude  # Speed up the common case
-                else:
-                    return q.to(units).magnitude
-            except pint.DimensionalityError:
-                raise pint.DimensionalityError(q.units, units.units,
-                                               extra_msg=" for argument '{}'".format(name))
+                factor = factors[q.units]
+            except KeyError:
+                try:
+                    factor = factors[q.units] = conversion_factor(q.units, units.units)
+                except pint.DimensionalityError:
+                    raise pint.DimensionalityError(q.units, units.units,
+                                                   extra_msg=" for argument '{}'".format(name))
 
-    def out_map(res, unit_info):
-        if unit_info is None:
-            return res
+            if factor is None:
+                return q.to(units).magnitude
+            elif factor == 1:
+                return _copy_if_array(q.magnitude)  # Speed up the common case
+            return q.magnitude * factor
+        return checker
 
+    def out_factory(unit_info, name):
         optional, units = unit_info
-        if optional and res is None:
-            return None
-        else:
-            q = to_quantity(res)
-            try:
-                return q
-            except pint.DimensionalityError:
-                raise pint.DimensionalityError(q.units, units.units, extra_msg=" for return value")
 
-    return _unit_decorator(in_map, out_map, pos, named)
+        def out_map(res):
+            if optional and res is None:
+                return None
+            return to_quantity(res)
+        return out_map
+
+    return _unit_decorator(in_factory, out_factory, pos, named)
 
 
 def check_enums(**kw_args):
@@ -214,140 +294,89 @@ def arg_decorator(checker_factory, dec_pos_args, dec_kw_args):
     """
     def wrap(func):
         """Function that actually wraps the function to be decorated"""
-        arg_names, vargs, kwds, default_vals, *_ = getfullargspec(func)
-        default_vals = default_vals or ()
-        pos_arg_names = {i: name for i, name in enumerate(arg_names)}
-
-        # Put everything in one dict
+        arg_names = getfullargspec(func).args
+        dec_args = dict(dec_kw_args)
         for dec_arg_val, arg_name in zip(dec_pos_args, arg_names):
-            if arg_name in dec_kw_args:
+            if arg_name in dec_args:
                 raise TypeError("Argument specified twice, by both position and name")
-            dec_kw_args[arg_name] = dec_arg_val
-
-        checkers = {}
-        new_defaults = {}
-        num_nondefs = len(arg_names) - len(default_vals)
-        for default_val, arg_name in zip(default_vals, arg_names[num_nondefs:]):
-            if arg_name in dec_kw_args:
-                checker = checker_factory(dec_kw_args[arg_name], arg_name)
-                checkers[arg_name] = checker
-                new_defaults[arg_name] = checker(default_val)
-
-        for arg_name in arg_names[:num_nondefs]:
-            if arg_name in dec_kw_args:
-                checkers[arg_name] = checker_factory(dec_kw_args[arg_name], arg_name)
-
-        def wrapper(func, *args, **kwds):
-            checked = new_defaults.copy()
-            checked.update({name: (checkers[name](arg) if name in checkers else arg) for name, arg
-                            in kwds.items()})
-            for i, arg in enumerate(args):
-                name = pos_arg_names[i]
-                checked[name] = checkers[name](arg) if name in checkers else arg
-
-            result = func(**checked)
-            return result
-        return decorator.decorate(func, wrapper)
+            dec_args[arg_name] = dec_arg_val
+
+        checkers = {name: checker_factory(dec_arg_val, name)
+                    for name, dec_arg_val in dec_args.items()}
+        return _compile_checked(func, checkers)
     return wrap
 
 
-def _unit_decorator(in_map, out_map, pos_args, named_args):
+def _unit_decorator(in_factory, out_factory, pos_args, named_args):
+    named_args = dict(named_args)
+    ret = named_args.pop('ret', None)
+
     def wrap(func):
-        ret = named_args.pop('ret', None)
-
-        if ret is None:
-            ret_units = None
-        elif isinstance(ret, tuple):
-            ret_units = []
-            for arg in ret:
-                if arg is None:
-                    unit = None
-                elif isinstance(arg, basestring):
-                    optional = arg.startswith('?')
-                    if optional:
-                        arg = arg[1:]
-                    unit = (optional, to_quantity(arg))
-                ret_units.append(unit)
-            ret_units = tuple(ret_units)
+        if isinstance(ret, tuple):
+            ret_checkers = tuple(None if unit_info is None else out_factory(unit_info, None)
+                                 for unit_info in map(_parse_unit_spec, ret))
+
+            def ret_map(result):
+                return tuple(res if checker is None else checker(res)
+                             for res, checker in zip(result, ret_checkers))
+        elif ret is not None:
+            ret_map = out_factory(_parse_unit_spec(ret), None)
         else:
-            optional = ret.startswith('?')
-            if optional:
-                arg = ret[1:]
-            ret_units = to_quantity(arg)
-
-        arg_names, vargs, kwds, defaults, *_ = getfullargspec(func)
-
-        pos_units = []
-        for arg in pos_args:
-            if arg is None:
-                unit = None
-            elif isinstance(arg, basestring):
-                optional = arg.startswith('?')
-                if optional:
-                    arg = arg[1:]
-                unit = (optional, to_quantity(arg))
-            else:
-                raise TypeError("Each arg spec must be a string or None")
-            pos_units.append(unit)
-
-        named_units = {}
-        for name, arg in named_args.items():
-            if arg is None:
-                unit = None
-            elif isinstance(arg, basestring):
-                optional = arg.startswith('?')
-                if optional:
-                    arg = arg[1:]
-                unit = (optional, to_quantity(arg))
-            else:
-                raise TypeError("Each arg spec must be a string or None")
-            named_units[name] = unit
+            ret_map = None
 
-        # Add positional units to named units
-        for i, units in enumerate(pos_units):
-            name = arg_names[i]
+        arg_names = getfullargspec(func).args
+        named_units = {name: _parse_unit_spec(spec) for name, spec in named_args.items()}
+        for name, spec in zip(arg_names, pos_args):
             if name in named_units:
                 raise Exception("Units of {} specified by position and by name".format(name))
-            named_units[name] = units
+            named_units[name] = _parse_unit_spec(spec)
 
-        # Pad out the rest of the positional units with None
-        pos_units.extend([None] * (len(arg_names) - len(pos_args)))
+        checkers = {name: in_factory(unit_info, name)
+                    for name, unit_info in named_units.items() if unit_info is not None}
+        return _compile_checked(func, checkers, ret_map)
+    return wrap
 
-        # Add named units to positional units
-        for name, units in named_units.items():
-            try:
-                i = arg_names.index(name)
-                pos_units[i] = units
-            except ValueError:
-                pass
-
-        defaults = tuple() if defaults is None else defaults
-
-        # Convert the defaults
-        new_defaults = {}
-        ndefs = len(defaults)
-        for d, unit, n in zip(defaults, pos_units[-ndefs:], arg_names[-ndefs:]):
-            new_defaults[n] = d if unit is None else in_map(d, unit, n)
-
-        def wrapper(func, *args, **kwargs):
-            # Convert the input arguments
-            new_args = [in_map(a, u, n) for a, u, n in zip(args, pos_units, arg_names)]
-            new_kwargs = {n: in_map(a, named_units.get(n, None), n) for n, a in kwargs.items()}
-
-            # Fill in converted defaults
-            for name in arg_names[max(len(args), len(arg_names)-len(defaults)):]:
-                if name not in new_kwargs:
-                    new_kwargs[name] = new_defaults[name]
-
-            result = func(*new_args, **new_kwargs)
-
-            # Allow for unit checking of multiple return values
-            if isinstance(ret_units, tuple):
-                return tuple(map(out_map, result, ret_units))
+
+def _compile_checked(func, checkers, ret_map=None):
+    """Wrap `func` in a function with the same signature that checks and converts its arguments
+
+    The wrapper's source is generated for `func`'s signature, with one line per checked argument
+    that calls its checker from `checkers` (a dict mapping argument names to checkers), so calls
+    don't pay for building dicts or looping over the arguments. Arguments left at their defaults
+    skip their checker, reusing the default's checked value instead (or a copy of it, if it's an
+    array that `func` could change). If given, `ret_map` is applied to the return value.
+    """
+    spec = getfullargspec(func)
+    defaults = dict(zip(reversed(spec.args), reversed(spec.defaults or ())))
+    defaults.update(spec.kwonlydefaults or {})
+
+    evaldict = {'_func_': func, '_ret_': ret_map, '_copy_': copy.copy}
+    lines = []
+    for name, checker in checkers.items():
+        evaldict['_check_' + name] = checker
+        if name in spec.args or name in spec.kwonlyargs:
+            if name in defaults:
+                evaldict['_default_' + name] = defaults[name]
+                checked_default = evaldict['_checked_default_' + name] = checker(defaults[name])
+                if _is_array(checked_default):
+                    default = '_copy_(_checked_default_{0})'
+                else:
+                    default = '_checked_default_{0}'
+                line = '{0} = ' + default + ' if {0} is _default_{0} else _check_{0}({0})'
             else:
-                return out_map(result, ret_units)
-        return decorator.decorate(func, wrapper)
-    return wrap
+                line = '{0} = _check_{0}({0})'
+        elif spec.varkw:
+            line = "if '{0}' in {1}: {1}['{0}'] = _check_{0}({1}['{0}'])"
+        else:
+            continue  # Not an argument of func
+        lines.append(line.format(name, spec.varkw))
+
+    call = '_func_(%(shortsignature)s)'
+    lines.append('return ' + (call if ret_map is None else '_ret_({})'.format(call)))
+    wrapper = decorator.FunctionMaker.create(func, '\n'.join(lines), evaldict, __wrapped__=func)
+    if hasattr(func, '__qualname__'):
+        wrapper.__qualname__ = func.__qualname__
+    return wrapper
 
 
 @contextlib.contextmanager
@@ -404,3 +433,11 @@ def visa_context(resource, **settings):
 
     for attr_name in reversed(attr_names):
         setattr(resource, attr_name, old_values[attr_name])
+
+
+def scpi_root(message):
+    """Prefix an SCPI message with ':' so it's interpreted from the root of the command tree
+
+    Common commands (e.g. ``'*OPC?'``) and messages that already start with ':' are left alone.
+    """
+    return message if message[:1] in (':', '*') else ':' + message
@@ -14,6 +14,7 @@ from serial.tools.list_ports import comports
 from abc import ABC, abstractmethod
 
 from .. import Instrument, ParamSet
+from ..iotrace import open_port
 from ... import u
 
 _INST_PARAMS = ['port']
@@ -599,7 +600,9 @@ class NGC(Instrument, ABC):
             OptionalFeature.DUAL_ION_GAUGE: False,
             OptionalFeature.BAKE: False,
         }
-        self._ser = Serial(
+        self._ser = open_port(
+            Serial,
+            self._paramset,
             self._paramset["port"],
             baudrate=9600,
             bytesize=8,
@@ -14,6 +14,7 @@ from serial import Serial
 from serial.threaded import ReaderThread, Packetizer
 
 from .. import Instrument, ParamSet
+from ..iotrace import open_port
 from ...errors import Error
 from ... import u
 
@@ -184,7 +185,7 @@ class SenTorrMod(Instrument):
         self._driver_A.decoders[Address.Digit1] = LEDDriver.decode_digit
         self._driver_A.decoders[Address.Digit2] = sign_map.__getitem__
         self._driver_A.decoders[Address.Digit3] = LEDDriver.decode_digit
-        self._ser = Serial(self._paramset['port'], timeout=1.0)
+        self._ser = open_port(Serial, self._paramset, self._paramset['port'], timeout=1.0)
         self._thread = None
 
     def close(self):
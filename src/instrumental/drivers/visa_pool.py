@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide pool of pyvisa ResourceManagers and open VISA resources.
+
+Opening a VISA session can be slow, especially over TCPIP/VXI-11 or with pyvisa-py, so resources
+are shared rather than opened and closed for each use. A resource is reference counted: it is
+acquired by each user (e.g. a discovery probe or an instrument) and released when they're done.
+Released resources stay open for `idle_timeout` seconds so that a later user, such as
+``instrument()`` following ``list_instruments()``, can pick them up without reopening.
+
+A resource is only shared when that can't disturb its holder. Settings passed to `acquire()`
+are applied only when the caller is the resource's sole user, and are restored when it becomes
+idle. A probe (e.g. by discovery), or a caller wanting different settings, gets a separate session
+instead of one that's already in use.
+
+The ``close()`` method of each pooled resource is redirected to `ResourcePool.release`, so drivers
+that close their resource directly cooperate with the pool without modification.
+"""
+import time
+import functools
+import threading
+
+from .util import _ALLOWED_VISA_ATTRS
+from ..errors import ConfigError
+from ..log import get_logger
+
+log = get_logger(__name__)
+
+__all__ = ['ResourcePool', 'visa_resource_pool']
+
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+
+class _PoolEntry(object):
+    def __init__(self, key, resource):
+        self.key = key
+        self.resource = resource
+        self.refcount = 0
+        self.idle_since = None
+
+        # Remember the original settings, which are restored when the resource becomes idle
+        self.defaults = {}
+        for attr_name in _ALLOWED_VISA_ATTRS:
+            try:
+                self.defaults[attr_name] = getattr(resource, attr_name)
+            except Exception:
+                pass  # Resource doesn't have this setting
+
+    def is_alive(self):
+        try:
+            self.resource.session
+            return True
+        except Exception:
+            return False  # Closed by someone bypassing the pool
+
+    def has_settings(self, settings):
+        """Whether the resource already has all of `settings`"""
+        try:
+            return all(getattr(self.resource, name) == value for name, value in settings.items())
+        except Exception:
+            return False
+
+    def can_share(self, probe, settings):
+        """Whether another user can share the resource without disturbing its current holders"""
+        return self.refcount == 0 or (not probe and self.has_settings(settings))
+
+    def restore_defaults(self):
+        for attr_name, value in self.defaults.items():
+            try:
+                setattr(self.resource, attr_name, value)
+            except Exception as e:
+                log.info("Could not restore %s of %s: <<%s>>", attr_name, self.key[0], str(e))
+
+
+class ResourcePool(object):
+    """Pool of VISA resources, keyed by address and VISA backend
+
+    Parameters
+    ----------
+    idle_timeout : float, optional
+        Time in seconds that a released resource stays open before being closed. If zero or less,
+        resources are closed as soon as they are released.
+    """
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._managers = {}  # backend -> ResourceManager
+        self._entries = {}  # (address, backend) -> _PoolEntry
+        self._by_id = {}  # id(resource) -> _PoolEntry
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def resource_manager(self, backend=''):
+        """Get the shared pyvisa ResourceManager for `backend` (e.g. ``'@py'``)
+
+        Raises a ConfigError if the VISA library for `backend` can't be loaded.
+        """
+        with self._lock:
+            try:
+                return self._managers[backend]
+            except KeyError:
+                pass
+
+            import pyvisa
+            try:
+                rm = self._managers[backend] = pyvisa.ResourceManager(backend)
+            except (ValueError, OSError) as e:
+                raise ConfigError("Could not load VISA library: {}".format(str(e)))
+            return rm
+
+    def list_resources(self, backend='', query='?*::INSTR'):
+        """List the addresses of the resources available through `backend` that match `query`"""
+        return self.resource_manager(backend).list_resources(query)
+
+    def acquire(self, address, backend='', open_timeout=None, probe=False, **settings):
+        """Get an open resource for `address`, opening one only if the pool doesn't have it
+
+        Any `settings` (e.g. ``timeout=200``) are applied to the resource before it's returned.
+        Each call must be paired with a call to `release()` (or to the resource's ``close()``).
+
+        If the pooled resource is in use, it's only shared if it already has `settings` and
+        `probe` is False. Otherwise the caller gets a separate session, which isn't pooled, so that
+        a probe's queries and settings (e.g. discovery's short timeout) don't interfere with the
+        resource's holder.
+        """
+        key = (address, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.is_alive():
+                log.info("Dropping pooled resource '%s', which was closed externally", address)
+                self._remove(entry)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            elif entry.can_share(probe, settings):
+                self.hits += 1
+                log.info("Reusing pooled VISA resource '%s'", address)
+                return self._use(entry, settings)
+
+        # Open outside the lock, so a slow address doesn't hold up users of other addresses
+        rm = self.resource_manager(backend)
+        log.info("Opening VISA resource '%s'", address)
+        if open_timeout is None:
+            resource = rm.open_resource(address)
+        else:
+            resource = rm.open_resource(address, open_timeout=open_timeout)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return self._use(self._add(key, resource), settings)
+            elif entry.can_share(probe, settings):
+                # Someone else opened it in the meantime; use theirs
+                type(resource).close(resource)
+                return self._use(entry, settings)
+
+        log.info("VISA resource '%s' is in use, so using a separate session", address)
+        try:
+            for name, value in settings.items():
+                setattr(resource, name, value)
+        except Exception:
+            type(resource).close(resource)
+            raise
+        return resource
+
+    def release(self, resource):
+        """Give back a resource gotten from `acquire()`
+
+        The resource is kept open while idle, and is closed after `idle_timeout` seconds unless it
+        is acquired again.
+        """
+        with self._lock:
+            entry = self._by_id.get(id(resource))
+            if entry is None or entry.resource is not resource:
+                type(resource).close(resource)  # Not (or no longer) pooled
+                return
+
+            entry.refcount -= 1
+            if entry.refcount > 0:
+                return
+
+            if self.idle_timeout <= 0 or not entry.is_alive():
+                self._close(entry)
+                return
+
+            entry.restore_defaults()
+            entry.idle_since = time.time()
+            self._schedule_eviction()
+
+    def evict_idle(self, max_idle=None):
+        """Close resources that have been idle for at least `max_idle` (default `idle_timeout`)"""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.time()
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.idle_since is not None and now - entry.idle_since >= max_idle:
+                    log.info("Closing idle VISA resource '%s'", entry.key[0])
+                    self.evictions += 1
+                    self._close(entry)
+
+    def close_all(self):
+        """Close every pooled resource, including ones still in use"""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                self._close(entry)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self):
+        """Get a dict of pool statistics
+
+        Includes the number of `hits` (acquires served by an already-open resource), `misses`,
+        `evictions` of idle resources, and the current number of `open` and `idle` resources.
+        """
+        with self._lock:
+            n_idle = sum(1 for e in self._entries.values() if e.idle_since is not None)
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.,
+                'evictions': self.evictions,
+                'open': len(self._entries),
+                'idle': n_idle,
+            }
+
+    def _use(self, entry, settings):
+        """Take a reference to `entry`, applying `settings` if it has no other users"""
+        entry.refcount += 1
+        entry.idle_since = None
+        if entry.refcount == 1:
+            try:
+                for name, value in settings.items():
+                    setattr(entry.resource, name, value)
+            except Exception:
+                self.release(entry.resource)
+                raise
+        return entry.resource
+
+    def _add(self, key, resource):
+        entry = _PoolEntry(key, resource)
+        resource.close = functools.partial(self.release, resource)
+        self._entries[key] = entry
+        self._by_id[id(resource)] = entry
+        return entry
+
+    def _remove(self, entry):
+        self._entries.pop(entry.key, None)
+        self._by_id.pop(id(entry.resource), None)
+        entry.resource.__dict__.pop('close', None)  # Restore the real close()
+
+    def _close(self, entry):
+        self._remove(entry)
+        try:
+            entry.resource.close()
+        except Exception as e:
+            log.info("Error closing VISA resource '%s': <<%s>>", entry.key[0], str(e))
+
+    def _schedule_eviction(self):
+        if self._timer is not None and self._timer.is_alive():
+            return
+
+        def evict():
+            self._timer = None
+            self.evict_idle()
+            with self._lock:
+                if any(e.idle_since is not None for e in self._entries.values()):
+                    self._schedule_eviction()
+
+        self._timer = threading.Timer(self.idle_timeout, evict)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+def visa_resource_pool():
+    """Get the process-wide `ResourcePool`"""
+    if visa_resource_pool.instance is None:
+        visa_resource_pool.instance = ResourcePool()
+    return visa_resource_pool.instance
+
+
+visa_resource_pool.instance = None
@@ -1,2 +1,14 @@
+import pytest
+
+
 def pytest_addoption(parser):
     parser.addoption("--instrument", action="store", help="Name of instrument to test")
+
+
+@pytest.fixture(autouse=True)
+def discovery_cache(tmp_path, monkeypatch):
+    """Keep the discovery cache in a temporary directory, away from the user's data dir"""
+    from instrumental.drivers import discovery
+    cache = discovery.DiscoveryCache(path=str(tmp_path / discovery.CACHE_FILENAME))
+    monkeypatch.setattr(discovery.discovery_cache, 'instance', cache)
+    return cache
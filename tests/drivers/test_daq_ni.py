@@ -1,3 +1,4 @@
+import numpy as np
 from instrumental import u
 
 
@@ -17,3 +18,54 @@ class TestNIDAQ(object):
         assert data['t'].shape == (10,)
         assert dim_matches(data[ai.path], u.V)
         assert dim_matches(data['t'], u.s)
+
+    def test_AI_stream(self, inst):
+        from instrumental.drivers.daq.ni import Task
+        with Task(inst.ai0, inst.ai1) as task:
+            with task.stream('10 kHz', 1000) as stream:
+                chunks = []
+                for chunk in stream:
+                    chunks.append(chunk)
+                    if len(chunks) == 5:
+                        break
+        assert [c.start for c in chunks] == [0, 1000, 2000, 3000, 4000]
+        assert chunks[0].data.shape == (2, 1000)
+        stats = stream.stats()
+        assert stats['chunks'] >= 5 and not stats['overflowed']
+
+    def test_AI_read_buffers(self, inst):
+        from instrumental.drivers.daq.ni import Task
+        with Task(inst.ai0, inst.ai1) as task:
+            task.set_timing(fsamp='10 kHz', n_samples=100)
+            task.use_buffer_ring(2)
+            first = task.run()
+            assert first.array.shape == (2, 100)
+            assert first['t'].shape == (100,)
+            second = task.run()
+            third = task.run()
+        assert third.array.base is first.array.base
+        assert second.array.base is not first.array.base
+
+    def test_AI_read_raw(self, inst):
+        from instrumental.drivers.daq.ni import Task
+        with Task(inst.ai0, inst.ai1) as task:
+            task.set_timing(fsamp='10 kHz', n_samples=100)
+            task.start()
+            data = task.read(raw=True)
+            task.stop()
+        assert data.array.dtype == np.int16
+        assert data.coeffs.shape == (2, 4)
+        assert dim_matches(data[inst.ai0.path], u.V)
+        assert data.scaled().array.shape == (2, 100)
+
+    def test_AI_stream_record(self, inst, tmp_path):
+        import time
+        from instrumental.drivers.daq.ni import Task
+        from instrumental.drivers.daq.streamfile import StreamFile
+        path = str(tmp_path / 'stream.ivs')
+        with Task(inst.ai0, inst.ai1) as task:
+            with task.stream('10 kHz', 1000, raw=True, record=path) as stream:
+                time.sleep(0.5)
+        recording = StreamFile(path)
+        assert recording.samples.shape == (stream.stats()['samples'], 2)
+        assert recording.coeffs.shape == (2, 4)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from instrumental.drivers.daq.digital import LinePacker
+
+
+def test_pack_and_unpack_line_order():
+    # Value bit 0 -> port0.line3, bit 1 -> port1.line0, bit 2 -> port0.line0
+    packer = LinePacker([('port0', 'line3'), ('port1', 'line0'), ('port0', 'line0')])
+    assert packer.pack(0b001) == 1 << 3
+    assert packer.pack(0b010) == 1 << 8
+    assert packer.pack(0b111) == (1 << 3) | (1 << 8) | 1
+
+    values = np.arange(8)
+    words = packer.pack(values)
+    assert words.dtype == np.uint32
+    assert np.array_equal(packer.unpack(words), values)
+    assert packer.unpack(0xFFFFFFFF) == 0b111
+
+
+def test_pack_bools():
+    packer = LinePacker([('port0', 'line5')])
+    assert np.array_equal(packer.pack([True, False]), [1 << 5, 0])
@@ -0,0 +1,93 @@
+import time
+from instrumental.drivers import ParamSet
+from instrumental.drivers.discovery import Discovery, DiscoveryCache, Probe
+
+
+def _run(probes, **kwds):
+    scan = Discovery(**kwds)
+    return list(scan._run(probes)), scan.report
+
+
+def test_results_stream_and_report():
+    probes = [
+        Probe('ok', lambda: ['a', 'b'], timeout=5),
+        Probe('broken', lambda: 1/0, timeout=5),
+        Probe('hung', lambda: time.sleep(10) or ['late'], timeout=0.2),
+    ]
+    results, report = _run(probes, max_workers=2)
+
+    assert sorted(results) == ['a', 'b']
+    assert report.completed == ['ok']
+    assert report.timed_out == ['hung']
+    assert isinstance(report.failed['broken'], ZeroDivisionError)
+    assert report.elapsed < 5
+    assert not report.ok
+
+
+def test_expanding_probe():
+    children = [Probe(str(i), (lambda i=i: [i]), timeout=5) for i in range(5)]
+    results, report = _run([Probe('parent', lambda: children, timeout=5, expands=True)],
+                           max_workers=3)
+
+    assert sorted(results) == list(range(5))
+    assert report.ok
+
+
+def test_cache_roundtrip(tmp_path):
+    path = str(tmp_path / 'cache.pkl')
+    cache = DiscoveryCache(path=path, ttl=60)
+    cache.put('cameras.fake', [ParamSet(module='cameras.fake', classname='Fake', serial='123',
+                                        **{'**visa_instrument': object()})])
+
+    cache = DiscoveryCache(path=path, ttl=60)  # Reload from disk
+    paramsets = cache.get('cameras.fake')
+    assert [p['serial'] for p in paramsets] == ['123']
+    assert '**visa_instrument' not in paramsets[0]
+    assert cache.find(lambda p: '123' in str(p))['classname'] == 'Fake'
+
+    cache.invalidate('cameras.fake')
+    assert cache.get('cameras.fake') is None
+
+
+def test_cache_expiry(tmp_path):
+    cache = DiscoveryCache(path=str(tmp_path / 'cache.pkl'), ttl=0.05)
+    cache.put('cameras.fake', [ParamSet(serial='123')])
+    time.sleep(0.1)
+    assert cache.get('cameras.fake') is None
+
+
+def test_failed_opens_stop_tracking(discovery_cache):
+    from instrumental.drivers import instrument
+    for _ in range(3):
+        try:
+            instrument(module='nonexistent_xyz')
+        except Exception:
+            pass
+        assert discovery_cache._served.depth == 0
+
+
+def test_find_checks_only_matching_fingerprint(tmp_path, monkeypatch):
+    from instrumental.drivers import discovery
+    fingerprinted = []
+    monkeypatch.setattr(discovery, '_fingerprint', lambda key: fingerprinted.append(key) or 'fp')
+    cache = DiscoveryCache(path=str(tmp_path / 'cache.pkl'), ttl=60)
+    cache.put_many({'cameras.a': [ParamSet(serial='1')], 'cameras.b': [ParamSet(serial='2')]})
+
+    del fingerprinted[:]
+    assert cache.find(lambda p: p['serial'] == '2')['serial'] == '2'
+    assert fingerprinted == ['cameras.b']
+
+
+def test_find_reidentifies_visa_instruments(tmp_path, monkeypatch):
+    from instrumental.drivers import discovery
+    cached = ParamSet(module='scopes.tektronix', classname='TDS_3000', visa_address='USB::1')
+    devices = {'USB::1': ParamSet(**cached._dict)}
+    monkeypatch.setattr(discovery, 'probe_visa_address', devices.get)
+    cache = DiscoveryCache(path=str(tmp_path / 'cache.pkl'), ttl=60)
+    cache.put('visa', [cached])
+
+    assert cache.find(lambda p: 'tds' in str(p).lower())['visa_address'] == 'USB::1'
+    devices['USB::1'] = ParamSet(module='scopes.tektronix', classname='MSO_DPO_4000',
+                                 visa_address='USB::1')  # Swapped for a different scope
+    assert cache.find(lambda p: 'tds' in str(p).lower()) is None
+    assert cache.get('visa') is None
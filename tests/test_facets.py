@@ -0,0 +1,124 @@
+import time
+
+import pytest
+from pint.errors import DimensionalityError
+
+from instrumental import Q_
+from instrumental.drivers import VisaMixin, SCPI_Facet, MessageFacet, ManualFacet
+from instrumental.drivers.util import magnitude_as
+
+
+class FakeResource(object):
+    def __init__(self, responses):
+        self.responses = responses
+        self.queries = []
+
+    def query(self, message):
+        self.queries.append(message)
+        return ';'.join(self.responses[msg.lstrip(':')] for msg in message.split(';')) + '\n'
+
+    def write(self, message):
+        pass
+
+
+class FakeAnalyzer(VisaMixin):
+    center = SCPI_Facet('freq:cent', convert=float, units='Hz')
+    span = SCPI_Facet('freq:span', convert=float, units='Hz', cached=True)
+    mode = SCPI_Facet('mode', value={'spectrum': 'SAN'})
+    info = SCPI_Facet('info', readonly=True)
+    status = MessageFacet('STATUS')
+    label = ManualFacet()
+
+    def _initialize(self):
+        self._rsrc = FakeResource({'freq:cent?': '1E6', 'freq:span?': '2.5E3', 'mode?': 'SAN',
+                                   'info?': 'a;b', 'STATUS': 'ok'})
+
+
+def test_get_many():
+    sa = FakeAnalyzer()
+    values = sa.get_many(['span', 'label', 'center', 'mode'])
+    assert list(values) == ['span', 'label', 'center', 'mode']
+    assert values['center'] == Q_(1e6, 'Hz') and values['span'] == Q_(2.5e3, 'Hz')
+    assert values['mode'] == 'spectrum'
+    assert sa._rsrc.queries == [':freq:span?;:freq:cent?;:mode?']
+
+    # Cached facets aren't queried again
+    assert sa.facets.get_many(['center', 'span'])['span'] == Q_(2.5e3, 'Hz')
+    assert sa._rsrc.queries[-1] == 'freq:cent?'
+
+    # A ';' within a field makes the response ambiguous, so fall back to individual queries
+    values = sa.get_many(['center', 'info'], use_cache=False)
+    assert values['info'] == 'a;b\n'
+    assert sa._rsrc.queries[-3:] == [':freq:cent?;:info?', 'freq:cent?', 'info?']
+
+    # Only SCPI facets are combined, and each field is stripped
+    sa._rsrc.responses['mode?'] = ' SAN '
+    values = sa.get_many(['status', 'center', 'mode'], use_cache=False)
+    assert values['status'] == 'ok\n' and values['mode'] == 'spectrum'
+    assert sa._rsrc.queries[-2:] == [':freq:cent?;:mode?', 'STATUS']
+
+
+class FakeSweeper(VisaMixin):
+    span = SCPI_Facet('span', convert=float, cached=True, invalidates=['start'])
+    start = SCPI_Facet('start', convert=float, cached=True)
+    level = SCPI_Facet('level', convert=float, ttl=0.05)
+
+    def _initialize(self):
+        self._rsrc = FakeResource({'span?': '10', 'start?': '5', 'level?': '1'})
+
+
+def test_ttl_and_invalidation():
+    sw = FakeSweeper()
+    queries = sw._rsrc.queries
+    sw.start, sw.start, sw.level, sw.level
+    assert queries == ['start?', 'level?']
+
+    time.sleep(0.06)
+    sw.level
+    assert queries[-1] == 'level?' and len(queries) == 3
+
+    sw.span = 20
+    sw.start
+    assert queries[-1] == 'start?' and len(queries) == 4
+
+    sw.invalidate()
+    sw.start, sw.level
+    assert queries[-2:] == ['start?', 'level?']
+
+
+def test_unit_conversion_factors():
+    volts = ManualFacet(units='V', limits=(0, 10))
+    assert volts.to_magnitude(Q_(1500, 'mV')) == 1.5
+    assert volts.to_magnitude('2 kV') == 2000
+    assert volts.to_magnitude(Q_(3, 'V')) == 3
+    with pytest.raises(DimensionalityError):
+        volts.to_magnitude('2 A')
+
+    temp = ManualFacet(units='degC')
+    assert temp.to_magnitude(Q_(300, 'K')) == pytest.approx(26.85)
+    assert magnitude_as.factors[Q_(1, 'K').units, temp.units] is None  # Offset units use pint
+
+
+class FakeLaser(VisaMixin):
+    wavelength = SCPI_Facet('wav', convert=float, units='nm', limits=(1500, 1600, 0.5))
+
+    def _initialize(self):
+        self._rsrc = FakeResource({'*OPC?': '1'})
+        self._rsrc.write = self._rsrc.queries.append
+
+
+def test_sweep():
+    laser = FakeLaser()
+    points = []
+    record = laser.facets.wavelength.sweep(Q_([1500., 1550.1], 'nm'), dwell=0.01,
+                                           on_point=lambda i, value: points.append(value))
+    assert laser._rsrc.queries == ['wav 1500.0', 'wav 1550.0']
+    assert list(record['value']) == [1500, 1550] and record['time'][1] - record['time'][0] >= 0.01
+    assert points == [Q_(1500, 'nm'), Q_(1550, 'nm')]
+    assert laser.facets.wavelength.cached_val == Q_(1550, 'nm')
+
+    laser.facets.wavelength.sweep(['1510 nm'], sync=True)
+    assert laser._rsrc.queries[-2:] == ['wav 1510.0', '*OPC?']
+    with pytest.raises(ValueError):
+        laser.facets.wavelength.sweep(Q_([1550, 1650], 'nm'))
+    assert len(laser._rsrc.queries) == 4  # Nothing set if any value is out of range
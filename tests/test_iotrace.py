@@ -0,0 +1,66 @@
+import contextlib
+
+import numpy as np
+import pytest
+from pyvisa.constants import InterfaceType
+
+from instrumental.drivers import ParamSet, instrument, create_instrument, iotrace
+from instrumental.drivers.scopes import tektronix
+
+CURVE = np.arange(100, dtype='>i2')
+WAVEFORM_PARAMS = '1E-9;4E-3;0;0;0;0;"s";"Volts"'
+
+
+class FakeVisaLib(object):
+    def __init__(self):
+        block = '#{}{}'.format(len(str(CURVE.nbytes)), CURVE.nbytes).encode() + CURVE.tobytes()
+        self.buf = bytearray(block)
+
+    def read(self, session, count):
+        data, self.buf = bytes(self.buf[:count]), self.buf[count:]
+        return data, 0
+
+
+class FakeScopeResource(object):
+    interface_type = InterfaceType.tcpip
+    session = 1
+    timeout = 200
+    read_termination = None
+    end_input = None
+
+    def __init__(self):
+        self.visalib = FakeVisaLib()
+
+    def query(self, message):
+        return 'TEKTRONIX,TDS 2024B\n' if message == '*IDN?' else WAVEFORM_PARAMS
+
+    def write(self, message):
+        pass
+
+    def read(self):
+        return ''
+
+    def ignore_warning(self, *codes):
+        return contextlib.nullcontext()
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / 'scope.trace')
+    with iotrace.recording(path):
+        scope = create_instrument(tektronix, 'TDS_2000', ParamSet(visa_address='TCPIP::fake'),
+                                  FakeScopeResource())
+        t, y = scope.get_data()
+    assert y.magnitude == pytest.approx(CURVE * 4e-3)
+
+    replayed = instrument(replay=path, reopen_policy='new')
+    assert isinstance(replayed, tektronix.TDS_2000)
+    assert replayed._paramset['visa_address'] == 'TCPIP::fake'
+    t2, y2 = replayed.get_data()
+    assert np.all(t2 == t) and np.all(y2 == y)
+
+    # The trace has ended, and calls that weren't recorded are caught
+    with pytest.raises(iotrace.TraceMismatchError):
+        replayed.write('*RST')
+    replayed = instrument(replay=path, reopen_policy='new', replay_timing='real')
+    with pytest.raises(iotrace.TraceMismatchError):
+        replayed.get_data(channel=2)
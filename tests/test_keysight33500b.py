@@ -0,0 +1,36 @@
+import pytest
+from instrumental.drivers.funcgenerators import keysight33500b as ks
+
+
+class RecordingResource(object):
+    def __init__(self):
+        self.messages = []
+
+    def write(self, message):
+        self.messages.append(message)
+
+
+@pytest.fixture
+def fg():
+    fg = object.__new__(ks.Keysight33500B)  # Skip opening a real instrument
+    fg._rsrc = RecordingResource()
+    return fg
+
+
+def test_validate_parameters(fg):
+    fg.set_source_bpsk_phase(45)
+    fg.set_source_bpsk_phase(ks.StdNumEnums.MINIMUM, source_num=2)
+    fg.set_source_bpsk_phase(angle=1.5)
+    assert fg._rsrc.messages[1] == ':SOURce2:BPSK:PHASe MINIMUM'
+    assert fg._rsrc.messages[2].startswith(':SOURce1:')
+
+    with pytest.raises(TypeError):
+        fg.set_source_bpsk_phase('45')
+    with pytest.raises(ValueError):
+        fg.set_source_bpsk_phase(45.0, source_num=3)
+    with pytest.raises(TypeError):
+        fg.set_source_bpsk_phase()
+
+    fg.strict_validation = False
+    fg.set_source_bpsk_phase('45', 3)
+    assert fg._rsrc.messages[-1].startswith(':SOURce3:')
@@ -1,4 +1,5 @@
 from instrumental import list_instruments
+from instrumental.drivers import ParamSet
 
 
 def test_list_instruments():
@@ -12,3 +13,13 @@ def test_import_all():
             getattr(instrumental, attr)
         except ImportError:
             pass  # Ignore dependencies on matplotlib, numpy, etc.
+
+
+def test_list_instruments_parallel():
+    found = list_instruments(parallel=True, timeout=30)
+    assert isinstance(found, list)
+    assert all(isinstance(paramset, ParamSet) for paramset in found)
+
+    def as_sorted(paramsets):
+        return sorted(str(sorted(paramset.items())) for paramset in paramsets)
+    assert as_sorted(found) == as_sorted(list_instruments())
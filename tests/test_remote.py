@@ -0,0 +1,240 @@
+import time
+import socket
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from instrumental import Q_
+from instrumental.drivers import ParamSet, remote, iostats
+from instrumental.drivers.facet import ManualFacet
+
+
+class Counter(object):
+    level = ManualFacet(name='level', units='V')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()  # Unpicklable, like a real instrument
+
+    def add(self, n):
+        self.value += n
+        return self.value
+
+    def wait(self, seconds):
+        time.sleep(seconds)
+        return seconds
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(remote, 'instrument', lambda params: Counter())
+    server = remote.ThreadedTCPServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    host, port = server.server_address
+    session = remote.ClientSession(host, port, 'test')
+    yield session
+
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_request_roundtrip(session):
+    inst = session.instrument(ParamSet(server='test'))
+    inst.value = 3
+    assert inst.add(2) == 5
+    assert inst.value == 5
+
+
+def test_io_stats(session):
+    inst = session.instrument(ParamSet(server='test'))
+    with iostats.capture() as stats:
+        inst.add(1)
+    sent = stats.summary(session.messenger)[('send', 'request')]
+    received = stats.summary(session.messenger)[('recv', 'response')]
+    assert sent['count'] == received['count'] >= 1
+    assert sent['sent'] > 0 and received['received'] > 0
+
+
+def test_batch(session):
+    inst = session.instrument(ParamSet(server='test'))
+    with session.batch():
+        inst.value = 10
+        before = inst.value
+        total = inst.add(5)
+        missing = inst.nonexistent
+        assert not total.done()
+
+    assert before.result() == 10
+    assert total.result() == 15
+    with pytest.raises(AttributeError):
+        missing.result()
+
+
+def test_pipelined_requests(session):
+    inst = session.instrument(ParamSet(server='test'))
+    futures = [session.request_async(command='callattr', obj_id=inst._obj_id, attr='add',
+                                     args=(1,), kwargs={}) for _ in range(300)]
+    assert [f.result() for f in futures] == list(range(1, 301))
+
+
+def test_array_transfer(session):
+    inst = session.instrument(ParamSet(server='test'))
+    frame = np.arange(512*1024, dtype=np.uint16).reshape(512, 1024)
+    inst.value = Q_(frame, 'V')  # Large enough to be sent out-of-band
+    assert session.messenger.peer_accepts_buffers
+
+    echoed = inst.value
+    assert echoed.units == Q_(1, 'V').units
+    np.testing.assert_array_equal(echoed.magnitude, frame)
+    assert echoed.magnitude.flags.writeable
+
+
+def test_buffer_framing():
+    data, buffers = remote.Session.serialize([np.ones(100000), b'x', np.zeros(3)],
+                                             out_of_band=True)
+    assert len(buffers) == 1
+    chunks = remote.Messenger.encode((data, buffers), 7, remote.REQUEST)
+    frame = b''.join(bytes(c) for c in chunks)
+    id, length = remote.Messenger.read_header(frame)
+    assert (id, length) == (7, len(frame) - remote.STRUCT.size)
+
+    payload = bytearray(frame[remote.STRUCT.size:])
+    big, small, tiny = remote.Session.deserialize(remote.Messenger.split_buffers(payload))
+    assert big.sum() == 100000 and small == b'x' and tiny.shape == (3,)
+
+
+def test_facet_subscription(session):
+    inst = session.instrument(ParamSet(server='test'))
+    with session.subscribe(inst, 'level') as sub:
+        inst.level = '1 V'
+        inst.level = '2 V'
+        first, second = sub.get(timeout=2), sub.get(timeout=2)
+    assert first.name == 'level'
+    assert (first.new, second.old, second.new) == (Q_(1, 'V'), Q_(1, 'V'), Q_(2, 'V'))
+    assert sub.get() is None  # Closed
+
+
+def test_sampled_subscription(session):
+    inst = session.instrument(ParamSet(server='test'))
+    received = []
+    done = threading.Event()
+
+    def callback(event):
+        received.append(event.new)
+        if len(received) == 3:
+            done.set()
+
+    sub = session.subscribe(inst, 'add', callback=callback, interval=0.01, args=(1,))
+    assert done.wait(2)
+    sub.close()
+    assert received[:3] == [1, 2, 3]
+
+    inst = session.instrument(ParamSet(server='test'))
+    with session.subscribe(inst, 'value', interval=0.01, on_change=True) as sub:
+        sub.get(timeout=2)
+        with pytest.raises(remote.RemoteTimeoutError):
+            sub.get(timeout=0.1)  # Unchanged values aren't pushed
+
+
+def test_compressed_framing():
+    codec = remote.CODECS['zlib']
+    refs_out, refs_in = [], []
+    frame = np.zeros((256, 512), dtype=np.uint16)
+    for i in range(3):
+        frame[i, :] = i + 1
+        data, buffers = remote.Session.serialize(frame, out_of_band=True)
+        chunks = remote.Messenger.encode((data, buffers), 1, remote.EVENT, codec, 1024, refs_out)
+        frame_bytes = b''.join(bytes(c) for c in chunks)
+        assert len(frame_bytes) < frame.nbytes // 50
+
+        kind, flags, id, length = remote.STRUCT.unpack_from(frame_bytes)
+        payload = bytearray(frame_bytes[remote.STRUCT.size:])
+        message = remote.Messenger.split_buffers(payload, flags, refs_in)
+        np.testing.assert_array_equal(remote.Session.deserialize(message), frame)
+
+
+def test_compressed_session(session):
+    assert session.set_compression('zlib') == 'zlib'
+    inst = session.instrument(ParamSet(server='test'))
+    frame = np.zeros((1024, 1024), dtype=np.uint16)
+    inst.value = frame
+    np.testing.assert_array_equal(inst.value, frame)
+
+    with session.subscribe(inst, 'value', interval=0.01, delta=True) as sub:
+        first, second = sub.get(timeout=2), sub.get(timeout=2)
+    np.testing.assert_array_equal(first.new, frame)  # Sent whole, as there's no reference yet
+    np.testing.assert_array_equal(second.new, frame)
+    assert session.set_compression([]) is None
+
+
+def test_async_session(session):
+    host, port = session.host, session.port
+
+    async def run():
+        async with remote.AsyncClientSession(host, port) as asession:
+            insts = await asyncio.gather(asession.instrument(), asession.instrument())
+            await asyncio.gather(*(inst.set_attr('value', i) for i, inst in enumerate(insts)))
+            assert await insts[1].value == 1
+            assert await asyncio.gather(*(inst.add(10) for inst in insts)) == [10, 11]
+
+            # Reconnects and reopens the instrument after losing the connection
+            await asession.messenger.close()
+            assert await insts[0].add(1) == 1
+
+    asyncio.run(run())
+
+
+def test_async_connect_retries():
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()  # Nothing listening here now
+
+    asession = remote.AsyncClientSession('127.0.0.1', port, retries=2, backoff=0.01)
+    with pytest.raises(remote.RemoteError):
+        asyncio.run(asession.connect())
+
+
+def test_parallel_instruments(session):
+    insts = [session.instrument(ParamSet(server='test')) for _ in range(4)]
+    start = time.time()
+    with session.batch():
+        futures = [inst.wait(0.3) for inst in insts]
+    assert [f.result() for f in futures] == [0.3] * 4
+    assert time.time() - start < 0.9  # Run in parallel, not one after another
+
+    with session.batch():
+        futures = [insts[0].wait(0.05) for _ in range(3)]
+    [f.result() for f in futures]
+
+    stats = session.stats()
+    assert stats['workers'] == remote.DEFAULT_MAX_WORKERS
+    queues = sorted((q for q in stats['queues'] if 'Counter' in q['name']),
+                    key=lambda q: q['calls'])
+    assert [q['calls'] for q in queues] == [1, 1, 1, 4]
+    busiest = queues[-1]
+    assert busiest['depth'] == 0 and busiest['p99_latency'] >= 0.05
+
+
+def test_executor_discards_busy_queue():
+    executor = remote.InstrumentExecutor(max_workers=2)
+    started = threading.Event()
+    release = threading.Event()
+    future = executor.submit('inst', 'inst', lambda: started.set() or release.wait(5))
+    started.wait(5)
+
+    executor.discard('inst')  # Still running, so removed once idle
+    assert len(executor.stats()['queues']) == 1
+    release.set()
+    future.result(5)
+    time.sleep(0.05)
+    assert executor.stats()['queues'] == []
+    executor.shutdown()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from instrumental import Q_
+from instrumental.drivers.daq.streamfile import StreamWriter, StreamFile
+
+
+def test_record_and_read(tmp_path):
+    path = str(tmp_path / 'run.ivs')
+    chunk = np.empty((2, 100))
+    with StreamWriter(path, ['Dev1/ai0', 'Dev1/ai1'], Q_(10, 'kHz'), capacity=150,
+                      max_queued=2, metadata={'note': 'test'}) as writer:
+        for i in range(5):
+            chunk[0] = np.arange(100 * i, 100 * (i + 1))
+            chunk[1] = -chunk[0]
+            writer.write(chunk)  # The writer copies, so the chunk can be reused
+    assert writer.stats()['samples'] == 500
+
+    recording = StreamFile(path)
+    assert recording.channels == ['Dev1/ai0', 'Dev1/ai1']
+    assert recording.fsamp == Q_(10, 'kHz')
+    assert recording.metadata == {'note': 'test'}
+    assert recording.samples.shape == (500, 2)
+    assert np.array_equal(recording.read(490)[1], -np.arange(490, 500))
+    assert np.allclose(recording.time(1, 3).m_as('s'), [1e-4, 2e-4])
+
+
+def test_raw_samples_are_scaled(tmp_path):
+    path = str(tmp_path / 'raw.ivs')
+    with StreamWriter(path, ['ai0'], '1 MHz', dtype=np.int16, coeffs=[[0.5, 2., 0., 0.]]) as writer:
+        writer.write(np.array([[1, 2, 3]], dtype=np.int16))
+
+    recording = StreamFile(path)
+    assert recording.samples.dtype == np.int16
+    assert np.allclose(recording.read(), [[2.5, 4.5, 6.5]])
+
+
+def test_large_header(tmp_path):
+    path = str(tmp_path / 'wide.ivs')
+    channels = ['Dev1/ai{}'.format(i) for i in range(64)]
+    coeffs = np.random.rand(64, 4)
+    metadata = {'notes': ['sample {}'.format(i) for i in range(500)]}
+    with StreamWriter(path, channels, '1 kHz', dtype=np.int16, coeffs=coeffs,
+                      metadata=metadata) as writer:
+        writer.write(np.ones((64, 10), dtype=np.int16))
+        writer.start_time = 1234567890.123456789
+
+    recording = StreamFile(path)
+    assert recording.metadata == metadata
+    assert recording.start_time == writer.start_time
+    assert recording.samples.shape == (10, 64)
+    assert recording.samples.offset % 4096 == 0
+    assert np.allclose(recording.coeffs, coeffs)
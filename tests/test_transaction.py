@@ -0,0 +1,101 @@
+import pytest
+
+from instrumental.drivers import VisaMixin, iostats
+from instrumental.errors import Error
+
+
+class FakeResource(object):
+    def __init__(self):
+        self.sent = []
+        self.response = ''
+
+    def query(self, message):
+        self.sent.append(('query', message))
+        return self.response
+
+    def write(self, message):
+        self.sent.append(('write', message))
+
+
+class FakeInst(VisaMixin):
+    def _initialize(self):
+        self._rsrc = FakeResource()
+
+
+def test_transaction_queries():
+    inst = FakeInst()
+    rsrc = inst._rsrc
+
+    rsrc.response = '1;2'
+    with inst.transaction():
+        inst.write('a 1')
+        a = inst.query_async('a?')
+        assert not a.done
+        assert inst.query('b?') == '2'  # Sent along with the queued messages
+        inst.write('c 3')
+    assert a.value == '1'
+    assert rsrc.sent == [('query', ':a 1;:a?;:b?'), ('write', ':c 3')]
+
+    # Deferred queries are read in one go at the end of the block; the last may contain ';'
+    rsrc.sent, rsrc.response = [], '4;5;x;y'
+    with inst.transaction():
+        d = inst.query_async('d?')
+        inst.write('e')
+        rest = inst.query_async('rest?')
+        with pytest.raises(Error):
+            d.value
+    assert (d.value, rest.value) == ('4', '5;x;y')
+    assert rsrc.sent == [('query', ':d?;:e;:rest?')]
+
+    # Outside of a transaction, queries are made immediately
+    assert inst.query_async('f?').value == '4;5;x;y'
+    assert inst.query('g?') == '4;5;x;y'
+
+    rsrc.sent = []
+    with pytest.raises(ZeroDivisionError):
+        with inst.transaction():
+            inst.write('h')
+            1/0
+    assert rsrc.sent == [] and not inst._in_transaction
+
+    # Common commands aren't made absolute
+    rsrc.sent, rsrc.response = [], '1;0'
+    with inst.transaction():
+        opc = inst.query_async('*OPC?')
+        inst.write('*CLS')
+        inst.query_async('err?')
+    assert opc.value == '1'
+    assert rsrc.sent == [('query', '*OPC?;*CLS;:err?')]
+
+
+def test_io_stats():
+    inst = FakeInst()
+    inst._rsrc.response = '1'
+    inst.query('a?')  # Not recorded
+    with iostats.capture() as stats:
+        for i in range(10):
+            inst.write('volt {}', i)
+        inst.query('volt?')
+        with inst.transaction():
+            inst.write('a')
+            inst.write('b 1')
+    assert not stats.recording
+    inst.query('a?')
+
+    summary = stats.summary(inst)
+    volt = summary[('write', 'volt')]
+    assert volt['count'] == 10 and volt['sent'] == 60
+    assert 0 <= volt['p50'] <= volt['p99'] <= volt['max']
+    assert summary[('query', 'volt?')]['received'] == 1
+    assert summary[('write', 'a;b')]['count'] == 1
+    assert 'volt?' in stats.report()
+    assert inst.io_stats() == {}  # Process-wide stats aren't enabled
+
+
+def test_latency_histogram():
+    hist = iostats.LatencyHistogram()
+    for latency in [1e-3] * 98 + [0.5, 2.0]:
+        hist.add(latency)
+    assert hist.percentile(50) == pytest.approx(1e-3, rel=0.07)
+    assert hist.percentile(99) == pytest.approx(0.5, rel=0.07)
+    assert hist.percentile(100) == 2.0
@@ -0,0 +1,74 @@
+from enum import Enum
+
+import numpy as np
+import pytest
+from pint.errors import DimensionalityError
+from instrumental import Q_
+from instrumental.drivers.util import (check_units, unit_mag, check_enums, parse_units,
+                                       magnitude_as)
+
+
+class Mode(Enum):
+    fast = 0
+    slow = 1
+
+
+def test_check_units():
+    @check_units(duration='s', timeout='?s', ret=('s', None, None, None))
+    def read(duration, timeout=None, *args, **kwds):
+        return duration, timeout, args, kwds
+
+    q = Q_(2, 's')
+    assert read(q)[0] is q  # Already in the right units, so passed through untouched
+    assert read('10 ms', timeout=0) == (Q_(10, 'ms'), Q_(0, 's'), (), {})
+    assert read(q, q, 3, extra=4)[2:] == ((3,), {'extra': 4})
+    with pytest.raises(DimensionalityError):
+        read('1 V')
+    with pytest.raises(DimensionalityError):
+        read(5)
+    with pytest.raises(DimensionalityError):
+        check_units(ret='s')(lambda: '1 m')()
+
+
+def test_unit_mag_and_enums():
+    @unit_mag('V', limit='?mA')
+    @check_enums(mode=Mode)
+    def set_voltage(value, limit='1 A', mode='fast'):
+        return value, (limit, mode)
+
+    assert set_voltage('250 mV') == (0.25, (1000, Mode.fast))
+    assert set_voltage(Q_(2, 'V'), None, 'slow') == (2, (None, Mode.slow))
+    assert set_voltage(0, limit=Q_(1, 'uA'), mode=Mode.slow)[1][0] == pytest.approx(1e-3)
+    with pytest.raises(ValueError):
+        set_voltage('1 V', mode='medium')
+
+
+def test_parse_units_and_magnitude_as():
+    assert parse_units('mV') is parse_units('mV')
+    assert magnitude_as('250 mV', 'V') == pytest.approx(0.25)
+    assert magnitude_as(Q_(2., 'V'), 'V') == 2.
+    assert magnitude_as(Q_(0, 'degC'), 'K') == pytest.approx(273.15)  # Offset units
+    with pytest.raises(DimensionalityError):
+        magnitude_as('1 s', 'V')
+
+
+def test_array_args_are_copied():
+    @check_units(values='V', offsets='V')
+    def shift(values, offsets=Q_(np.zeros(2), 'V')):
+        values += Q_(1., 'V')
+        offsets += Q_(1., 'V')
+        return values, offsets
+
+    volts = Q_(np.zeros(2), 'V')
+    for _ in range(2):  # The second call takes the fast path for known units
+        assert list(shift(volts)[1].magnitude) == [1., 1.]
+    assert list(volts.magnitude) == [0., 0.]
+
+    @unit_mag(values='V')
+    def scale(values):
+        values *= 2
+        return values
+
+    ones = Q_(np.ones(2), 'V')
+    assert list(scale(ones)) == [2., 2.]
+    assert list(ones.magnitude) == [1., 1.]
@@ -0,0 +1,51 @@
+import sys
+import types
+
+import pytest
+from instrumental import drivers
+from instrumental.drivers import VisaDriverIndex, visa_driver_index
+
+INFO = {
+    'scopes.fake': {
+        'visa_info': {
+            'FakeScope': ('FAKE  Instruments', ['FS1000', 'FS2*']),
+            'FakeScopeB': ('FAKE Instruments', ['FS2100']),
+        },
+    },
+    'tempcontrollers.fake': {'visa_info': {}},
+    'cameras.fake': {},
+}
+
+
+def test_lookup():
+    index = VisaDriverIndex(INFO)
+    assert index.lookup('fake instruments', ' FS1000') == ('scopes.fake', 'FakeScope')
+    assert index.lookup('FAKE INSTRUMENTS', 'FS2050') == ('scopes.fake', 'FakeScope')
+    assert index.lookup('FAKE Instruments', 'FS2100') == ('scopes.fake', 'FakeScopeB')
+    assert index.lookup('FAKE Instruments', 'FS3000') is None
+    assert index.visa_drivers == ['scopes.fake', 'tempcontrollers.fake']
+
+
+def test_driver_info_index():
+    index = visa_driver_index()
+    assert index.lookup('TEKTRONIX', 'AFG3021B') == ('funcgenerators.tektronix', 'AFG_3000')
+    assert visa_driver_index() is index
+
+
+def test_check_visa_support_failures_not_cached(monkeypatch):
+    class FakeResource(object):
+        def query(self, message):
+            return 'FAKE Instruments,FS9000,123,1.0'
+
+    results = [None, 'FakeScope']
+    module = types.ModuleType('fake_visa_driver')
+    module._check_visa_support = lambda rsrc: results.pop(0)
+    monkeypatch.setitem(sys.modules, 'fake_visa_driver', module)
+    index = VisaDriverIndex({'fake_visa_driver': INFO['scopes.fake']})
+    monkeypatch.setattr(drivers, 'visa_driver_index', lambda: index)
+    monkeypatch.setattr(drivers, '_visa_support_cache', {})
+
+    with pytest.raises(Exception):
+        drivers.find_visa_driver_class(FakeResource())  # e.g. the device was busy
+    assert drivers.find_visa_driver_class(FakeResource()) == (module, 'FakeScope')
+    assert drivers.find_visa_driver_class(FakeResource()) == (module, 'FakeScope')  # Cached
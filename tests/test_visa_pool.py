@@ -0,0 +1,53 @@
+import pytest
+from instrumental.drivers.visa_pool import ResourcePool
+
+pytest.importorskip('pyvisa_sim')
+ADDR = 'ASRL1::INSTR'
+
+
+def test_reuse_and_stats():
+    pool = ResourcePool(idle_timeout=60)
+    rsrc = pool.acquire(ADDR, '@sim', timeout=200, read_termination='\n')
+    assert rsrc.timeout == 200
+    rsrc.close()  # Redirected to pool.release()
+
+    again = pool.acquire(ADDR, '@sim')
+    assert again is rsrc
+    assert again.read_termination == pool._entries[(ADDR, '@sim')].defaults['read_termination']
+
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['open']) == (1, 1, 1)
+    pool.release(again)
+    pool.close_all()
+    assert pool.stats()['open'] == 0
+
+
+def test_idle_eviction():
+    pool = ResourcePool(idle_timeout=60)
+    rsrc = pool.acquire(ADDR, '@sim')
+    rsrc2 = pool.acquire(ADDR, '@sim')
+    pool.release(rsrc)
+    pool.evict_idle(max_idle=0)
+    assert pool.stats()['open'] == 1  # Still referenced once
+
+    pool.release(rsrc2)
+    pool.evict_idle(max_idle=0)
+    assert pool.stats()['evictions'] == 1
+    assert pool.stats()['open'] == 0
+
+
+def test_probe_gets_separate_session():
+    pool = ResourcePool(idle_timeout=60)
+    rsrc = pool.acquire(ADDR, '@sim', timeout=5000)
+    probe = pool.acquire(ADDR, '@sim', probe=True, timeout=200)
+    assert probe is not rsrc
+    assert (rsrc.timeout, probe.timeout) == (5000, 200)
+    pool.release(probe)
+    assert pool.stats()['open'] == 1
+
+    # Sharing an in-use resource doesn't change its settings
+    assert pool.acquire(ADDR, '@sim', timeout=5000) is rsrc
+    other = pool.acquire(ADDR, '@sim', timeout=200)
+    assert other is not rsrc and rsrc.timeout == 5000
+    other.close()
+    pool.close_all()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the argument-checking decorators in `instrumental.drivers.util`.
+
+Times calls to small functions decorated with `check_units`, `unit_mag` and `check_enums`, passing
+arguments in the forms drivers typically see, and reports the overhead in microseconds per call
+relative to calling the same function undecorated.
+
+    python tools/benchmarks/arg_checkers.py [n_calls]
+"""
+import sys
+import timeit
+from enum import Enum
+
+from instrumental import Q_
+from instrumental.drivers.util import check_units, unit_mag, check_enums
+
+
+class Mode(Enum):
+    fast = 0
+    slow = 1
+
+
+def read(self, duration, timeout=None, mode=Mode.fast):
+    return duration
+
+
+def main(n_calls=20000):
+    funcs = [
+        ('check_units', check_units(duration='s', timeout='?s')(read)),
+        ('unit_mag', unit_mag(duration='s', timeout='?s')(read)),
+        ('check_enums', check_enums(mode=Mode)(read)),
+    ]
+    seconds, millis = Q_(1., 's'), Q_(10., 'ms')
+    args = [
+        ('Quantity (target units)', (None, seconds), {}),
+        ('Quantity (other units)', (None, millis), {}),
+        ('str', (None, '10 ms'), {}),
+        ('keywords', (None,), {'duration': seconds, 'timeout': seconds, 'mode': 'slow'}),
+    ]
+
+    def time_call(func, a, kw):
+        func(*a, **kw)  # Warm up caches
+        return min(timeit.repeat(lambda: func(*a, **kw), number=n_calls, repeat=3)) / n_calls
+
+    print('{:>24} {:>12} {:>12} {:>12}'.format('args', *(name for name, _ in funcs)))
+    for name, a, kw in args:
+        bare = time_call(read, a, kw)
+        overheads = [1e6 * (time_call(func, a, kw) - bare) for _, func in funcs]
+        print('{:>24} {:>12.2f} {:>12.2f} {:>12.2f}'.format(name, *overheads))
+    print('(overhead in us/call)')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
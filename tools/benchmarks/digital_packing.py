@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of packing and unpacking digital line patterns with `LinePacker`.
+
+Converts a random pattern for a 12-line channel spread out of order over three ports, as
+`Task._write_DO_channels()` and `MiniTask._reorder_digital_int()` do, and compares with the
+per-sample Python loop that the lookup tables replaced (timed on a slice of the pattern and
+scaled up, since it is far too slow to run in full).
+
+    python tools/benchmarks/digital_packing.py [n_samples]
+"""
+import sys
+import time
+
+import numpy as np
+
+from instrumental.drivers.daq.digital import LinePacker
+
+LINE_PAIRS = ([('port0', 'line3'), ('port1', 'line0'), ('port0', 'line7'), ('port2', 'line5')] +
+              [('port1', 'line{}'.format(i)) for i in range(1, 8)] + [('port0', 'line0')])
+PORTS = ['port0', 'port1', 'port2']
+
+
+def loop_pack(value):
+    """Per-sample packing, as previously done by `VirtualDigitalChannel._create_DO_int()`"""
+    out_val = 0
+    for i, (port_name, line_name) in enumerate(LINE_PAIRS):
+        line_num = int(line_name.replace('line', ''))
+        bit = (value & (1 << i)) >> i
+        out_val += (bit << line_num) << 8*PORTS.index(port_name)
+    return out_val
+
+
+def best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t_start)
+    return min(times)
+
+
+def main(n_samples=10**7):
+    pattern = np.random.randint(0, 1 << len(LINE_PAIRS), n_samples).astype(np.uint32)
+    packer = LinePacker(LINE_PAIRS)
+    words = np.empty_like(pattern)
+    values = np.empty_like(pattern)
+
+    n_loop = min(n_samples, 10**5)
+    t_loop = best_time(lambda: np.fromiter((loop_pack(v) for v in pattern[:n_loop]),
+                                           dtype='uint32'), repeat=1) * n_samples / n_loop
+    t_pack = best_time(lambda: packer.pack(pattern, out=words))
+    t_unpack = best_time(lambda: packer.unpack(words, out=values))
+    assert np.array_equal(values, pattern)
+
+    print('{} samples, {} lines on {} ports'.format(n_samples, len(LINE_PAIRS), len(PORTS)))
+    print('{:>18} {:>10} {:>12}'.format('method', 'time (s)', 'Msamples/s'))
+    for name, t in [('python loop*', t_loop), ('LinePacker.pack', t_pack),
+                    ('LinePacker.unpack', t_unpack)]:
+        print('{:>18} {:>10.3f} {:>12.1f}'.format(name, t, n_samples / t / 1e6))
+    print('* extrapolated from {} samples'.format(n_loop))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the per-call overhead of getting and setting facets.
+
+Uses a facet whose fget and fset do no I/O, so the timings are purely the cost of unit conversion,
+limit checking, caching and logging. Reports microseconds per call.
+
+    python tools/benchmarks/facet_overhead.py [n_calls]
+"""
+import sys
+import timeit
+
+from instrumental import Q_
+from instrumental.drivers import Instrument, Facet
+
+
+class FakeSource(Instrument):
+    def _get_voltage(self):
+        return self._voltage
+
+    def _set_voltage(self, value):
+        self._voltage = value
+
+    voltage = Facet(_get_voltage, _set_voltage, type=float, units='V', limits=(-10, 10))
+    max_voltage = 5.
+    clamped = Facet(_get_voltage, _set_voltage, type=float, units='V', limits=(0, 'max_voltage'))
+    cached = Facet(_get_voltage, _set_voltage, type=float, units='V', cached=True)
+
+    def _initialize(self):
+        self._voltage = 0.
+
+
+def main(n_calls=20000):
+    src = FakeSource()
+    q_volts, q_millivolts = Q_(1.5, 'V'), Q_(1500., 'mV')
+    cases = [
+        ('set Quantity (same units)', lambda: setattr(src, 'voltage', q_volts)),
+        ('set Quantity (mV -> V)', lambda: setattr(src, 'voltage', q_millivolts)),
+        ('set str', lambda: setattr(src, 'voltage', '1.5 V')),
+        ('set with attribute limit', lambda: setattr(src, 'clamped', q_volts)),
+        ('set cached (unchanged)', lambda: setattr(src, 'cached', q_volts)),
+        ('get', lambda: src.voltage),
+        ('get cached', lambda: src.cached),
+    ]
+    for name, func in cases:
+        func()  # Warm up caches
+        t = min(timeit.repeat(func, number=n_calls, repeat=3)) / n_calls
+        print('{:>28}: {:8.2f} us/call'.format(name, 1e6 * t))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
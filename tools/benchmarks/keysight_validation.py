@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of argument validation in the Keysight 33500B driver.
+
+Calls a few validated setters on a driver instance whose VISA resource just discards writes, and
+reports the overhead of `validate_parameters` in microseconds per call, relative to calling the
+undecorated method. Both strict and fast (``strict_validation = False``) modes are timed.
+
+    python tools/benchmarks/keysight_validation.py [n_calls]
+"""
+import sys
+import timeit
+
+from instrumental.drivers.funcgenerators import keysight33500b as ks
+
+
+class NullResource(object):
+    def write(self, message):
+        pass
+
+
+def main(n_calls=20000):
+    fg = object.__new__(ks.Keysight33500B)  # Skip opening a real instrument
+    fg._rsrc = NullResource()
+    cases = [
+        ('float, default channel', 'set_source_bpsk_phase', (45.0,), {}),
+        ('float, channel', 'set_source_bpsk_phase', (45.0, 2), {}),
+        ('enum, channel keyword', 'set_source_bpsk_phase', (ks.StdNumEnums.MINIMUM,),
+         {'source_num': 2}),
+        ('int', 'set_ese', (32,), {}),
+    ]
+
+    def time_call(func, args, kwds):
+        return min(timeit.repeat(lambda: func(*args, **kwds), number=n_calls, repeat=3)) / n_calls
+
+    print('{:>24} {:>12} {:>12}'.format('call', 'strict (us)', 'fast (us)'))
+    for name, method_name, args, kwds in cases:
+        method = getattr(fg, method_name)
+        bare = time_call(method.__wrapped__, (fg,) + args, kwds)
+        overheads = []
+        for strict in (True, False):
+            fg.strict_validation = strict
+            overheads.append(1e6 * (time_call(method, args, kwds) - bare))
+        print('{:>24} {:>12.2f} {:>12.2f}'.format(name, *overheads))
+    print('(overhead per call, relative to the undecorated method)')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of compressed array transfers for remote sessions.
+
+Encodes and decodes a stream of simulated 16-bit camera frames (12-bit data with shot noise) the
+way a remote session does, using each codec with and without delta encoding. Reports the
+compression ratio, the encode + decode time, and the resulting throughput over a link of the given
+speed in Mbit/s, compared against sending the frames uncompressed.
+
+    python tools/benchmarks/remote_compression.py [link_mbps] [n_frames]
+"""
+import sys
+import time
+
+import numpy as np
+
+from instrumental.drivers import remote
+
+SHAPE = (1024, 1280)
+
+
+def make_frames(n_frames, noise=True):
+    """Frames of a slowly drifting spot on a dim background"""
+    rows, cols = np.mgrid[0:SHAPE[0], 0:SHAPE[1]]
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(n_frames):
+        spot = 3000 * np.exp(-((rows - 500 - i)**2 + (cols - 600)**2) / (2 * 80.**2))
+        image = 100 + spot
+        if noise:
+            image = rng.poisson(image)
+        frames.append(np.clip(image, 0, 4095).astype(np.uint16))
+    return frames
+
+
+def run(frames, codec, delta, link_mbps):
+    refs_out = [] if delta else None
+    refs_in = [] if delta else None
+    n_wire = 0
+    start = time.perf_counter()
+    for frame in frames:
+        message = remote.Session.serialize(frame, out_of_band=True)
+        chunks = remote.Messenger.encode(message, 0, remote.EVENT, codec,
+                                         remote.DEFAULT_COMPRESSION_THRESHOLD, refs_out)
+        wire = b''.join(bytes(chunk) for chunk in chunks)
+        n_wire += len(wire)
+
+        kind, flags, id, length = remote.STRUCT.unpack_from(wire)
+        payload = bytearray(wire[remote.STRUCT.size:])
+        remote.Session.deserialize(remote.Messenger.split_buffers(payload, flags, refs_in))
+    cpu_time = time.perf_counter() - start
+
+    n_bytes = sum(frame.nbytes for frame in frames)
+    link_time = n_wire * 8 / (link_mbps * 1e6)
+    return n_bytes / n_wire, cpu_time / len(frames), n_bytes / 1e6 / (cpu_time + link_time)
+
+
+def main(link_mbps=100, n_frames=10):
+    codecs = [None] + list(remote.CODECS.values())
+    for noise in (True, False):
+        frames = make_frames(n_frames, noise)
+        print('{} frames of {}x{} uint16, {}:'.format(
+            n_frames, SHAPE[0], SHAPE[1], 'with shot noise' if noise else 'noiseless'))
+        print('{:>14} {:>8} {:>16} {:>20}'.format('codec', 'ratio', 'ms/frame (CPU)',
+                                                  'MB/s at {} Mbit/s'.format(link_mbps)))
+        for codec in codecs:
+            for delta in ((False,) if codec is None else (False, True)):
+                name = 'none' if codec is None else codec.name + (' + delta' if delta else '')
+                ratio, cpu_time, throughput = run(frames, codec, delta, link_mbps)
+                print('{:>14} {:>8.2f} {:>16.1f} {:>20.1f}'.format(name, ratio, 1e3 * cpu_time,
+                                                                   throughput))
+        print()
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:2]] + [int(arg) for arg in sys.argv[2:3]])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of array transfers through the remote instrument server.
+
+Runs a server on localhost that serves a fake camera, then times fetching its frames through a
+`ClientSession`, comparing out-of-band (zero-copy) framing against plain in-band pickling.
+
+    python tools/benchmarks/remote_transfer.py [n_repeats]
+"""
+import sys
+import time
+import threading
+
+import numpy as np
+
+from instrumental.drivers import ParamSet, remote
+
+SHAPES = [(480, 640), (1024, 1280), (2048, 2048)]
+
+
+class FakeCamera(object):
+    def __init__(self):
+        self.frame = None
+        self._lock = threading.Lock()  # Make sure the camera itself is not picklable
+
+    def latest_frame(self):
+        return self.frame
+
+    def close(self):
+        pass
+
+
+def start_server(camera):
+    remote.instrument = lambda params: camera
+    server = remote.ThreadedTCPServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def time_transfers(session, cam, n_repeats):
+    cam.latest_frame()  # Warm up
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        cam.latest_frame()
+    return (time.perf_counter() - start) / n_repeats
+
+
+def main(n_repeats=20):
+    camera = FakeCamera()
+    server = start_server(camera)
+    host, port = server.server_address
+    session = remote.ClientSession(host, port, 'bench', timeout=30.)
+    cam = session.instrument(ParamSet(server='bench'))
+
+    print('{:>12} {:>10} {:>16} {:>16}'.format('shape', 'MB', 'in-band MB/s', 'zero-copy MB/s'))
+    for shape in SHAPES:
+        camera.frame = np.random.randint(0, 4096, size=shape).astype(np.uint16)
+        mbytes = camera.frame.nbytes / 1e6
+
+        results = []
+        for out_of_band in (False, True):
+            session.messenger.peer_accepts_buffers = out_of_band
+            remote.OUT_OF_BAND = out_of_band  # Server side uses the same module
+            results.append(mbytes / time_transfers(session, cam, n_repeats))
+        remote.OUT_OF_BAND = True
+
+        print('{:>12} {:>10.1f} {:>16.0f} {:>16.0f}'.format(
+            'x'.join(map(str, shape)), mbytes, *results))
+
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
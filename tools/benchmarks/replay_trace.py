@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark a driver method offline by replaying a recorded I/O trace.
+
+Record the method being called repeatedly on real hardware first, e.g.::
+
+    with iotrace.recording('scope.trace'):
+        scope = instrument('myscope')
+        for _ in range(100):
+            scope.get_data()
+
+Then time the driver's own overhead (``fast``) or the full call including recorded I/O latencies
+(``real``). Calls are repeated until the trace runs out.
+
+    python tools/benchmarks/replay_trace.py scope.trace get_data [fast|real]
+"""
+import sys
+import time
+
+from instrumental import instrument
+from instrumental.drivers.iotrace import TraceMismatchError
+
+
+def main(path, method_name, timing='fast'):
+    t_start = time.perf_counter()
+    inst = instrument(replay=path, replay_timing=timing, reopen_policy='new')
+    print('Opened {} in {:.2f} ms'.format(type(inst).__name__, 1e3*(time.perf_counter()-t_start)))
+
+    method = getattr(inst, method_name)
+    times = []
+    while True:
+        t_start = time.perf_counter()
+        try:
+            method()
+        except TraceMismatchError:
+            break
+        times.append(time.perf_counter() - t_start)
+
+    if not times:
+        print('The trace has no complete calls of {}()'.format(method_name))
+        return
+    times.sort()
+    print('{} calls of {}(): median {:.1f} us, min {:.1f} us'.format(
+        len(times), method_name, 1e6*times[len(times)//2], 1e6*times[0]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
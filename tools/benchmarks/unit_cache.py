@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the unit-parsing caches in `instrumental.drivers.util`.
+
+Times `TekScope.get_data()` against a fake scope that returns a canned waveform, once with the
+caches warm and once with `clear_unit_caches()` called before every call (the cost of parsing and
+converting units from scratch each time), along with the conversions that `magnitude_as()`
+replaces in the DAQ and motion drivers.
+
+    python tools/benchmarks/unit_cache.py [n_calls]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+from instrumental import Q_
+from instrumental.drivers.util import magnitude_as, clear_unit_caches
+from instrumental.drivers.scopes.tektronix import TekScope
+
+WAVEFORM_PARAMS = {'xin': 1e-9, 'xun': 's', 'xze': 0., 'pt_o': 0,
+                   'ymu': 4e-3, 'yun': 'Volts', 'yof': 0., 'yze': 0.}
+
+
+class FakeResource(object):
+    def write(self, message):
+        pass
+
+
+def fake_scope(n_points):
+    scope = object.__new__(TekScope)
+    scope._rsrc = FakeResource()
+    curve = np.zeros(n_points, dtype='>i2')
+    scope._read_curve = lambda width: curve
+    scope._waveform_params = lambda: dict(WAVEFORM_PARAMS)
+    return scope
+
+
+def main(n_calls=5000):
+    scope = fake_scope(1000)
+    rate = Q_(10., 'kHz')
+    cases = [
+        ('get_data()', lambda: scope.get_data(1)),
+        ('magnitude_as(Q_, Hz)', lambda: magnitude_as(rate, 'Hz')),
+        ("Q_.m_as('Hz')", lambda: rate.m_as('Hz')),
+        ("magnitude_as('1 ms', s)", lambda: magnitude_as('1 ms', 's')),
+    ]
+
+    def time_call(func, cold):
+        def call():
+            clear_unit_caches()
+            func()
+        func()  # Warm up caches
+        return min(timeit.repeat(call if cold else func, number=n_calls, repeat=3)) / n_calls
+
+    print('{:>24} {:>12} {:>12}'.format('call', 'cached', 'uncached'))
+    for name, func in cases:
+        print('{:>24} {:>12.2f} {:>12.2f}'.format(name, 1e6*time_call(func, False),
+                                                  1e6*time_call(func, True)))
+    print('(us/call)')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])